@@ -1,48 +1,120 @@
-# """
-# Chat assistant endpoint – streaming answer via Server-Sent Events
-# POST /api/v1/chat  (JSON body: {uid, question})
-# """
-# import asyncio
-# import json
-# from typing import AsyncGenerator
-# from fastapi import APIRouter, Request, HTTPException
-# from sse_starlette.sse import EventSourceResponse
-# # from app.services.groq_service import ask_groq
-
-# router = APIRouter()
-
-# WORD_DELAY_SEC = 0.04  # tweak to taste
-
-# async def _stream_answer(question: str) -> AsyncGenerator[str, None]:
-#     """
-#     1. Get full answer from Groq
-#     2. Yield each word with a tiny delay
-#     """
-#     system = (
-#         "You are a helpful legal assistant that answers questions "
-#         "about contracts in plain English. Keep answers short."
-#     )
-#     answer = await ask_groq(system, question)
-
-#     for word in answer.split():
-#         yield word + " "
-#         await asyncio.sleep(WORD_DELAY_SEC)
-
-# @router.post("/chat")
-# async def chat_endpoint(request: Request):
-#     """
-#     Accept JSON {uid: str, question: str}
-#     Return text/event-stream
-#     """
-#     try:
-#         body = await request.json()
-#         uid: str = body["uid"]
-#         question: str = body["question"]
-#     except Exception:
-#         raise HTTPException(status_code=400, detail="Invalid JSON body")
-
-#     async def event_generator() -> AsyncGenerator[dict, None]:
-#         async for word in _stream_answer(question):
-#             yield {"data": word}
-
-#     return EventSourceResponse(event_generator())
\ No newline at end of file
+"""
+Chat assistant endpoint – answers grounded in the document, streamed via Server-Sent Events
+POST /api/v1/chat  (JSON body: {uid, question})
+Only the clauses most relevant to the question are put in the prompt, so its
+size does not grow with the contract, and the model's tokens are forwarded
+as they arrive.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import AsyncGenerator, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+from sse_starlette.sse import EventSourceResponse
+
+from app import config
+from app.api.v1.result import job_status
+from app.services.llm import LLMGateway, estimate_tokens, get_llm
+from app.services.metrics import span
+from app.services.store import doc_store
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+CHAT_MODEL = config.LLM_MODEL
+CHAT_TEMPERATURE = 0.3
+# Clauses retrieved per question, and the prompt token budget they may use
+CHAT_TOP_K = int(os.getenv("CHAT_TOP_K", 6))
+CHAT_CONTEXT_TOKENS = int(os.getenv("CHAT_CONTEXT_TOKENS", 2500))
+CHAT_MAX_TOKENS = int(os.getenv("CHAT_MAX_TOKENS", 512))
+
+
+class ChatRequest(BaseModel):
+    uid: str
+    question: str = Field(..., min_length=1, max_length=2000)
+    top_k: Optional[int] = Field(None, ge=1, le=20)
+
+
+def select_context(clauses: List[dict], budget: int = CHAT_CONTEXT_TOKENS) -> List[dict]:
+    """
+    Keep retrieved clauses in rank order until the token budget is used up;
+    a clause that does not fit is cut to the remaining budget.
+    """
+    selected, used = [], 0
+    for clause in clauses:
+        remaining = budget - used
+        if remaining <= 50:
+            break
+        text = clause["text"]
+        if estimate_tokens(text) > remaining:
+            text = text[: remaining * 4].rsplit(" ", 1)[0] + " …"
+        selected.append(dict(clause, text=text))
+        used += estimate_tokens(text)
+    return selected
+
+
+def build_prompt(question: str, clauses: List[dict]) -> str:
+    excerpts = "\n\n".join(
+        f"[{c['clause_id']}] {c.get('heading') or ''} (risk: {c.get('rating') or 'not rated'})\n{c['text']}".strip()
+        for c in clauses
+    )
+    return (
+        "You are a helpful legal assistant that answers questions about a contract in plain English. "
+        "Answer ONLY from the contract excerpts below and cite the clause ids you rely on in square "
+        "brackets, e.g. [3.txt]. If the excerpts do not answer the question, say so. Keep answers short.\n\n"
+        f"Contract excerpts:\n{excerpts}\n\n"
+        f"Question: {question}"
+    )
+
+
+@router.post("/chat")
+async def chat_endpoint(request: ChatRequest, llm: LLMGateway = Depends(get_llm)):
+    """
+    Answer a question about a document as a text/event-stream.
+
+    Events:
+        sources – the clauses the answer is based on (id, number, heading, rating)
+        token   – {"text": ...} pieces of the answer as the model produces them
+        done    – {"time_to_first_token": s, "duration": s}
+        error   – {"detail": ...} if the LLM call fails
+    """
+    with span("chat_retrieve", uid=request.uid):
+        clauses = await asyncio.to_thread(
+            doc_store.search.relevant, request.uid, request.question, request.top_k or CHAT_TOP_K
+        )
+    if not clauses:
+        job = job_status(request.uid)
+        if job is not None and job["status"] in ("queued", "running"):
+            return JSONResponse(status_code=202, content=job)
+        raise HTTPException(status_code=404, detail=f"No clauses found for UID {request.uid}")
+
+    context = select_context(clauses)
+    prompt = build_prompt(request.question, context)
+
+    async def event_generator() -> AsyncGenerator[dict, None]:
+        sources = [{k: c.get(k) for k in ("clause_id", "number", "heading", "rating")} for c in context]
+        yield {"event": "sources", "data": json.dumps(sources)}
+        started = time.perf_counter()
+        first_token = None
+        try:
+            async for text in llm.stream(prompt, model=CHAT_MODEL, temperature=CHAT_TEMPERATURE,
+                                         max_tokens=CHAT_MAX_TOKENS):
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                yield {"event": "token", "data": json.dumps({"text": text})}
+        except Exception as e:
+            logger.error("Chat answer for %s failed: %s", request.uid, str(e))
+            yield {"event": "error", "data": json.dumps({"detail": str(e)})}
+            return
+        yield {"event": "done", "data": json.dumps({
+            "time_to_first_token": round(first_token, 3) if first_token is not None else None,
+            "duration": round(time.perf_counter() - started, 3),
+        })}
+
+    return EventSourceResponse(event_generator())
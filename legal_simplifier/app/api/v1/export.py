@@ -0,0 +1,79 @@
+"""
+Risk report export
+GET /api/v1/export/{uid}?format=pdf|docx
+"""
+import asyncio
+import logging
+import os
+import re
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.api.v1.result import get_or_compute_result, job_status
+from app.services.llm import LLMGateway, get_llm
+from app.services.metrics import span
+from app.services.report import FORMATS, get_or_render, iter_file, report_key
+from app.services.result_store import etag_matches
+from app.services.store import doc_store
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+_UNSAFE_FILENAME_RE = re.compile(r"[^\w.\- ]+")
+
+
+@router.get("/export/{uid}")
+async def export_report(
+    uid: str,
+    request: Request,
+    format: Literal["pdf", "docx"] = "pdf",
+    llm: LLMGateway = Depends(get_llm),
+):
+    """
+    Download an annotated risk report of a document.
+
+    The report is rendered off the event loop on first request and cached on
+    disk per result version; later downloads stream the cached file. While
+    the document is still being processed, 202 with the job status is returned.
+
+    Args:
+        uid (str): The unique identifier of the document.
+        format (str): "pdf" or "docx".
+    """
+    document = await asyncio.to_thread(doc_store.get_document, uid)
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"No document found for UID {uid}")
+    job = job_status(uid)
+    if job is not None and job["status"] != "completed":
+        if job["status"] == "failed":
+            raise HTTPException(status_code=500, detail=f"Processing failed: {job['error']}")
+        return JSONResponse(status_code=202, content=job)
+
+    try:
+        record = await get_or_compute_result(uid, llm)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    etag = f'"{report_key(record, format)}"'
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    try:
+        with span("export_render", uid=uid, format=format) as info:
+            path, cached = await get_or_render(uid, document, record, format)
+            info["cached"] = cached
+    except Exception as e:
+        logger.error("Could not render %s report for %s: %s", format, uid, str(e))
+        raise HTTPException(status_code=500, detail=f"Could not render report: {str(e)}")
+
+    name = _UNSAFE_FILENAME_RE.sub("_", os.path.splitext(document["doc_name"])[0]) or uid
+    headers = {
+        "ETag": etag,
+        "Content-Length": str(os.path.getsize(path)),
+        "Content-Disposition": f'attachment; filename="{name}-risk-report.{format}"',
+        "X-Export-Cache": "hit" if cached else "miss",
+    }
+    return StreamingResponse(iter_file(path), media_type=FORMATS[format], headers=headers)
@@ -1,19 +1,61 @@
 import os
 import json
-from pathlib import Path
-from fastapi import APIRouter, HTTPException
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-import groq
-from dotenv import load_dotenv
 import logging
+from app import config
+from app.services.batching import parse_json_array
+from app.services.chunking import chunk_text
+from app.services.llm import LLMGateway, get_llm
+from app.services.llm_cache import cache_key, llm_cache
+from app.services.metrics import span
+from app.services.store import doc_store
 
-# Load environment variables
-load_dotenv()
+groq_model = config.LLM_MODEL
+# Presence checks should be repeatable, so sample greedily
+groq_temperature = 0.0
+# Bump whenever generate_prompt or STANDARD_CLAUSES change so cached answers are not reused
+PROMPT_VERSION = "ghost-presence-v1"
 
-# Initialize Groq client
-groq_api_key = os.getenv("GROQ_API_KEY")
-groq_client = groq.Groq(api_key=groq_api_key)
-groq_model = "llama-3-8b-8192"  # Replace with your preferred Groq model
+# Chunk size and overlap (tokens) for the per-chunk presence pass
+GHOST_CHUNK_TOKENS = int(os.getenv("GHOST_CHUNK_TOKENS", 1500))
+GHOST_CHUNK_OVERLAP = int(os.getenv("GHOST_CHUNK_OVERLAP", 150))
+# Give at max this many missing clauses
+GHOST_MAX_MISSING = int(os.getenv("GHOST_MAX_MISSING", 5))
+
+# Standard clauses a contract is checked against, most important first.
+# (name, description, reason)
+STANDARD_CLAUSES = [
+    ("Termination", "How and when either party may end the agreement, with notice periods.",
+     "Without it you may be locked in, or evicted/cut off without a clear process."),
+    ("Limitation of Liability", "Caps the amount and types of damages a party can be liable for.",
+     "Without a cap your financial exposure can be unlimited."),
+    ("Dispute Resolution", "How disagreements are resolved (negotiation, mediation, arbitration, courts).",
+     "Without it disputes go straight to costly and slow litigation."),
+    ("Governing Law", "Which jurisdiction's law applies to the agreement.",
+     "Without it it is unclear which rules protect you if something goes wrong."),
+    ("Payment Terms", "Amounts, due dates, method of payment and consequences of late payment.",
+     "Vague payment terms lead to surprise charges and disputes."),
+    ("Indemnification", "Who compensates whom for third-party claims and losses.",
+     "Without it you may bear losses caused by the other party."),
+    ("Confidentiality", "Obligations to keep shared information private.",
+     "Without it sensitive information can be disclosed freely."),
+    ("Deposit Refund", "When and how any deposit or advance is returned, and permitted deductions.",
+     "Without it a deposit can be withheld indefinitely."),
+    ("Force Majeure", "Relief from obligations during events beyond either party's control.",
+     "Without it you can be in breach because of events you could not prevent."),
+    ("Notices", "How formal notices must be delivered and to which address.",
+     "Without it notices can be disputed or never received."),
+    ("Amendment", "Changes to the agreement require written consent of both parties.",
+     "Without it one party may claim the right to change terms unilaterally."),
+    ("Assignment", "Whether a party can transfer its rights or obligations to someone else.",
+     "Without it you may end up dealing with a party you never agreed to."),
+    ("Severability", "Invalid provisions do not invalidate the rest of the agreement.",
+     "Without it one bad clause can put the whole agreement at risk."),
+    ("Entire Agreement", "The written contract supersedes prior promises and discussions.",
+     "Without it earlier side promises can be argued to still apply."),
+]
 
 # Define the router
 router = APIRouter()
@@ -25,61 +67,82 @@ class InsertGhostRequest(BaseModel):
 # Prompt generation function
 def generate_prompt(contract_text: str) -> str:
     """
-    Generate a prompt for the Groq LLM to analyze missing clauses in a contract.
+    Generate a prompt for the Groq LLM that lists which standard clauses are
+    present in one excerpt of a contract.
     """
+    checklist = "\n".join(f"- {name}: {description}" for name, description, _ in STANDARD_CLAUSES)
     return (
-        "You are a legal contract analyzer. Analyze the following text and identify clauses that are missing but "
-        "should be present in a standard contract which can help the user not fall into trouble."
-        "give at max 5 missing clauses only."
-        "Make sure not to repeat any clause."
-        "give only important clauses.When in doubt, leave it out."
-        "Reply ONLY in a LIST OF JSON objects with the missing clauses.\n\n"
-        f"Contract Text:\n{contract_text}"  # Limit the input to the first 6000 characters if needed
-        "\n\nRespond in the following JSON format:\n"
-        "[\n"
-        "  {\n"
-        "    \"clause_name\": \"Name of the missing clause\",\n"
-        "    \"description\": \"Brief description of the clause\",\n"
-        "    \"reason\": \"Reason why this clause is important\"\n"
-        "  },\n"
-        "  ...\n"
-        "]\n"
-        "IMPORTANT: Ensure the response is a valid JSON array. Do not include any text outside the JSON array. "
-        "Do not include explanations, headers, or any other content."
+        "You are a legal contract analyzer. Below is an EXCERPT of a longer contract and a checklist of "
+        "standard clauses. Identify which checklist clauses are present in this excerpt, fully or partially, "
+        "under any heading or wording. Only report clauses that are actually covered by the excerpt.\n\n"
+        f"Checklist:\n{checklist}\n\n"
+        f"Contract Excerpt:\n{contract_text}\n\n"
+        "Respond with ONLY a JSON array of the checklist names that are present, for example:\n"
+        "[\"Termination\", \"Governing Law\"]\n"
+        "Respond with [] if none are present. Do not include any text outside the JSON array."
     )
 
-# Define the endpoint
-@router.post("/insert-ghost")
-async def insert_ghost(request: InsertGhostRequest):
-    uid = request.uid
-    ocr_result_folder = Path("ocr_results")
-    file_path = ocr_result_folder / f"{uid}.txt"
+async def detect_present(chunk: str, llm: LLMGateway) -> set:
+    """
+    Map step: names of the standard clauses present in one chunk.
+    Results are cached per chunk text, so unchanged chunks are never re-sent.
+    """
+    key = cache_key(groq_model, PROMPT_VERSION, chunk, groq_temperature)
+    cached = await asyncio.to_thread(llm_cache.get, key)
+    if cached is not None:
+        return set(json.loads(cached))
 
-    # Check if the file exists
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail=f"File {uid}.txt not found in ocr_result folder")
+    known = {name.lower(): name for name, _, _ in STANDARD_CLAUSES}
+    for attempt in range(2):
+        response = await llm.complete(
+            generate_prompt(chunk),
+            model=groq_model,
+            temperature=groq_temperature,
+            max_tokens=200,
+        )
+        names = parse_json_array(response)
+        if names is not None:
+            present = sorted({known[n.strip().lower()] for n in names if isinstance(n, str) and n.strip().lower() in known})
+            await asyncio.to_thread(llm_cache.set, key, json.dumps(present))
+            return set(present)
+        logging.warning(f"Unparseable presence response (attempt {attempt + 1}): {response}")
+    raise ValueError("Invalid JSON response from Groq LLM for a contract chunk")
 
-    # Read the content of the file
-    with file_path.open("r") as file:
-        text_content = file.read()
+def find_missing(present: set) -> list:
+    """
+    Reduce step: standard clauses not present in any chunk, most important first.
+    """
+    return [
+        {"clause_name": name, "description": description, "reason": reason}
+        for name, description, reason in STANDARD_CLAUSES
+        if name not in present
+    ][:GHOST_MAX_MISSING]
 
-    # Generate the prompt
-    prompt = generate_prompt(text_content)
+# Define the endpoint
+@router.post("/insert-ghost")
+async def insert_ghost(request: InsertGhostRequest, llm: LLMGateway = Depends(get_llm)):
+    uid = request.uid
+    # Extracted text of the document
+    text_content = await asyncio.to_thread(doc_store.get_text, uid)
+    if text_content is None:
+        raise HTTPException(status_code=404, detail=f"No extracted text found for UID {uid}")
 
-    # Send the request to Groq LLM
+    # Split into overlapping token windows (tokenising is CPU work) and check every chunk in parallel
+    chunks = await asyncio.to_thread(chunk_text, text_content, GHOST_CHUNK_TOKENS, GHOST_CHUNK_OVERLAP)
     try:
-        response = groq_client.chat.completions.create(
-                model="llama-3.1-8b-instant",  # Replace with the appropriate model
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=512
-            )
-        logging.info(f"Groq LLM full response for {uid}: {response.choices[0].message.content}")
-        result = json.loads(response.choices[0].message.content)
-        logging.info(f"Groq LLM response for {uid}: {result}")
+        with span("ghost_detect", uid=uid, chunks=len(chunks)):
+            per_chunk = await asyncio.gather(*(detect_present(chunk, llm) for chunk in chunks))
     except Exception as e:
         logging.error(f"Error communicating with Groq LLM: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error communicating with Groq LLM: {str(e)}")
 
+    present = set().union(*per_chunk)
+    result = find_missing(present)
+    logging.info(f"Ghost clauses for {uid} ({len(chunks)} chunks): {result}")
+
     # Return the JSON response
-    return {"uid": uid, "missing_clauses": result}
\ No newline at end of file
+    return {
+        "uid": uid,
+        "missing_clauses": result,
+        "present_clauses": [name for name, _, _ in STANDARD_CLAUSES if name in present],
+    }
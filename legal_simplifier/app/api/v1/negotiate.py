@@ -0,0 +1,117 @@
+"""
+Negotiation suggestions
+GET  /api/v1/negotiate/{uid}                      – suggested rewrites of the red and yellow clauses
+POST /api/v1/negotiate/{uid}/{clause_id}/accept   – accept a suggestion (generated ones join the library)
+POST /api/v1/negotiate/{uid}/{clause_id}/reject   – reject a suggestion
+GET  /api/v1/negotiate/library?risk_type=IP       – vetted entries of the rewrite library
+"""
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
+
+from app.api.v1.result import get_or_compute_result, job_status
+from app.models import NegotiateResp
+from app.services.llm import LLMGateway, get_llm
+from app.services.metrics import span
+from app.services.negotiation import negotiate, review, rewrite_library
+from app.services.store import doc_store
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# uid -> running negotiation, so concurrent requests for one document call the LLM once
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+async def get_or_negotiate(uid: str, llm: LLMGateway) -> tuple:
+    """
+    Current result of a document and the suggestions stored for it,
+    computing either first if needed.
+    """
+    task = _inflight.get(uid)
+    if task is None:
+        async def run():
+            record = await get_or_compute_result(uid, llm)
+            return record, await negotiate(uid, record, llm)
+
+        task = asyncio.ensure_future(run())
+        _inflight[uid] = task
+        task.add_done_callback(lambda _: _inflight.pop(uid, None))
+    return await asyncio.shield(task)
+
+
+@router.get("/negotiate/library")
+async def get_library(risk_type: Optional[str] = Query(None, description="e.g. Financial, Liability, IP")):
+    """
+    Vetted entries of the rewrite library, most accepted first.
+    """
+    await asyncio.to_thread(rewrite_library.refresh)
+    entries = await asyncio.to_thread(doc_store.rewrites.entries, risk_type)
+    return {"total": len(entries), "entries": entries}
+
+
+@router.get("/negotiate/{uid}", response_model=NegotiateResp)
+async def get_suggestions(uid: str, llm: LLMGateway = Depends(get_llm)):
+    """
+    Suggested rewrites of the red and yellow clauses of a document. Each
+    suggestion carries the clause analysis, suggested_text, where it came
+    from (source "library" with the similarity of the weakest phrase match,
+    or "llm") and the phrase-level rewrites it is made of.
+    """
+    if await asyncio.to_thread(doc_store.get_document, uid) is None:
+        raise HTTPException(status_code=404, detail=f"No document found for UID {uid}")
+    job = job_status(uid)
+    if job is not None and job["status"] in ("queued", "running"):
+        return JSONResponse(status_code=202, content=job)
+
+    try:
+        with span("negotiate", uid=uid):
+            record, suggestions = await get_or_negotiate(uid, llm)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error("Could not suggest rewrites for %s: %s", uid, str(e))
+        raise HTTPException(status_code=500, detail=f"Could not suggest rewrites: {str(e)}")
+
+    clauses = {clause.get("id"): clause for clause in record["clauses"]}
+    items = []
+    for suggestion in suggestions:
+        clause = clauses.get(suggestion["clause_id"], {})
+        items.append({
+            "id": suggestion["clause_id"],
+            **{k: clause.get(k) for k in ("rating", "severity", "risk_types", "risky_phrases", "original_clause",
+                                          "start_idx", "end_idx")},
+            **{k: suggestion[k] for k in ("suggested_text", "source", "similarity", "rewrites", "status")},
+        })
+    sources = {"library": 0, "llm": 0}
+    for item in items:
+        sources[item["source"]] = sources.get(item["source"], 0) + 1
+    return {"uid": uid, "etag": record["etag"], "total": len(items), "sources": sources, "suggestions": items}
+
+
+async def _review(uid: str, clause_id: str, accepted: bool) -> dict:
+    suggestion = await asyncio.to_thread(review, uid, clause_id, accepted)
+    if suggestion is None:
+        raise HTTPException(status_code=404, detail=f"No suggestion for clause {clause_id} of UID {uid}")
+    return dict(suggestion, uid=uid)
+
+
+@router.post("/negotiate/{uid}/{clause_id}/accept")
+async def accept_suggestion(uid: str, clause_id: str):
+    """
+    Accept a suggestion. The phrase rewrites of a generated suggestion are
+    added to the library and served to later documents without an LLM call.
+    """
+    return await _review(uid, clause_id, accepted=True)
+
+
+@router.post("/negotiate/{uid}/{clause_id}/reject")
+async def reject_suggestion(uid: str, clause_id: str):
+    """
+    Reject a suggestion; library entries that keep being rejected are retired.
+    """
+    return await _review(uid, clause_id, accepted=False)
@@ -1,9 +1,24 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from sse_starlette.sse import EventSourceResponse
+import asyncio
 import os
-from groq import Groq  # Ensure the Groq module is installed
 import logging
 import json
-import time
+from typing import List, Optional
+from pydantic import ValidationError
+from app.models import BatchClauseAnalysis, ClauseResult
+from app.services.batching import make_batches, parse_json_array
+from app.services.clause_diff import match_clauses
+from app.services.clustering import CLAUSES_INHERITED, CLUSTER_ENABLED, near_duplicates
+from app import config
+from app.services.llm import LLMGateway, estimate_tokens, get_llm
+from app.services.jobs import job_queue
+from app.services.llm_cache import cache_key, llm_cache
+from app.services.metrics import span
+from app.services.preclassifier import pre_classifier
+from app.services.result_store import etag_matches, load_result, result_version, save_result
+from app.services.store import doc_store
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -11,102 +26,687 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Define the directory to store uploaded files
-STORE_DIR = "store"
+# Classification call settings; bump PROMPT_VERSION whenever prepare_groq_prompt changes
+CLASSIFY_MODEL = config.LLM_MODEL
+CLASSIFY_TEMPERATURE = 0.7
+PROMPT_VERSION = "clause-v1"
+# Batched classification: clauses per request (1 disables batching), token budget
+# for the clause text of one batch, and completion tokens reserved per clause
+CLASSIFY_BATCH_SIZE = int(os.getenv("CLASSIFY_BATCH_SIZE", 8))
+CLASSIFY_BATCH_TOKENS = int(os.getenv("CLASSIFY_BATCH_TOKENS", 2000))
+CLASSIFY_BATCH_OUTPUT_TOKENS = int(os.getenv("CLASSIFY_BATCH_OUTPUT_TOKENS", 300))
+# Stored results produced with another model/prompt are recomputed
+RESULT_VERSION = result_version(CLASSIFY_MODEL, PROMPT_VERSION)
+
+# uid -> running classification (ResultRun), shared by GETs, streams and the pipeline
+_inflight = {}
+
+# cache key -> running LLM call (or pending batch entry), so identical clauses are only sent once
+_clause_inflight = {}
+# batch requests in flight (kept referenced until they finish)
+_batch_tasks = set()
+
+@router.get("/result/{uid}", response_model=List[ClauseResult], response_model_exclude_unset=True)
+async def get_result(uid: str, request: Request, response: Response, llm: LLMGateway = Depends(get_llm)):
+    """
+    Return the clause analysis for a document.
+
+    Results are computed once and served from the result store afterwards,
+    with an ETag so that unchanged results come back as 304. While a document
+    is still in the background pipeline, 202 with the job status is returned.
+
+    Args:
+        uid (str): The unique identifier of the document.
+
+    Returns:
+        list: One ClauseResult per clause.
+    """
+    job = job_status(uid)
+    if job is not None and job["status"] != "completed":
+        if job["status"] == "failed":
+            raise HTTPException(status_code=500, detail=f"Processing failed: {job['error']}")
+        return JSONResponse(status_code=202, content=job)
 
-# Initialize the Groq client
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))  # Replace with your actual API key
+    try:
+        record = await get_or_compute_result(uid, llm)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error("Error processing document %s: %s", uid, str(e))
+        raise HTTPException(status_code=500, detail=f"Error processing files: {str(e)}")
+
+    if etag_matches(request.headers.get("if-none-match", ""), record["etag"]):
+        return Response(status_code=304, headers={"ETag": record["etag"]})
+    response.headers["ETag"] = record["etag"]
+    return record["clauses"]
 
-@router.get("/result/{uid}")
-async def get_result(uid: str):
+@router.get("/result/{uid}/stream")
+async def stream_result(uid: str, llm: LLMGateway = Depends(get_llm)):
     """
-    Fetch all .txt files from the store/{uid} folder, send their content to the Groq LLM,
-    and return an array of objects with the LLM responses.
+    Stream the clause analysis as Server-Sent Events. Returns 202 with the job
+    status if the document has not been segmented yet.
+
+    Events:
+        clause   – one classified clause (same shape as the items of GET /result/{uid})
+        progress – {"done": n, "total": m} after every clause
+        summary  – rating counts once all clauses are done
+        error    – {"detail": ...} if classification fails
 
     Args:
-        uid (str): The unique identifier for the folder.
+        uid (str): The unique identifier of the document.
+    """
+    record = await asyncio.to_thread(load_result, uid, RESULT_VERSION)
+    clause_count = None
+    if record is None:
+        try:
+            clause_count = len(await asyncio.to_thread(load_clauses, uid))
+        except FileNotFoundError as e:
+            # still extracting/segmenting in the upload pipeline
+            job = job_status(uid)
+            if job is not None and job["status"] in ("queued", "running"):
+                return JSONResponse(status_code=202, content=job)
+            raise HTTPException(status_code=404, detail=str(e))
+
+    async def event_generator():
+        if record is not None:
+            # already computed: replay from the result store
+            total = len(record["clauses"])
+            for n, clause in enumerate(record["clauses"], start=1):
+                yield {"event": "clause", "data": json.dumps(clause)}
+                yield {"event": "progress", "data": json.dumps({"done": n, "total": total})}
+            yield {"event": "summary", "data": json.dumps(summarize(record["clauses"]))}
+            return
+
+        # follow the document's classification run (the pipeline's, or one started here)
+        run = get_or_start_run(uid, llm)
+        done = 0
+        async for _, response in run.follow():
+            done += 1
+            yield {"event": "clause", "data": json.dumps(response)}
+            yield {"event": "progress", "data": json.dumps({"done": done, "total": clause_count})}
+        try:
+            saved = await asyncio.shield(run.task)
+        except Exception as e:
+            logger.error("Error streaming results for %s: %s", uid, str(e))
+            yield {"event": "error", "data": json.dumps({"detail": str(e)})}
+            return
+        yield {"event": "summary", "data": json.dumps(summarize(saved["clauses"]))}
+
+    return EventSourceResponse(event_generator())
+
+@router.get("/result/{uid}/inherited")
+async def get_inherited(uid: str):
+    """
+    Audit trail of near-duplicate propagation for a document: which of its
+    clauses inherited a verdict (and from which clause), and which clauses
+    of other documents inherited a verdict from it.
+    """
+    if await asyncio.to_thread(doc_store.get_document, uid) is None:
+        raise HTTPException(status_code=404, detail=f"No document found for UID {uid}")
+    inherited = await asyncio.to_thread(doc_store.signatures.inherited, uid=uid)
+    shared = await asyncio.to_thread(doc_store.signatures.inherited, source_uid=uid)
+    return {
+        "uid": uid,
+        "inherited": inherited,
+        "shared": [row for row in shared if row["uid"] != uid],
+    }
+
+class ResultRun:
+    """
+    One classification run of a document, shared by everything that wants
+    its result. Finished clauses are kept and broadcast, so a stream that
+    attaches while the run is under way replays the clauses done so far and
+    then follows the rest, instead of classifying the document again.
+    """
+
+    def __init__(self, uid: str):
+        self.uid = uid
+        self.task: Optional[asyncio.Future] = None
+        # (position, response) in completion order
+        self.done: list = []
+        self.finished = False
+        self._listeners = set()
+
+    def publish(self, position: int, response: dict):
+        self.done.append((position, response))
+        for queue in self._listeners:
+            queue.put_nowait((position, response))
+
+    def close(self):
+        self.finished = True
+        for queue in self._listeners:
+            queue.put_nowait(None)
+
+    async def follow(self):
+        """
+        Yield (position, response) for every clause of the run, in completion
+        order, until the run ends. Await `task` afterwards for the saved
+        record (or the error).
+        """
+        queue = asyncio.Queue()
+        backlog, finished = list(self.done), self.finished
+        if not finished:
+            self._listeners.add(queue)
+        try:
+            for item in backlog:
+                yield item
+            while not finished:
+                item = await queue.get()
+                if item is None:
+                    return
+                yield item
+        finally:
+            self._listeners.discard(queue)
+
+def get_or_start_run(uid: str, llm: LLMGateway) -> ResultRun:
+    """
+    The running classification of `uid`, started here if there is none.
+    """
+    run = _inflight.get(uid)
+    if run is None:
+        run = ResultRun(uid)
+        run.task = asyncio.ensure_future(_compute_result(run, llm))
+        _inflight[uid] = run
+        run.task.add_done_callback(lambda _: _inflight.pop(uid, None))
+    return run
+
+async def get_or_compute_result(uid: str, llm: LLMGateway) -> dict:
+    """
+    Load the stored result for the current prompt/model version, classifying
+    and saving it first if needed. Concurrent callers for the same uid share
+    a single classification run.
+
+    Args:
+        uid (str): The unique identifier of the document.
+        llm (LLMGateway): Gateway used for LLM calls.
 
     Returns:
-        list: A list of objects containing the LLM responses.
+        dict: The result record (version, etag, clauses).
     """
-    folder_path = os.path.join(STORE_DIR, uid)
+    record = await asyncio.to_thread(load_result, uid, RESULT_VERSION)
+    if record is not None:
+        return record
+    return await asyncio.shield(get_or_start_run(uid, llm).task)
 
-    # Check if the folder exists
-    if not os.path.exists(folder_path):
-        raise HTTPException(status_code=404, detail=f"Folder with UID {uid} not found")
+async def _compute_result(run: ResultRun, llm: LLMGateway) -> dict:
+    uid = run.uid
+    try:
+        # a run that finished just before this one started has already saved the result
+        record = await asyncio.to_thread(load_result, uid, RESULT_VERSION)
+        if record is not None:
+            for position, clause in enumerate(record["clauses"]):
+                run.publish(position, clause)
+            return record
+
+        with span("classify_clauses", uid=uid) as info:
+            clauses = await asyncio.to_thread(load_clauses, uid)
+            segments = await asyncio.to_thread(load_segments, uid)
+            responses = [None] * len(clauses)
+            async for position, response in iter_results(uid, clauses, segments, llm):
+                responses[position] = response
+                run.publish(position, response)
+            decided_by = summarize(responses)["decided_by"]
+            info.update(clauses=len(responses), **decided_by)
+        logger.info("%s: clauses decided by %s", uid, decided_by)
+        with span("save_result", uid=uid):
+            return await asyncio.to_thread(save_result, uid, responses, RESULT_VERSION)
+    finally:
+        run.close()
+
+def job_status(uid: str):
+    """
+    Status dict of the pipeline job for `uid`: the live job if this process
+    runs it, else the last state recorded in the document store (None if unknown).
+    """
+    job = job_queue.get(uid)
+    return job.to_dict() if job is not None else doc_store.get_job(uid)
 
-    # Get all .txt files in the folder
-    txt_files = [f for f in os.listdir(folder_path) if f.endswith(".txt")]
-    if not txt_files:
-        raise HTTPException(status_code=404, detail=f"No .txt files found in folder {uid}")
+def load_clauses(uid: str) -> list:
+    """
+    Read the clauses of a document from the document store.
 
-    responses = []
+    Args:
+        uid (str): The unique identifier of the document.
+
+    Returns:
+        list: (clause id, clause text) pairs in document order.
+
+    Raises:
+        FileNotFoundError: If the document has no clauses.
+    """
+    clauses = [(row["clause_id"], row["text"].strip()) for row in doc_store.get_clauses(uid)]
+    if not clauses:
+        raise FileNotFoundError(f"No clauses found for UID {uid}")
+    return clauses
+
+def load_segments(uid: str) -> dict:
+    """
+    Clause numbers, headings and offsets recorded by the segmenter, keyed by clause id.
+    """
+    return {
+        row["clause_id"]: {k: row[k] for k in ("number", "heading", "start_idx", "end_idx")}
+        for row in doc_store.get_clauses(uid)
+    }
+
+async def iter_classified(uid: str, clauses: list, segments: dict, llm: LLMGateway):
+    """
+    Classify all clauses concurrently and yield each one as soon as it is done.
+    Clauses the local pre-classifier is confident about are yielded first
+    without an LLM call. Of the rest, a clause that is a near-duplicate of one
+    classified before (in any document) or of another clause of this document
+    inherits that verdict ("inherited_from") instead of being sent to the LLM.
+    Every response says which tier decided it ("decided_by").
+
+    Args:
+        uid (str): The document the clauses belong to.
+        clauses (list): (clause id, clause text) pairs from load_clauses.
+        segments (dict): Offsets from load_segments.
+        llm (LLMGateway): Gateway used for LLM calls.
+
+    Yields:
+        tuple: (position in `clauses`, response dict), in completion order.
+    """
+    async def run(position: int, clause_id: str, content: str):
+        response = await classify_clause(clause_id, content, llm)
+        response["decided_by"] = "llm"
+        return position, _attach_offsets(response, clause_id, segments)
+
+    def inherit(position: int, verdict: dict, source: dict) -> dict:
+        clause_id, content = clauses[position]
+        response = dict(verdict, id=clause_id, original_clause=content, decided_by="cluster", inherited_from=source)
+        CLAUSES_INHERITED.inc(scope=source["scope"])
+        return _attach_offsets(response, clause_id, segments)
+
+    # scoring is CPU work (and may retrain the local model), keep it off the event loop
+    with span("preclassify", clauses=len(clauses)):
+        decisions = await asyncio.to_thread(pre_classifier.classify_many, [content for _, content in clauses])
+    remaining = []
+    for position, ((clause_id, content), analysis) in enumerate(zip(clauses, decisions)):
+        if analysis is None:
+            remaining.append(position)
+            continue
+        response = dict(analysis, original_clause=content, id=clause_id)
+        yield position, _attach_offsets(response, clause_id, segments)
+
+    with span("cluster_clauses", clauses=len(remaining)) as info:
+        signatures, corpus, members = await asyncio.to_thread(_near_duplicates, clauses, remaining)
+        info.update(corpus=len(corpus), document=len(members))
+    for position, match in corpus.items():
+        verdict = json.loads(match.pop("response"))
+        yield position, inherit(position, verdict, dict(match, scope="corpus"))
+    followers = {}
+    for member, (representative, score) in members.items():
+        followers.setdefault(representative, []).append((member, score))
+    todo = [n for n in remaining if n not in corpus and n not in members]
+    pre_classifier.record_llm(len(todo))
+
+    if CLASSIFY_BATCH_SIZE > 1:
+        await _schedule_batches([clauses[n] for n in todo], llm)
+
+    # All clauses are sent at once; the gateway enforces concurrency and rate limits
+    pending = {asyncio.ensure_future(run(n, *clauses[n])) for n in todo}
+    classified = []
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                position, response = task.result()
+                yield position, response
+                if "error" not in response:
+                    classified.append(position)
+                verdict = {k: v for k, v in response.items() if k not in ("id", "original_clause", "decided_by", "number", "heading", "start_idx", "end_idx")}
+                for member, score in followers.pop(position, []):
+                    if "error" in response:
+                        # no verdict to share: the member is classified on its own
+                        pending.add(asyncio.ensure_future(run(member, *clauses[member])))
+                        continue
+                    source = {"scope": "document", "uid": uid, "clause_id": clauses[position][0], "similarity": round(score, 3)}
+                    yield member, inherit(member, verdict, source)
+    finally:
+        # stop remaining calls if the consumer went away or a clause failed
+        for task in pending:
+            task.cancel()
+
+    # later documents can inherit these verdicts
+    items = [
+        (cache_key(CLASSIFY_MODEL, PROMPT_VERSION, clauses[n][1], CLASSIFY_TEMPERATURE), uid, clauses[n][0], signatures[n])
+        for n in classified if n in signatures
+    ]
+    if items:
+        await asyncio.to_thread(near_duplicates.remember, items, RESULT_VERSION)
+
+def _near_duplicates(clauses: list, positions: list):
+    """
+    Find the clauses (at `positions`) that can inherit a verdict. Clauses
+    whose exact text is already in the LLM cache are left alone: classifying
+    them costs nothing.
+
+    Returns:
+        tuple: (signatures, corpus, members) where signatures maps positions
+               to MinHash signatures, corpus maps positions to the matching
+               clause of an earlier document ("uid", "clause_id", "similarity"
+               and its cached "response"), and members maps positions to
+               (representative position, similarity) within this document.
+    """
+    if not CLUSTER_ENABLED:
+        return {}, {}, {}
+    todo = [
+        n for n in positions
+        if llm_cache.get(cache_key(CLASSIFY_MODEL, PROMPT_VERSION, clauses[n][1], CLASSIFY_TEMPERATURE), record_stats=False) is None
+    ]
+    signatures = {}
+    for n in todo:
+        signature = near_duplicates.signature(clauses[n][1])
+        if signature is not None:
+            signatures[n] = signature
+
+    corpus = {}
+    for n, match in near_duplicates.corpus_matches(signatures, RESULT_VERSION).items():
+        # the source verdict may have been evicted from the cache since
+        response = llm_cache.get(match.pop("cache_key"), record_stats=False)
+        if response is not None:
+            corpus[n] = dict(match, response=response)
+
+    left = [n for n in todo if n not in corpus]
+    clusters = near_duplicates.cluster([signatures.get(n) for n in left])
+    members = {left[m]: (left[r], score) for m, (r, score) in clusters.items()}
+    return signatures, corpus, members
+
+def _attach_offsets(response: dict, clause_id: str, segments: dict) -> dict:
+    # Number and heading (used for report titles) and offsets into the
+    # document text, when the segmenter recorded them
+    segment = segments.get(clause_id, {})
+    for key in ("number", "heading"):
+        if segment.get(key):
+            response[key] = segment[key]
+    if segment.get("start_idx") is not None:
+        response["start_idx"] = segment["start_idx"]
+        response["end_idx"] = segment.get("end_idx")
+    return response
+
+def diff_previous_version(uid: str, clauses: list):
+    """
+    Match the clauses of `uid` against the previous version of the same document.
 
+    Args:
+        uid (str): The unique identifier of the document.
+        clauses (list): (clause id, clause text) pairs from load_clauses.
+
+    Returns:
+        tuple: (matches, previous) where matches holds one (previous clause id
+               or None, "unchanged"|"changed"|"new") per clause and previous maps
+               the previous version's clause ids to their stored analysis.
+               (None, {}) if this is the first version.
+    """
+    previous_uid = doc_store.previous_version(uid)
+    if previous_uid is None:
+        return None, {}
     try:
-        for txt_file in sorted(txt_files):  # Sort files to process them in order
-            file_path = os.path.join(folder_path, txt_file)
-
-            # Read the content of the .txt file
-            with open(file_path, "r") as f:
-                content = f.read().strip()
-
-            # Prepare the prompt for the Groq LLM
-            prompt = prepare_groq_prompt(content)
-            # logger.info("Sending prompt to Groq LLM: %s", prompt)
-
-            # Send the content to the Groq LLM
-            response = groq_client.chat.completions.create(
-                model="llama-3.1-8b-instant",  # Replace with the appropriate model
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=512
-            )
-
-            # logger.info("Groq LLM Response for %s: %s", txt_file, response)
-
-            # Extract the LLM response content
-            if response.choices and response.choices[0].message.content:
-                llm_response = response.choices[0].message.content.strip()
-
-                # Parse the LLM response JSON
-                try:
-                    llm_response_json = json.loads(llm_response)
-                except json.JSONDecodeError:
-                    raise HTTPException(
-                        status_code=500,
-                        detail=f"Invalid JSON response from Groq LLM for file {txt_file}"
-                    )
-
-                # Add the original clause and file ID to the response
-                llm_response_json["original_clause"] = content
-                llm_response_json["id"] = txt_file
-
-                responses.append(llm_response_json)
-                time.sleep(0.5)  # To avoid hitting rate limits
-            else:
-                responses.append({
-                    "id": txt_file,
-                    "original_clause": content,
-                    "error": "No response from Groq LLM"
-                })
+        old_clauses = load_clauses(previous_uid)
+    except FileNotFoundError:
+        return None, {}
 
-    except Exception as e:
-        logger.error("Error processing files in folder %s: %s", uid, str(e))
-        raise HTTPException(status_code=500, detail=f"Error processing files: {str(e)}")
+    record = load_result(previous_uid, RESULT_VERSION)
+    previous = {clause["id"]: clause for clause in record["clauses"]} if record else {}
+    matches = match_clauses([content for _, content in old_clauses], [content for _, content in clauses])
+    return [(old_clauses[i][0] if i is not None else None, change) for i, change in matches], previous
 
+async def iter_results(uid: str, clauses: list, segments: dict, llm: LLMGateway):
+    """
+    Like iter_classified, but clauses that are unchanged since the previous
+    version of the document reuse its analysis instead of being classified
+    again. When there is a previous version every response carries "change"
+    and "previous_id".
+
+    Yields:
+        tuple: (position in `clauses`, response dict); carried-over clauses first.
+    """
+    matches, previous = await asyncio.to_thread(diff_previous_version, uid, clauses)
+    if matches is None:
+        async for item in iter_classified(uid, clauses, segments, llm):
+            yield item
+        return
+
+    def mark(position: int, response: dict) -> dict:
+        response["previous_id"], response["change"] = matches[position]
+        return response
+
+    todo = []
+    for position, (clause_id, content) in enumerate(clauses):
+        previous_id, change = matches[position]
+        carried = previous.get(previous_id) if change == "unchanged" else None
+        if carried is None or "error" in carried:
+            todo.append(position)
+            continue
+        response = dict(carried, id=clause_id, original_clause=content)
+        yield position, mark(position, _attach_offsets(response, clause_id, segments))
+
+    logger.info("%s: %d of %d clauses carried over from the previous version", uid, len(clauses) - len(todo), len(clauses))
+    async for n, response in iter_classified(uid, [clauses[p] for p in todo], segments, llm):
+        yield todo[n], mark(todo[n], response)
+
+async def classify_clauses(uid: str, llm: LLMGateway) -> list:
+    """
+    Load the clauses of a document, classify them
+    concurrently with the Groq LLM, and return an array of objects with the LLM responses.
+    Clauses unchanged since the previous version of the document are not re-sent.
+
+    Args:
+        uid (str): The unique identifier of the document.
+        llm (LLMGateway): Gateway used for LLM calls.
+
+    Returns:
+        list: A list of objects containing the LLM responses, in document order.
+
+    Raises:
+        FileNotFoundError: If the document has no clauses.
+        ValueError: If the LLM returns invalid JSON for a clause.
+    """
+    clauses = await asyncio.to_thread(load_clauses, uid)
+    segments = await asyncio.to_thread(load_segments, uid)
+    responses = [None] * len(clauses)
+    async for position, response in iter_results(uid, clauses, segments, llm):
+        responses[position] = response
     return responses
 
-def prepare_groq_prompt(extracted_text: str) -> str:
+async def classify_clause(clause_id: str, content: str, llm: LLMGateway) -> dict:
     """
-    Prepare a strict legal clause analysis prompt for the Groq LLM.
+    Classify a single clause with the Groq LLM, reusing a cached response
+    when the same clause text was classified before.
 
     Args:
-        extracted_text (str): The text extracted from the PDF.
+        clause_id (str): Identifier returned as "id" (e.g. "3.txt").
+        content (str): The clause text.
+        llm (LLMGateway): Gateway used for LLM calls.
 
     Returns:
-        str: The formatted prompt for the Groq LLM.
+        dict: The parsed LLM response plus "original_clause" and "id".
+    """
+    key = cache_key(CLASSIFY_MODEL, PROMPT_VERSION, content, CLASSIFY_TEMPERATURE)
+    llm_response = await asyncio.to_thread(llm_cache.get, key)
+    if llm_response is None:
+        # identical clauses being classified right now (same document, or the
+        # pipeline and a stream at once) share one LLM call
+        call = _clause_inflight.get(key)
+        if call is None:
+            call = asyncio.ensure_future(_complete_clause(key, content, llm))
+            _clause_inflight[key] = call
+            call.add_done_callback(lambda _: _clause_inflight.pop(key, None))
+        llm_response = await asyncio.shield(call)
+
+    if not llm_response:
+        return {
+            "id": clause_id,
+            "original_clause": content,
+            "error": "No response from Groq LLM"
+        }
+
+    # Parse the LLM response JSON
+    try:
+        llm_response_json = json.loads(llm_response)
+    except json.JSONDecodeError:
+        raise ValueError(f"Invalid JSON response from Groq LLM for file {clause_id}")
+
+    # Add the original clause and file ID to the response
+    llm_response_json["original_clause"] = content
+    llm_response_json["id"] = clause_id
+    return llm_response_json
+
+async def _complete_clause(key: str, content: str, llm: LLMGateway):
+    # Prepare the prompt for the Groq LLM and send it through the gateway
+    llm_response = await llm.complete(
+        prepare_groq_prompt(content),
+        model=CLASSIFY_MODEL,
+        temperature=CLASSIFY_TEMPERATURE,
+    )
+    if llm_response:
+        try:
+            json.loads(llm_response)
+            await asyncio.to_thread(llm_cache.set, key, llm_response)
+        except json.JSONDecodeError:
+            pass
+    return llm_response
+
+async def _schedule_batches(clauses: list, llm: LLMGateway):
+    """
+    Claim the uncached clauses and classify them in batched requests. Each
+    claimed clause gets an in-flight entry, so classify_clause just awaits it.
+    """
+    keys = {cache_key(CLASSIFY_MODEL, PROMPT_VERSION, content, CLASSIFY_TEMPERATURE): content for _, content in clauses}
+    cached = await asyncio.to_thread(
+        lambda: {key for key in keys if llm_cache.get(key, record_stats=False) is not None}
+    )
+    # claims are checked after the lookup: another run may have taken some meanwhile
+    todo = {key: content for key, content in keys.items() if key not in cached and key not in _clause_inflight}
+    if len(todo) < 2:
+        return
+
+    loop = asyncio.get_running_loop()
+    batches = make_batches(
+        list(todo.items()),
+        cost=lambda item: estimate_tokens(item[1]),
+        token_budget=CLASSIFY_BATCH_TOKENS,
+        max_items=CLASSIFY_BATCH_SIZE,
+    )
+    for batch in batches:
+        futures = {key: loop.create_future() for key, _ in batch}
+        _clause_inflight.update(futures)
+        task = asyncio.ensure_future(_run_batch(batch, futures, llm))
+        _batch_tasks.add(task)
+        task.add_done_callback(_batch_tasks.discard)
+
+async def _run_batch(batch: list, futures: dict, llm: LLMGateway):
+    try:
+        results = await classify_batch(batch, llm)
+        for key, future in futures.items():
+            if not future.done():
+                future.set_result(results.get(key))
+    except Exception as e:
+        for future in futures.values():
+            if not future.done():
+                future.set_exception(e)
+    finally:
+        for key in futures:
+            _clause_inflight.pop(key, None)
+
+async def classify_batch(batch: list, llm: LLMGateway) -> dict:
+    """
+    Classify several clauses in one request. If the response cannot be parsed
+    the batch is split in half and retried; if only some entries are missing
+    or invalid, only those are retried. Single clauses use the normal prompt.
+
+    Args:
+        batch (list): (cache key, clause text) pairs.
+        llm (LLMGateway): Gateway used for LLM calls.
+
+    Returns:
+        dict: cache key -> JSON string for one clause (None if the LLM gave no answer).
+    """
+    if len(batch) == 1:
+        key, content = batch[0]
+        return {key: await _complete_clause(key, content, llm)}
+
+    llm_response = await llm.complete(
+        prepare_batch_prompt([content for _, content in batch]),
+        model=CLASSIFY_MODEL,
+        temperature=CLASSIFY_TEMPERATURE,
+        max_tokens=CLASSIFY_BATCH_OUTPUT_TOKENS * len(batch),
+    )
+    with span("parse_batch", clauses=len(batch)):
+        parsed = parse_batch_response(llm_response, len(batch))
+
+    results, failed = {}, []
+    for n, (key, content) in enumerate(batch, start=1):
+        if n not in parsed:
+            failed.append((key, content))
+            continue
+        # batch answers share the single-clause cache entry (same schema and rules)
+        results[key] = json.dumps(parsed[n])
+
+    if results:
+        await asyncio.to_thread(llm_cache.set_many, results)
+
+    if failed:
+        logger.warning("Batch of %d clauses: %d entries invalid, retrying", len(batch), len(failed))
+        if len(failed) == len(batch):
+            middle = len(batch) // 2
+            parts = await asyncio.gather(classify_batch(batch[:middle], llm), classify_batch(batch[middle:], llm))
+        else:
+            parts = [await classify_batch(failed, llm)]
+        for part in parts:
+            results.update(part)
+    return results
+
+def parse_batch_response(llm_response: str, count: int) -> dict:
     """
-    prompt = f"""
+    Validate a batched response against the clause schema.
+
+    Args:
+        llm_response (str): Raw LLM output, expected to be a JSON array.
+        count (int): Number of clauses in the batch.
+
+    Returns:
+        dict: clause number (1-based) -> validated analysis dict, for valid entries only.
+    """
+    parsed = {}
+    for item in parse_json_array(llm_response) or []:
+        try:
+            analysis = BatchClauseAnalysis.model_validate(item)
+        except ValidationError:
+            continue
+        if 1 <= analysis.id <= count and analysis.id not in parsed:
+            parsed[analysis.id] = analysis.model_dump(exclude={"id"})
+    return parsed
+
+def summarize(clauses: list) -> dict:
+    """
+    Aggregate counts for a list of classified clauses.
+    """
+    ratings = {"red": 0, "yellow": 0, "green": 0}
+    decided_by = {"rules": 0, "model": 0, "cluster": 0, "llm": 0}
+    severities = []
+    errors = 0
+    for clause in clauses:
+        if "error" in clause:
+            errors += 1
+        if clause.get("decided_by") in decided_by:
+            decided_by[clause["decided_by"]] += 1
+        if clause.get("rating") in ratings:
+            ratings[clause["rating"]] += 1
+        if isinstance(clause.get("severity"), (int, float)):
+            severities.append(clause["severity"])
+    return {
+        "total": len(clauses),
+        "ratings": ratings,
+        "errors": errors,
+        "max_severity": max(severities) if severities else None,
+        "avg_severity": round(sum(severities) / len(severities), 2) if severities else None,
+        # which tier rated each clause (carried-over clauses keep their original tier)
+        "decided_by": decided_by,
+    }
+
+# Shared instruction block for single and batched clause prompts
+CLAUSE_INSTRUCTIONS = """
 You are a strict, conservative clause analyst and legal reviewer. 
 Treat the following text as a single clause extracted from a legal document and analyze it with high scrutiny.
 
@@ -121,14 +721,14 @@ Your job:
 3. Produce output in machine-readable JSON (no extra prose) following the schema below. Keep items concise.
 
 Required JSON schema:
-{{
+{
   "rating": "red|yellow|green",
   "severity": integer,            # 1-10 scale (1=low, 10=high) indicating the level of risk/harm
   "detailed_rationale": "concise explanation (<= 200 words) pointing to specific risky language and how it creates harm",
   "risky_phrases": ["exact short quotes or key phrases from the clause that trigger concern"],
   "risk_types": ["Financial","Liability","Privacy","IP","Operational","Regulatory","Reputational","Performance","Other"],
   "confidence": "high|medium|low"
-}}
+}
 
 Rules & evaluation cues (apply strictly):
 - Red flags (usually -> rate red): unlimited or uncapped indemnity, unlimited liability, waiver of statutory rights, absolute/irrevocable assignment of IP without compensation, permanent/perpetual broad license to exploit user data/content, automatic renewals with penalty, unilateral amendment rights without notice/consent, mandatory broad data sharing or transfers without safeguards, mandatory arbitration + class action waiver (where relevant), criminal/excessive penalties, termination that leaves one party stranded, obligations requiring illegal acts.
@@ -142,16 +742,45 @@ Formatting & tone:
 - If clause is > 400 words, summarize and list the top 3 concerns only.
 
 Example output (format exactly as JSON):
-{{
+{
   "rating": "red",
   "severity": 8,
   "detailed_rationale": "The clause requires assignment of all user-created IP 'without limitation' and includes an uncapped indemnity 'hold harmless' for any claims. This transfers valuable rights with no compensation or termination remedy, and exposes the user to unlimited financial liability. Narrow the IP scope, add compensation/consideration, and cap indemnity to negligent acts.",
   "risky_phrases": ["'assign all rights, title and interest'", "'without limitation'", "'indemnify and hold harmless'"],
   "risk_types": ["IP","Financial","Liability"],
   "confidence": "high"
-}}
+}
 
-CLAUSE:
-{extracted_text}
 """
-    return prompt
\ No newline at end of file
+
+def prepare_groq_prompt(extracted_text: str) -> str:
+    """
+    Prepare a strict legal clause analysis prompt for the Groq LLM.
+
+    Args:
+        extracted_text (str): The text extracted from the PDF.
+
+    Returns:
+        str: The formatted prompt for the Groq LLM.
+    """
+    return f"{CLAUSE_INSTRUCTIONS}CLAUSE:\n{extracted_text}\n"
+
+def prepare_batch_prompt(clauses: list) -> str:
+    """
+    Prepare one prompt that asks for the analysis of several clauses.
+
+    Args:
+        clauses (list): Clause texts; they are numbered from 1 in this order.
+
+    Returns:
+        str: The formatted prompt for the Groq LLM.
+    """
+    numbered = "\n\n".join(f"[{n}]\n{text}" for n, text in enumerate(clauses, start=1))
+    return (
+        f"{CLAUSE_INSTRUCTIONS}"
+        f"BATCH MODE: below are {len(clauses)} separate clauses, each introduced by its number in brackets. "
+        "Analyze each clause independently using the rules above.\n"
+        "Respond with ONLY a JSON array containing exactly one object per clause, in the same order. "
+        "Each object must follow the schema above and add an integer \"id\" field equal to the clause number.\n\n"
+        f"CLAUSES:\n{numbered}\n"
+    )
@@ -0,0 +1,81 @@
+"""
+Portfolio-wide clause search
+GET /api/v1/search?q=indemnity&rating=red&uploaded_after=2026-07-01
+"""
+import asyncio
+import logging
+from datetime import date, datetime, time as dt_time
+from typing import Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from app.services.search import semantic_candidates
+from app.services.store import doc_store
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+def _epoch(day: Optional[date]) -> Optional[float]:
+    return datetime.combine(day, dt_time.min).timestamp() if day else None
+
+
+def run_search(q, rating, min_severity, max_severity, doc_type, risk_type,
+               uploaded_after, uploaded_before, semantic, page, page_size) -> dict:
+    filters = dict(
+        rating=rating,
+        min_severity=min_severity,
+        max_severity=max_severity,
+        doc_type=doc_type,
+        risk_type=risk_type,
+        created_after=_epoch(uploaded_after),
+        created_before=_epoch(uploaded_before),
+    )
+    offset = (page - 1) * page_size
+
+    candidates = semantic_candidates(q) if semantic and q else None
+    if semantic and q and candidates is None:
+        raise HTTPException(status_code=400, detail="Semantic search is not enabled (set SEARCH_EMBED_MODEL)")
+    if candidates is None:
+        total, items = doc_store.search.clauses(query=q, limit=page_size, offset=offset, **filters)
+    else:
+        # filter the nearest clauses, then page through them in similarity order
+        _, matched = doc_store.search.clauses(rowids=candidates, limit=len(candidates) or 1, **filters)
+        rank = {rowid: n for n, rowid in enumerate(candidates)}
+        matched.sort(key=lambda item: rank[item["rowid"]])
+        total, items = len(matched), matched[offset:offset + page_size]
+
+    for item in items:
+        item.pop("rowid", None)
+    return {"total": total, "page": page, "page_size": page_size, "items": items}
+
+
+@router.get("/search")
+async def search(
+    q: Optional[str] = Query(None, description="Words or \"quoted phrases\" to find in clause text, risky phrases and risk types"),
+    rating: Optional[Literal["red", "yellow", "green"]] = None,
+    min_severity: Optional[int] = Query(None, ge=1, le=10),
+    max_severity: Optional[int] = Query(None, ge=1, le=10),
+    doc_type: Optional[str] = None,
+    risk_type: Optional[str] = Query(None, description="e.g. Financial, Liability, Privacy"),
+    uploaded_after: Optional[date] = None,
+    uploaded_before: Optional[date] = Query(None, description="Exclusive"),
+    semantic: bool = Query(False, description="Rank by meaning instead of keywords (needs SEARCH_EMBED_MODEL)"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+):
+    """
+    Search classified clauses across every analysed document, without
+    calling the LLM. Keyword results are ranked by relevance; without `q`
+    the most severe clauses come first.
+
+    Returns:
+        dict: total, page, page_size and items (uid, doc_name, doc_type,
+              clause_id, rating, severity, risky_phrases, risk_types, snippet).
+    """
+    # SQLite (and embedding) work runs off the event loop
+    return await asyncio.to_thread(
+        run_search, q, rating, min_severity, max_severity, doc_type, risk_type,
+        uploaded_after, uploaded_before, semantic, page, page_size,
+    )
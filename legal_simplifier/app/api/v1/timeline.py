@@ -0,0 +1,106 @@
+"""
+Obligation and deadline timeline
+GET /api/v1/timeline/{uid}                            – every dated and undated event of one document
+GET /api/v1/timeline?days=30&kind=expiry&kind=notice  – occurrences in a date range across all documents
+"""
+import asyncio
+import logging
+from datetime import date, timedelta
+from typing import Dict, List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
+
+from app.api.v1.result import job_status
+from app.services.llm import LLMGateway, get_llm
+from app.services.metrics import span
+from app.services.store import doc_store
+from app.services.timeline import TIMELINE_VERSION, build_timeline
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+EventKind = Literal["effective", "expiry", "renewal", "notice", "payment", "termination", "other"]
+
+# uid -> running build, so concurrent requests for one document build it once
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+async def get_or_build_timeline(uid: str, llm: LLMGateway) -> dict:
+    """
+    Stored timeline of a document for the current parser version, building
+    it first if needed (documents analysed before the timeline stage existed).
+    """
+    timeline = await asyncio.to_thread(doc_store.timelines.get, uid)
+    if timeline is not None and timeline["version"] == TIMELINE_VERSION:
+        return timeline
+
+    task = _inflight.get(uid)
+    if task is None:
+        task = asyncio.ensure_future(build_timeline(uid, llm))
+        _inflight[uid] = task
+        task.add_done_callback(lambda _: _inflight.pop(uid, None))
+    return await asyncio.shield(task)
+
+
+@router.get("/timeline/{uid}")
+async def get_timeline(uid: str, llm: LLMGateway = Depends(get_llm)):
+    """
+    Timeline of one document: effective and expiry dates, and the notice,
+    renewal, payment and termination events found in its clauses. Events
+    without a start_date state a period (duration_days) that is not tied
+    to a known date.
+    """
+    document = await asyncio.to_thread(doc_store.get_document, uid)
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"No document found for UID {uid}")
+    job = job_status(uid)
+    if job is not None and job["status"] in ("queued", "running"):
+        return JSONResponse(status_code=202, content=job)
+
+    try:
+        with span("timeline", uid=uid):
+            timeline = await get_or_build_timeline(uid, llm)
+    except Exception as e:
+        logger.error("Could not build the timeline of %s: %s", uid, str(e))
+        raise HTTPException(status_code=500, detail=f"Could not build timeline: {str(e)}")
+    return dict(timeline, doc_name=document["doc_name"])
+
+
+@router.get("/timeline")
+async def timeline_range(
+    start: Optional[date] = Query(None, description="First day of the range (default: today)"),
+    end: Optional[date] = Query(None, description="Last day of the range, inclusive (default: start + days)"),
+    days: int = Query(30, ge=0, le=3660),
+    kind: Optional[List[EventKind]] = Query(None, description="Repeat to select several kinds"),
+    doc_type: Optional[str] = None,
+    all_versions: bool = Query(False, description="Include documents that have a newer version"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=500),
+):
+    """
+    Everything falling due in a date range across all documents, e.g. the
+    contracts expiring in the next 30 days (?kind=expiry). Answered from the
+    timeline interval index; a window event (e.g. a lock-in period) is
+    returned when it overlaps the range.
+
+    Returns:
+        dict: start, end, total, page, page_size and items (uid, doc_name,
+              doc_type, clause_id, kind, start_date, end_date, duration_days,
+              recurrence, text, source) in date order.
+    """
+    start = start or date.today()
+    end = end or start + timedelta(days=days)
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+
+    total, items = await asyncio.to_thread(
+        doc_store.timelines.range, start.toordinal(), end.toordinal(), kinds=kind, doc_type=doc_type,
+        latest_only=not all_versions, limit=page_size, offset=(page - 1) * page_size,
+    )
+    for item in items:
+        item["start_date"] = date.fromordinal(item.pop("start_day")).isoformat()
+        item["end_date"] = date.fromordinal(item.pop("end_day")).isoformat()
+    return {"start": start.isoformat(), "end": end.isoformat(), "total": total,
+            "page": page, "page_size": page_size, "items": items}
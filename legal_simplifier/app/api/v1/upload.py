@@ -1,28 +1,38 @@
-from fastapi import APIRouter, UploadFile, File, Form
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request
+from starlette.datastructures import UploadFile as FormFile
+from collections import Counter
+import asyncio
+import shutil
+import zipfile
 import uuid, os
-from app.models import UploadResp
-from PyPDF2 import PdfReader
-from groq import Groq  # Import the Groq module (ensure it's installed)
-import dotenv
+from app.models import BatchDocument, BatchResp, RejectedFile, UploadResp, JobResp
+from app.api.v1.result import get_or_compute_result, job_status
+from app.services.jobs import job_queue
+from app.services.llm import get_llm
+from app.services.metrics import span
+from app.services.segmenter import segment_clauses
+from app.services.store import doc_store
+from app.services.timeline import build_timeline
+from app.services.extraction import extract_pdf_to_file, iter_clean_lines, iter_pages
 import logging
 
-dotenv.load_dotenv()  # Load environment variables from a .env file
 router = APIRouter()
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Define the directory to store uploaded files and OCR results
+# Working directories for the uploaded PDF and its extracted text while the
+# pipeline runs; both are moved into the document store by the extract stage
 STORE_DIR = "store"
 OCR_DIR = "ocr_results"
 
-# Ensure the directories exist
-os.makedirs(STORE_DIR, exist_ok=True)
-os.makedirs(OCR_DIR, exist_ok=True)
-
-# Initialize the Groq client
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))  # Replace with your actual API key
+# Uploads are copied to disk in pieces of this many bytes, never read whole
+UPLOAD_CHUNK_SIZE = 1 << 20
+# Bulk uploads: most files per request (zip members included), and the most
+# uncompressed bytes accepted from one zip
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", 5000))
+BATCH_MAX_ZIP_BYTES = int(os.getenv("BATCH_MAX_ZIP_BYTES", 5 * 1024 ** 3))
 
 @router.post("/upload", response_model=UploadResp)
 async def upload_file(
@@ -30,145 +40,277 @@ async def upload_file(
     doc_name: str = Form(...),    # Match the field name "doc_name"
     doc_type: str = Form("nda"),  # Match the field name "doc_type"
 ):
+    """
+    Save the uploaded PDF and queue it for extract → segment → classify.
+    Returns immediately; poll /upload/{uid}/status or /result/{uid} for progress.
+    Uploads with the same doc_name are versions of one document; clauses that
+    did not change since the previous version keep their earlier analysis.
+    """
     uid = str(uuid.uuid4())
+    # the client's name is untrusted: keep only its last path component
+    filename = os.path.basename(file.filename or "")
     # Generate a unique filename
-    file_extension = file.filename.split(".")[-1]
-    unique_filename = f"{uid}_{file.filename}"
+    file_extension = filename.split(".")[-1]
+    if file_extension.lower() != "pdf":
+        raise HTTPException(status_code=415, detail="Unsupported file type")
+
+    unique_filename = f"{uid}_{filename}"
     file_path = os.path.join(STORE_DIR, unique_filename)
 
     # Ensure the store directory exists
     if not os.path.exists(STORE_DIR):
         os.makedirs(STORE_DIR)
 
-    with open(file_path, "wb") as f:
-        f.write(await file.read())
-
-    # Perform text extraction if the file is a PDF
-    if file_extension.lower() == "pdf":
-        extracted_text = extract_text_from_pdf(file_path)
-        ocr_file_path = os.path.join(OCR_DIR, f"{uid}.txt")
-
-        # Ensure the OCR directory exists
-        if not os.path.exists(OCR_DIR):
-            os.makedirs(OCR_DIR)
-
-        with open(ocr_file_path, "w") as ocr_file:
-            ocr_file.write(extracted_text)
+    with span("upload_copy"):
+        await asyncio.to_thread(_copy_to_disk, file.file, file_path)
 
-        # Prepare the Groq prompt
-        groq_prompt = prepare_groq_prompt(extracted_text)
-
-        # Call the Groq LLM directly
-        groq_response = call_groq_llm(groq_prompt, uid)
-        print("Groq Response:", groq_response)
-        return UploadResp(uid=uid, status="completed", message=groq_response)
-
-    return UploadResp(uid=uid, status="failed", message="Unsupported file type")
+    try:
+        version, previous_uid = await queue_document(uid, file_path, filename, doc_name, doc_type)
+    except asyncio.QueueFull:
+        raise HTTPException(status_code=503, detail="Processing queue is full, retry later")
+
+    return UploadResp(
+        uid=uid,
+        status="queued",
+        message=f"Document queued for processing (version {version} of {doc_name})",
+        version=version,
+        previous_uid=previous_uid,
+    )
 
-def extract_text_from_pdf(pdf_path: str) -> str:
+@router.post("/upload/batch", response_model=BatchResp)
+async def upload_batch(request: Request):
     """
-    Extract text directly from a PDF file using PyPDF2 and remove extra empty lines.
+    Upload many PDFs at once, as repeated "files" form fields and/or zip
+    archives of PDFs, and queue them all. Every file is streamed to disk.
+    Optional form field "doc_type" (default "nda") applies to all files; each
+    file's name is its doc_name, so re-uploading a file creates a new version.
+    Documents of one batch share the pipeline fairly with other uploads.
+    Poll GET /upload/batch/{batch_id} for progress.
     """
-    extracted_text = ""
-    try:
-        # Read the PDF file
-        reader = PdfReader(pdf_path)
-        for page_number, page in enumerate(reader.pages, start=1):
-            # Extract text from each page
-            text = page.extract_text()
-            extracted_text += f"{text}\n"
-
-        # Remove extra empty lines
-        lines = extracted_text.splitlines()
-        cleaned_lines = []
-        empty_line_count = 0
-
-        for line in lines:
-            if line.strip():  # Non-empty line
-                cleaned_lines.append(line)
-                empty_line_count = 0
-            else:  # Empty line
-                empty_line_count += 1
-                if empty_line_count <= 1:  # Allow only one empty line
-                    cleaned_lines.append(line)
-
-        extracted_text = "\n".join(cleaned_lines)
-
-    except Exception as e:
-        extracted_text = f"Error during text extraction: {str(e)}"
-    return extracted_text
-
-def prepare_groq_prompt(extracted_text: str) -> str:
+    batch_id = str(uuid.uuid4())
+    pending, rejected = [], []
+    async with request.form(max_files=BATCH_MAX_FILES, max_fields=BATCH_MAX_FILES) as form:
+        doc_type = form.get("doc_type") or "nda"
+        for file in form.getlist("files"):
+            if not isinstance(file, FormFile):
+                continue
+            name = os.path.basename(file.filename or "")
+            extension = name.rsplit(".", 1)[-1].lower()
+            if extension not in ("pdf", "zip"):
+                rejected.append(RejectedFile(filename=name, reason="Unsupported file type"))
+                continue
+            uid = str(uuid.uuid4())
+            file_path = os.path.join(STORE_DIR, f"{uid}_{name}")
+            await asyncio.to_thread(_copy_to_disk, file.file, file_path)
+            if extension == "pdf":
+                pending.append((uid, file_path, name))
+                continue
+            try:
+                pdfs, skipped = await asyncio.to_thread(_unpack_zip, file_path)
+            finally:
+                os.remove(file_path)
+            pending.extend(pdfs)
+            rejected.extend(skipped)
+
+    if len(pending) > BATCH_MAX_FILES or job_queue.depth() + len(pending) > job_queue.maxsize:
+        for _, file_path, _ in pending:
+            os.remove(file_path)
+        raise HTTPException(status_code=503, detail=f"Batch of {len(pending)} documents does not fit in the processing queue")
+
+    queued = 0
+    for uid, file_path, name in pending:
+        try:
+            await queue_document(uid, file_path, name, name, doc_type, batch_id=batch_id)
+            queued += 1
+        except asyncio.QueueFull:
+            rejected.append(RejectedFile(filename=name, reason="Processing queue is full"))
+
+    logger.info("Batch %s: %d documents queued, %d files rejected", batch_id, queued, len(rejected))
+    response = batch_status(batch_id)
+    response.rejected = rejected
+    return response
+
+@router.get("/upload/batch/{batch_id}", response_model=BatchResp)
+async def upload_batch_status(batch_id: str):
+    """
+    Aggregate progress and per-document status of a bulk upload.
     """
-    Prepare a prompt for the Groq LLM using the extracted text.
+    response = batch_status(batch_id)
+    if not response.total:
+        raise HTTPException(status_code=404, detail=f"No batch found for ID {batch_id}")
+    return response
+
+def batch_status(batch_id: str) -> BatchResp:
+    documents = []
+    for row in doc_store.batch_documents(batch_id):
+        live = job_status(row["uid"]) or {}
+        documents.append(BatchDocument(**dict(row, **{k: live[k] for k in ("status", "stage", "error") if k in live})))
+    counts = Counter(document.status for document in documents)
+    finished = counts["completed"] + counts["failed"]
+    return BatchResp(
+        batch_id=batch_id,
+        total=len(documents),
+        counts={status: counts[status] for status in ("queued", "running", "completed", "failed")},
+        progress=round(finished / len(documents), 4) if documents else 0.0,
+        documents=documents,
+    )
 
-    Args:
-        extracted_text (str): The text extracted from the PDF.
+async def queue_document(uid: str, file_path: str, filename: str, doc_name: str, doc_type: str,
+                         batch_id: str = None):
+    """
+    Register an uploaded PDF (already on disk) and put it on the job queue.
 
     Returns:
-        str: The formatted prompt for the Groq LLM.
-    """
-    prompt = (
-        "You are a clause extractor. "
-        "The following text has been extracted from a legal document. "
-        "Your task is to extract all the clauses from the document. "
-        "DO NOT CHANGE ANY WORDS. Return the clauses exactly as they appear in the document.\n\n"
-        f"Document Text:\n{extracted_text}\n\n"
-        "Provide the extracted clauses in the following format:\n"
-        "1. Clause one text...\n"
-        "2. Clause two text...\n"
-        "...\n\n"
-        "IMPORTANT: Ensure each clause starts with a number followed by a period (e.g., '1.', '2.', etc.). "
-        "Do not include any additional text or explanations."
-    )
-    return prompt
-
-import re
+        tuple: (version, previous uid) of the document under doc_name.
 
-def call_groq_llm(prompt: str, uid: str) -> str:
+    Raises:
+        asyncio.QueueFull: If the queue is at capacity (the file and the
+            document record are removed again).
     """
-    Call the Groq LLM using the chat completions API and save the response as individual clause files.
-
-    Args:
-        prompt (str): The prompt to send to the Groq LLM.
-        uid (str): The unique identifier for the folder structure.
+    version, previous_uid = doc_store.add_document(uid, doc_name, doc_type, filename, batch_id=batch_id)
+    try:
+        await job_queue.submit(
+            uid,
+            PIPELINE_STAGES,
+            group=batch_id,
+            file_path=file_path,
+            doc_name=doc_name,
+            doc_type=doc_type,
+        )
+    except asyncio.QueueFull:
+        os.remove(file_path)
+        doc_store.delete_document(uid)
+        raise
+    return version, previous_uid
+
+def _copy_to_disk(source, path: str):
+    # working directories are created on first use, not at import
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    source.seek(0)
+    with open(path, "wb") as f:
+        shutil.copyfileobj(source, f, UPLOAD_CHUNK_SIZE)
+
+def _unpack_zip(zip_path: str):
+    """
+    Extract the PDFs of a zip into STORE_DIR, one member at a time.
 
     Returns:
-        str: A success message or an error message.
+        tuple: ([(uid, file path, file name), ...], [RejectedFile, ...])
     """
+    pdfs, rejected = [], []
     try:
-        # Call the Groq LLM
-        response = groq_client.chat.completions.create(
-            model="llama-3.1-8b-instant",  # or another Groq-supported model
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
-            max_tokens=512
-        )
+        archive = zipfile.ZipFile(zip_path)
+    except zipfile.BadZipFile:
+        return pdfs, [RejectedFile(filename=os.path.basename(zip_path).split("_", 1)[-1], reason="Not a valid zip file")]
+
+    with archive:
+        members = [m for m in archive.infolist() if not m.is_dir()]
+        # declared sizes are checked up front so a zip bomb is never expanded
+        if sum(m.file_size for m in members) > BATCH_MAX_ZIP_BYTES:
+            return pdfs, [RejectedFile(filename=os.path.basename(zip_path).split("_", 1)[-1], reason="Zip is too large")]
+        for member in members:
+            name = os.path.basename(member.filename)
+            if not name.lower().endswith(".pdf") or name.startswith("."):
+                rejected.append(RejectedFile(filename=member.filename, reason="Unsupported file type"))
+                continue
+            uid = str(uuid.uuid4())
+            file_path = os.path.join(STORE_DIR, f"{uid}_{name}")
+            with archive.open(member) as source, open(file_path, "wb") as f:
+                shutil.copyfileobj(source, f, UPLOAD_CHUNK_SIZE)
+            pdfs.append((uid, file_path, name))
+    return pdfs, rejected
+
+@router.get("/upload/{uid}/status", response_model=JobResp)
+async def upload_status(uid: str):
+    """
+    Poll the processing state of an uploaded document.
+    """
+    status = job_status(uid)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"No job found for UID {uid}")
+    return JobResp(**status)
 
-        logger.info("Full Groq Response: %s", response)
+def extract_stage(job) -> None:
+    """
+    Pipeline stage: extract the PDF text and move the PDF and the text into
+    the document store.
+    """
+    # Ensure the OCR directory exists
+    if not os.path.exists(OCR_DIR):
+        os.makedirs(OCR_DIR)
 
-        # Extract the content from the response
-        if response.choices and response.choices[0].message.content:
-            raw_clauses = response.choices[0].message.content.strip()
+    pdf_path = job.context["file_path"]
+    ocr_file_path = os.path.join(OCR_DIR, f"{job.uid}.txt")
+    try:
+        with span("extract_text"):
+            extract_pdf_to_file(pdf_path, ocr_file_path)
+        with span("store_document"):
+            doc_store.put_pdf(job.uid, pdf_path)
+            doc_store.put_text_file(job.uid, ocr_file_path)
+    finally:
+        for path in (pdf_path, ocr_file_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+def segment_stage(job) -> None:
+    """
+    Pipeline stage: split the extracted text into clauses in the document store.
+    """
+    with span("segment_text") as info:
+        clauses = segment_clauses(doc_store.get_text(job.uid) or "")
+        info["clauses"] = len(clauses)
+    if not clauses:
+        raise RuntimeError("No clauses found in document")
+    with span("store_clauses"):
+        save_clauses(job.uid, clauses)
+
+async def classify_stage(job) -> None:
+    """
+    Pipeline stage: classify every clause and persist the result for GET /result/{uid}.
+    """
+    await get_or_compute_result(job.uid, get_llm())
 
-            # Use regex to extract clauses starting with a number followed by a period
-            clauses = re.findall(r"^\d+\.\s.*", raw_clauses, re.MULTILINE)
-        else:
-            return "No response from Groq LLM"
+async def timeline_stage(job) -> None:
+    """
+    Pipeline stage: extract dates and deadlines into the timeline index.
+    The result is already stored by now, so a failure here is recorded on
+    the job but does not fail it; GET /timeline/{uid} rebuilds on demand.
+    """
+    try:
+        with span("build_timeline", uid=job.uid):
+            await build_timeline(job.uid, get_llm())
+    except Exception as e:
+        logger.warning("Timeline of %s could not be built: %s", job.uid, str(e))
+        job._set(error=f"timeline: {str(e)}")
 
-        # Create a folder for the clauses
-        clause_dir = os.path.join(STORE_DIR, uid)
-        os.makedirs(clause_dir, exist_ok=True)
+PIPELINE_STAGES = [
+    ("extract", extract_stage),
+    ("segment", segment_stage),
+    ("classify", classify_stage),
+    ("timeline", timeline_stage),
+]
 
-        # Save each clause as a separate file
-        for idx, clause in enumerate(clauses, start=1):
-            clause_file = os.path.join(clause_dir, f"{idx}.txt")
-            with open(clause_file, "w") as f:
-                f.write(clause)
+def extract_text_from_pdf(pdf_path: str) -> str:
+    """
+    Extract text directly from a PDF file using PyPDF2 and remove extra empty lines.
+    Prefer extract_pdf_to_file for large documents; this keeps the whole text in memory.
+    """
+    try:
+        extracted_text = "\n".join(iter_clean_lines(iter_pages(pdf_path)))
+    except Exception as e:
+        extracted_text = f"Error during text extraction: {str(e)}"
+    return extracted_text
 
-        return f"Clauses saved successfully in {clause_dir}"
+def save_clauses(uid: str, clauses: list):
+    """
+    Store the clauses of a document, with their offsets into its text, in one batch.
 
-    except Exception as e:
-        logger.error("Error calling Groq LLM: %s", str(e))
-        return f"Error calling Groq LLM: {str(e)}"
-    
\ No newline at end of file
+    Args:
+        uid (str): The unique identifier of the document.
+        clauses (list): Segments returned by segment_clauses.
+    """
+    doc_store.put_clauses(uid, [
+        # ids keep the historic clause file name ("3.txt") that clients see as "id"
+        dict(clause, clause_id=f"{clause['id']}.txt")
+        for clause in clauses
+    ])
@@ -1,7 +1,30 @@
 import os
-from groq import Groq
+from dotenv import load_dotenv
 
+load_dotenv()
+
+# LLM provider – every router goes through app.services.llm, configured here
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-groq_client = Groq(api_key=GROQ_API_KEY)
+# "groq" for the real API, "stub" for the offline backend used in load tests
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq")
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.1-8b-instant")
+
+# HTTP connection pool shared by all LLM calls
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 30))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 5))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 32))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", 16))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", 60))
+
+# Concurrency, starting rate limits (corrected from response headers) and retries
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", os.getenv("CLASSIFY_CONCURRENCY", 8)))
+LLM_RPM = float(os.getenv("LLM_RPM", os.getenv("CLASSIFY_RPM", 30)))
+LLM_TPM = float(os.getenv("LLM_TPM", os.getenv("CLASSIFY_TPM", 6000)))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", os.getenv("CLASSIFY_MAX_RETRIES", 5)))
+
+# Worker processes started by server.py; the LLM rate limits above are
+# account-wide, so each worker takes an equal share
+WEB_WORKERS = max(1, int(os.getenv("WEB_WORKERS", 1)))
 
-client = Client(api_key=os.environ.get('GOOGLE_API_KEY'))
+# Simulated latency (seconds) of the stub backend
+LLM_STUB_LATENCY = float(os.getenv("LLM_STUB_LATENCY", 0.05))
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional, Literal
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Optional, Literal, Union
 
 class UploadReq(BaseModel):
     doc_name: str
@@ -9,14 +9,17 @@ class UploadResp(BaseModel):
     uid: str
     status: Literal["queued", "completed"]
     message: Optional[str] = None
+    version: Optional[int] = None
+    previous_uid: Optional[str] = None
 
+# Suggested rewrites are not part of a clause; they are served by
+# GET /api/v1/negotiate/{uid} (see NegotiateResp)
 class Clause(BaseModel):
     id: int
     original_text: str
     risk: Literal["red", "yellow", "green", "ghost"]
     type: str
     eli5: str
-    suggested_text: Optional[str] = None
     start_idx: Optional[int] = None
     end_idx: Optional[int] = None
 
@@ -26,4 +29,111 @@ class ResultResp(BaseModel):
     status: str
     parties: Optional[List[str]] = None
     clauses: List[Clause]
-    ghost_clauses: List[Clause] = Field(default_factory=list)
\ No newline at end of file
+    ghost_clauses: List[Clause] = Field(default_factory=list)
+
+class BatchDocument(BaseModel):
+    uid: str
+    filename: str
+    doc_name: Optional[str] = None
+    version: Optional[int] = None
+    status: Literal["queued", "running", "completed", "failed"]
+    stage: Optional[str] = None
+    error: Optional[str] = None
+
+class RejectedFile(BaseModel):
+    filename: str
+    reason: str
+
+class BatchResp(BaseModel):
+    batch_id: str
+    total: int
+    counts: dict                 # status -> number of documents
+    progress: float              # finished (completed or failed) / total
+    documents: List[BatchDocument]
+    rejected: List[RejectedFile] = Field(default_factory=list)
+
+class JobResp(BaseModel):
+    uid: str
+    status: Literal["queued", "running", "completed", "failed"]
+    stage: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+
+class ClauseAnalysis(BaseModel):
+    rating: Literal["red", "yellow", "green"]
+    severity: int = Field(ge=1, le=10)
+    detailed_rationale: str
+    risky_phrases: List[str] = Field(default_factory=list)
+    risk_types: List[str] = Field(default_factory=list)
+    confidence: Literal["high", "medium", "low"] = "medium"
+
+class BatchClauseAnalysis(ClauseAnalysis):
+    id: int
+
+class InheritedFrom(BaseModel):
+    scope: Literal["document", "corpus"]
+    uid: Optional[str] = None
+    clause_id: str
+    similarity: float
+    cache_key: Optional[str] = None
+
+class ClauseResult(BaseModel):
+    """
+    One item of GET /result/{uid}; keys that were never set are left out.
+    The analysis fields are typed loosely: single-clause LLM answers are
+    stored as returned, and a stored result must never fail to serialise.
+    """
+    model_config = ConfigDict(extra="allow")
+
+    id: str
+    original_clause: str
+    rating: Optional[str] = None          # "red", "yellow" or "green"
+    severity: Optional[Union[int, float]] = None
+    detailed_rationale: Optional[str] = None
+    risky_phrases: Optional[list] = None
+    risk_types: Optional[list] = None
+    confidence: Optional[str] = None
+    decided_by: Optional[Literal["rules", "model", "cluster", "llm"]] = None
+    inherited_from: Optional[InheritedFrom] = None   # verdict copied from a near-duplicate
+    change: Optional[Literal["unchanged", "changed", "new"]] = None  # vs the previous version
+    previous_id: Optional[str] = None
+    number: Optional[str] = None
+    heading: Optional[str] = None
+    start_idx: Optional[int] = None
+    end_idx: Optional[int] = None
+    error: Optional[str] = None
+
+class PhraseRewrite(BaseModel):
+    phrase: str
+    replacement: str
+    risk_type: str = "Other"
+
+class ClauseRewrite(BaseModel):
+    suggested_text: str
+    rewrites: List[PhraseRewrite] = Field(default_factory=list)
+
+class BatchClauseRewrite(ClauseRewrite):
+    id: int
+
+class Suggestion(BaseModel):
+    id: str
+    rating: Optional[str] = None
+    severity: Optional[int] = None
+    risk_types: Optional[List[str]] = None
+    risky_phrases: Optional[List[str]] = None
+    original_clause: Optional[str] = None
+    start_idx: Optional[int] = None
+    end_idx: Optional[int] = None
+    suggested_text: str
+    source: Literal["library", "llm"]
+    similarity: Optional[float] = None   # weakest phrase match of a library suggestion
+    rewrites: List[dict] = Field(default_factory=list)
+    status: Literal["proposed", "accepted", "rejected"] = "proposed"
+
+class NegotiateResp(BaseModel):
+    uid: str
+    etag: str                    # ETag of the result the suggestions were made for
+    total: int
+    sources: dict                # source -> number of suggestions
+    suggestions: List[Suggestion]
@@ -0,0 +1,63 @@
+"""
+Helpers for packing several items into one LLM request
+"""
+import json
+import re
+from typing import Any, Callable, List, Optional, Sequence, TypeVar
+
+T = TypeVar("T")
+
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+
+
+def make_batches(
+    items: Sequence[T],
+    cost: Callable[[T], int],
+    token_budget: int,
+    max_items: int,
+) -> List[List[T]]:
+    """
+    Greedily pack items, in order, into batches that stay within a token
+    budget and an item limit. An item larger than the budget gets a batch
+    of its own.
+
+    Args:
+        items (Sequence): Items to pack.
+        cost (Callable): Returns the estimated token cost of an item.
+        token_budget (int): Maximum summed cost per batch.
+        max_items (int): Maximum number of items per batch.
+
+    Returns:
+        list: List of batches (lists of items).
+    """
+    batches: List[List[T]] = []
+    current: List[T] = []
+    used = 0
+    for item in items:
+        item_cost = cost(item)
+        if current and (used + item_cost > token_budget or len(current) >= max_items):
+            batches.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += item_cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def parse_json_array(text: Optional[str]) -> Optional[List[Any]]:
+    """
+    Parse a JSON array from an LLM response, tolerating code fences and
+    text around the array. Returns None if no array can be parsed.
+    """
+    if not text:
+        return None
+    text = _FENCE_RE.sub("", text.strip())
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end <= start:
+        return None
+    try:
+        value = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    return value if isinstance(value, list) else None
@@ -0,0 +1,74 @@
+"""
+Token-aware, content-defined text chunking
+Chunk boundaries are chosen from line content rather than fixed offsets, so
+an edit only changes the chunk it falls in (plus the overlap of the next one)
+and the remaining chunks keep their cache keys.
+"""
+import zlib
+from typing import List
+
+from app.services.llm import estimate_tokens
+
+# Once a chunk has reached its minimum size, cut after a line whose hash
+# is divisible by this (on average every 8th line)
+_BOUNDARY_DIVISOR = 8
+
+
+def _split_long_line(line: str, max_tokens: int) -> List[str]:
+    width = max_tokens * 4
+    return [line[i:i + width] for i in range(0, len(line), width)] or [line]
+
+
+def chunk_text(text: str, target_tokens: int = 1500, overlap_tokens: int = 150) -> List[str]:
+    """
+    Split text into overlapping windows of roughly `target_tokens` tokens.
+
+    Args:
+        text (str): Text to split.
+        target_tokens (int): Typical chunk size; chunks are between half and
+            1.5x this size (excluding overlap).
+        overlap_tokens (int): Tokens of the previous chunk's tail repeated at
+            the start of the next chunk, so clauses spanning a boundary are
+            seen whole at least once.
+
+    Returns:
+        list: The chunks, in document order.
+    """
+    min_tokens = target_tokens // 2
+    max_tokens = target_tokens + target_tokens // 2
+
+    lines: List[str] = []
+    for line in text.splitlines():
+        if estimate_tokens(line) > max_tokens:
+            lines.extend(_split_long_line(line, max_tokens))
+        else:
+            lines.append(line)
+
+    bodies: List[List[str]] = []
+    current: List[str] = []
+    size = 0
+    for line in lines:
+        line_tokens = estimate_tokens(line)
+        if current and size + line_tokens > max_tokens:
+            bodies.append(current)
+            current, size = [], 0
+        current.append(line)
+        size += line_tokens
+        if size >= min_tokens and zlib.crc32(line.encode("utf-8")) % _BOUNDARY_DIVISOR == 0:
+            bodies.append(current)
+            current, size = [], 0
+    if current:
+        bodies.append(current)
+
+    chunks: List[str] = []
+    for n, body in enumerate(bodies):
+        overlap: List[str] = []
+        if n and overlap_tokens:
+            used = 0
+            for line in reversed(bodies[n - 1]):
+                used += estimate_tokens(line)
+                if used > overlap_tokens:
+                    break
+                overlap.insert(0, line)
+        chunks.append("\n".join(overlap + body))
+    return [chunk for chunk in chunks if chunk.strip()]
@@ -0,0 +1,73 @@
+"""
+Clause matching between two versions of a document
+Clauses are paired first by content hash (ignoring whitespace, case and the
+clause number), then by fuzzy similarity. Only hash matches count as
+"unchanged": in a contract a single word ("shall" -> "may") can change the
+risk, so fuzzy matches are "changed" and get re-analysed.
+"""
+import difflib
+import hashlib
+import os
+from collections import defaultdict
+from typing import List, Optional, Tuple
+
+from app.services.llm_cache import normalize_text
+
+# Minimum similarity for a reworded clause to be paired with its old version
+DIFF_MATCH_RATIO = float(os.getenv("DIFF_MATCH_RATIO", 0.6))
+
+
+def _strip_number(text: str) -> str:
+    # renumbering alone ("4." -> "5.") should not make a clause look changed
+    return normalize_text(text).lstrip("0123456789.() ").lower()
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(_strip_number(text).encode("utf-8")).hexdigest()
+
+
+def match_clauses(old: List[str], new: List[str]) -> List[Tuple[Optional[int], str]]:
+    """
+    Pair every clause of the new version with at most one clause of the old one.
+
+    Args:
+        old (list): Clause texts of the previous version.
+        new (list): Clause texts of the new version.
+
+    Returns:
+        list: For each new clause, (index into `old` or None, status) where
+              status is "unchanged", "changed" or "new".
+    """
+    result: List[Tuple[Optional[int], str]] = [(None, "new")] * len(new)
+    by_hash = defaultdict(list)
+    for i, text in enumerate(old):
+        by_hash[_hash(text)].append(i)
+
+    used = set()
+    unmatched = []
+    for j, text in enumerate(new):
+        candidates = by_hash.get(_hash(text))
+        if candidates:
+            i = candidates.pop(0)
+            used.add(i)
+            result[j] = (i, "unchanged")
+        else:
+            unmatched.append(j)
+
+    remaining = [i for i in range(len(old)) if i not in used]
+    for j in unmatched:
+        matcher = difflib.SequenceMatcher(autojunk=False)
+        matcher.set_seq2(_strip_number(new[j]))
+        best, best_ratio = None, DIFF_MATCH_RATIO
+        for i in remaining:
+            matcher.set_seq1(_strip_number(old[i]))
+            # cheap upper bounds first
+            if matcher.real_quick_ratio() < best_ratio or matcher.quick_ratio() < best_ratio:
+                continue
+            ratio = matcher.ratio()
+            if ratio >= best_ratio:
+                best, best_ratio = i, ratio
+        if best is not None:
+            remaining.remove(best)
+            result[j] = (best, "changed")
+    return result
@@ -0,0 +1,238 @@
+"""
+Near-duplicate clause clustering – one classification fans out to many clauses
+Template-driven contracts repeat the same clause with other party names,
+dates, amounts and numbering, which the exact-match LLM cache never hits.
+Clause text is normalised (placeholders for names, dates, amounts, numbers
+and numbering), cut into word shingles and summarised as a MinHash
+signature; LSH banding over the signatures finds candidate pairs without
+comparing every clause with every other one.
+    within a document – near-identical clauses form a cluster; only its
+                        first clause (the representative) is classified.
+    across the corpus – signatures of LLM-classified clauses are kept in the
+                        document store (clause_signatures, clause_lsh), so a
+                        clause close enough to one classified before reuses
+                        that verdict from the LLM cache.
+Candidates are confirmed on the estimated Jaccard similarity and must have
+the same number of negations, so "shall" and "shall not" never share a verdict.
+"""
+import hashlib
+import logging
+import os
+import random
+import re
+import struct
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.services.metrics import registry
+from app.services.store import DocumentStore, doc_store
+
+logger = logging.getLogger(__name__)
+
+# 0 classifies every clause on its own
+CLUSTER_ENABLED = os.getenv("CLUSTER_ENABLED", "1") == "1"
+# Estimated Jaccard similarity of normalised shingles needed to share a verdict,
+# within one document and with clauses of other documents
+CLUSTER_THRESHOLD = float(os.getenv("CLUSTER_THRESHOLD", 0.9))
+CLUSTER_CORPUS_THRESHOLD = float(os.getenv("CLUSTER_CORPUS_THRESHOLD", 0.95))
+# MinHash permutations and words per shingle
+CLUSTER_NUM_PERM = int(os.getenv("CLUSTER_NUM_PERM", 64))
+CLUSTER_SHINGLE_SIZE = int(os.getenv("CLUSTER_SHINGLE_SIZE", 3))
+# Shorter clauses (in words, after normalisation) are only matched exactly
+CLUSTER_MIN_WORDS = int(os.getenv("CLUSTER_MIN_WORDS", 12))
+
+_MASK64 = (1 << 64) - 1
+
+# (pattern, placeholder), applied in order
+_PLACEHOLDERS = [
+    # leading clause numbering: "12.3", "(a)", "IV."
+    (re.compile(r"^\s*(?:\d+(?:\.\d+)*\.?|\([a-z]{1,3}\)|[IVX]{1,6}\.)\s"), " "),
+    (re.compile(r"\[[^\]]{0,80}\]"), " <blank> "),
+    (re.compile(r"\b[\w.+-]+@[\w-]+\.[\w.-]+\b"), " <email> "),
+    (re.compile(r"\bhttps?://\S+"), " <url> "),
+    (re.compile(r"\b\d{1,2}(?:st|nd|rd|th)?\s+(?:day\s+of\s+)?(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?,?\s+\d{4}\b"
+                r"|\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4}\b"
+                r"|\b\d{1,4}[/.-]\d{1,2}[/.-]\d{2,4}\b", re.IGNORECASE), " <date> "),
+    (re.compile(r"(?:[$€£₹]|\b(?:rs\.?|inr|usd|eur|gbp)\s*)\s*\d[\d,]*(?:\.\d+)?(?:\s*(?:lakhs?|crores?|million|billion|k))?", re.IGNORECASE), " <amount> "),
+    # two or more capitalised words in a row: party names, places
+    (re.compile(r"\b[A-Z][\w&'.-]*(?:\s+(?:of\s+|&\s+)?[A-Z][\w&'.-]*)+"), " <name> "),
+    (re.compile(r"\d+(?:[.,]\d+)*(?:\s*%)?"), " <num> "),
+]
+_TOKEN_RE = re.compile(r"<\w+>|[a-z]+")
+_NEGATIONS = frozenset("not no never neither nor without except unless cannot".split())
+
+CLAUSES_INHERITED = registry.counter("clauses_inherited_total",
+                                     "Clauses whose verdict was copied from a near-duplicate, by scope")
+
+
+def normalize(text: str) -> List[str]:
+    """
+    Tokens of a clause with names, dates, amounts, numbers and its
+    numbering replaced by placeholders.
+    """
+    for pattern, placeholder in _PLACEHOLDERS:
+        text = pattern.sub(placeholder, text)
+    return _TOKEN_RE.findall(text.lower())
+
+
+def lsh_params(num_perm: int, threshold: float, recall: float = 0.95) -> Tuple[int, int]:
+    """
+    Bands and rows per band for the LSH index: the most rows per band (fewest
+    false candidates) that still make a pair at `threshold` a candidate with
+    probability `recall`.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if num_perm % rows == 0 and 1 - (1 - threshold ** rows) ** bands >= recall:
+            best = (bands, rows)
+    return best
+
+
+def similarity(a: Sequence[int], b: Sequence[int]) -> float:
+    """
+    Estimated Jaccard similarity of two MinHash signatures.
+    """
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+class NearDuplicates:
+    """
+    MinHash signatures, LSH buckets and the persistent corpus index.
+    """
+
+    def __init__(
+        self,
+        store: DocumentStore = doc_store,
+        num_perm: int = CLUSTER_NUM_PERM,
+        threshold: float = CLUSTER_THRESHOLD,
+        corpus_threshold: float = CLUSTER_CORPUS_THRESHOLD,
+        shingle_size: int = CLUSTER_SHINGLE_SIZE,
+        min_words: int = CLUSTER_MIN_WORDS,
+    ):
+        self.store = store
+        self.num_perm = num_perm
+        self.threshold = threshold
+        self.corpus_threshold = corpus_threshold
+        self.shingle_size = shingle_size
+        self.min_words = min_words
+        self.bands, self.rows = lsh_params(num_perm, min(threshold, corpus_threshold))
+        # fixed seed: signatures are stored and compared across processes and restarts
+        rng = random.Random(1)
+        self._perms = [(rng.getrandbits(64) | 1, rng.getrandbits(64)) for _ in range(num_perm)]
+
+    def signature(self, text: str) -> Optional[Tuple[Tuple[int, ...], int]]:
+        """
+        MinHash signature and negation count of a clause, or None if it is
+        too short to be matched approximately.
+        """
+        tokens = normalize(text)
+        if len(tokens) < self.min_words:
+            return None
+        size = self.shingle_size
+        hashes = {
+            int.from_bytes(hashlib.blake2b(" ".join(tokens[i:i + size]).encode("utf-8"), digest_size=8).digest(), "little")
+            for i in range(len(tokens) - size + 1)
+        }
+        signature = tuple(min(((a * h + b) & _MASK64) >> 32 for h in hashes) for a, b in self._perms)
+        return signature, sum(token in _NEGATIONS for token in tokens)
+
+    def buckets(self, signature: Sequence[int]) -> List[int]:
+        """
+        One LSH bucket id per band (signed 64-bit, as stored by SQLite).
+        """
+        rows = self.rows
+        return [
+            int.from_bytes(
+                hashlib.blake2b(struct.pack(f"<{rows + 1}I", band, *signature[band * rows:(band + 1) * rows]),
+                                digest_size=8).digest(),
+                "little", signed=True,
+            )
+            for band in range(self.bands)
+        ]
+
+    def cluster(self, signatures: List[Optional[Tuple[Tuple[int, ...], int]]]) -> Dict[int, Tuple[int, float]]:
+        """
+        Group near-identical clauses of one document.
+
+        The first clause of a cluster (in document order) is its
+        representative; a clause joins a cluster only if it is similar to
+        the representative itself, so clusters never drift through chains.
+
+        Args:
+            signatures (list): Results of signature() in document order.
+
+        Returns:
+            dict: member index -> (representative index, similarity).
+        """
+        by_bucket: Dict[int, List[int]] = {}
+        for n, entry in enumerate(signatures):
+            if entry is not None:
+                for bucket in self.buckets(entry[0]):
+                    by_bucket.setdefault(bucket, []).append(n)
+
+        members: Dict[int, Tuple[int, float]] = {}
+        for n, entry in enumerate(signatures):
+            if entry is None or n in members:
+                continue
+            candidates = {m for bucket in self.buckets(entry[0]) for m in by_bucket[bucket] if m > n}
+            for m in sorted(candidates):
+                if m in members or signatures[m][1] != entry[1]:
+                    continue
+                score = similarity(entry[0], signatures[m][0])
+                if score >= self.threshold:
+                    members[m] = (n, score)
+        return members
+
+    def corpus_matches(self, signatures: Dict[int, Tuple[Tuple[int, ...], int]], version: str) -> Dict[int, dict]:
+        """
+        Most similar clause classified before (with the same result version)
+        for each signature, if it is above the corpus threshold.
+
+        Args:
+            signatures (dict): index -> result of signature().
+            version (str): Result version the stored verdicts must have.
+
+        Returns:
+            dict: index -> {"cache_key", "uid", "clause_id", "similarity"}.
+        """
+        wanted = {n: self.buckets(entry[0]) for n, entry in signatures.items()}
+        candidates = self.store.signatures.candidates({b for buckets in wanted.values() for b in buckets}, version)
+        if not candidates:
+            return {}
+        by_bucket: Dict[int, List[dict]] = {}
+        for bucket, row in candidates:
+            by_bucket.setdefault(bucket, []).append(row)
+
+        matches = {}
+        for n, buckets in wanted.items():
+            signature, negations = signatures[n]
+            best = None
+            for row in {id(r): r for b in buckets for r in by_bucket.get(b, [])}.values():
+                if row["negations"] != negations:
+                    continue
+                score = similarity(signature, struct.unpack(f"<{self.num_perm}I", row["signature"]))
+                if score >= self.corpus_threshold and (best is None or score > best["similarity"]):
+                    best = {"cache_key": row["cache_key"], "uid": row["uid"], "clause_id": row["clause_id"],
+                            "similarity": round(score, 3)}
+            if best is not None:
+                matches[n] = best
+        return matches
+
+    def remember(self, items: List[Tuple[str, str, str, Tuple[Tuple[int, ...], int]]], version: str):
+        """
+        Add classified clauses to the corpus index.
+
+        Args:
+            items (list): (LLM cache key, uid, clause id, signature()) of
+                clauses whose verdict is in the LLM cache.
+            version (str): Result version of those verdicts.
+        """
+        self.store.signatures.add([
+            (key, version, uid, clause_id, negations,
+             struct.pack(f"<{self.num_perm}I", *signature), self.buckets(signature))
+            for key, uid, clause_id, (signature, negations) in items
+        ])
+
+
+# Shared by the classification pipeline
+near_duplicates = NearDuplicates()
@@ -0,0 +1,238 @@
+"""
+PDF text extraction engine
+Pages are produced lazily (optionally fanned out to a process pool), blank
+lines are collapsed in a single pass, and output can be streamed straight to
+a file so memory use does not grow with document size.
+Pages without a text layer (scans) are rasterised and OCR'd on the same
+process pool; OCR output is cached per rendered-page hash.
+"""
+import hashlib
+import logging
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional
+
+from app.services.llm_cache import LLMCache
+
+logger = logging.getLogger(__name__)
+
+# Process pool size for page extraction; 0 or 1 extracts in the calling thread
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", os.cpu_count() or 1))
+# Documents shorter than this are not worth the process hand-off
+EXTRACT_PARALLEL_MIN_PAGES = int(os.getenv("EXTRACT_PARALLEL_MIN_PAGES", 24))
+# Pages handled per pool task
+EXTRACT_CHUNK_PAGES = int(os.getenv("EXTRACT_CHUNK_PAGES", 8))
+
+# OCR for pages without a text layer
+OCR_ENABLED = os.getenv("OCR_ENABLED", "1") == "1"
+OCR_ENGINE = os.getenv("OCR_ENGINE", "tesseract")  # "tesseract" or "easyocr"
+OCR_LANGS = os.getenv("OCR_LANGS", "en").split(",")
+OCR_DPI = int(os.getenv("OCR_DPI", 300))
+# Pages whose text layer has fewer characters than this are OCR'd
+OCR_MIN_TEXT_CHARS = int(os.getenv("OCR_MIN_TEXT_CHARS", 20))
+# Maximum OCR pages in flight before extraction waits for results
+OCR_MAX_PENDING = int(os.getenv("OCR_MAX_PENDING", 2 * max(EXTRACT_WORKERS, 1)))
+OCR_CACHE_PATH = os.getenv("OCR_CACHE_PATH", "cache/ocr_cache.sqlite3")
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+# Per-worker-process state: OCR model and page cache are created once and reused
+_ocr_reader = None
+_ocr_cache: Optional[LLMCache] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=max(EXTRACT_WORKERS, 1))
+    return _pool
+
+
+def shutdown_pool():
+    """
+    Stop the extraction process pool (called on app shutdown).
+    """
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+def _extract_range(pdf_path: str, start: int, stop: int) -> List[str]:
+    # runs in a worker process: each task opens its own reader
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(pdf_path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def needs_ocr(text: str) -> bool:
+    """
+    True if a page has (almost) no text layer and is probably a scan.
+    """
+    return len(text.strip()) < OCR_MIN_TEXT_CHARS
+
+
+def _recognise(image) -> str:
+    global _ocr_reader
+    if OCR_ENGINE == "easyocr":
+        import numpy
+        if _ocr_reader is None:
+            import easyocr
+            _ocr_reader = easyocr.Reader(OCR_LANGS, gpu=False)
+        return "\n".join(_ocr_reader.readtext(numpy.array(image), detail=0, paragraph=True))
+
+    import pytesseract
+    # tesseract uses 3-letter codes ("eng"); accept "en" for parity with easyocr
+    langs = "+".join("eng" if lang == "en" else lang for lang in OCR_LANGS)
+    return pytesseract.image_to_string(image, lang=langs)
+
+
+def _ocr_page(pdf_path: str, index: int) -> str:
+    # runs in a worker process: render one page, then recognise it unless cached
+    global _ocr_cache
+    from pdf2image import convert_from_path
+
+    images = convert_from_path(pdf_path, dpi=OCR_DPI, first_page=index + 1, last_page=index + 1)
+    if not images:
+        return ""
+    image = images[0]
+
+    if _ocr_cache is None:
+        _ocr_cache = LLMCache(path=OCR_CACHE_PATH)
+    digest = hashlib.sha256(image.tobytes())
+    digest.update(f"{OCR_ENGINE}:{','.join(OCR_LANGS)}:{OCR_DPI}:{image.size}".encode("utf-8"))
+    key = digest.hexdigest()
+
+    text = _ocr_cache.get(key)
+    if text is None:
+        text = _recognise(image)
+        _ocr_cache.set(key, text)
+    return text
+
+
+def _ocr_result(future: Future, index: int, text_layer: str) -> str:
+    # fall back to whatever text layer the page had if OCR is unavailable or fails
+    try:
+        return future.result() or text_layer
+    except Exception as e:
+        logger.warning("OCR failed for page %d: %s", index + 1, str(e))
+        return text_layer
+
+
+def iter_pages(pdf_path: str, workers: int = EXTRACT_WORKERS, ocr: bool = OCR_ENABLED) -> Iterator[str]:
+    """
+    Yield the text of each page in order, OCR'ing pages that have no text layer.
+
+    Pages with a text layer cost nothing extra; scanned pages are sent to
+    the process pool as soon as they are found, and up to OCR_MAX_PENDING of
+    them are recognised in parallel while later pages keep being read.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+        workers (int): Process pool size for text-layer extraction.
+        ocr (bool): Whether to OCR pages without a text layer.
+
+    Yields:
+        str: Page text.
+    """
+    pending = deque()  # page text, or (future, index, text layer) for OCR in progress
+    for index, text in enumerate(_iter_text_layer(pdf_path, workers)):
+        if ocr and needs_ocr(text):
+            pending.append((_get_pool().submit(_ocr_page, pdf_path, index), index, text))
+        else:
+            pending.append(text)
+
+        ocr_in_flight = sum(1 for item in pending if not isinstance(item, str))
+        while pending and (isinstance(pending[0], str) or ocr_in_flight > OCR_MAX_PENDING):
+            item = pending.popleft()
+            if isinstance(item, str):
+                yield item
+            else:
+                ocr_in_flight -= 1
+                yield _ocr_result(*item)
+
+    while pending:
+        item = pending.popleft()
+        yield item if isinstance(item, str) else _ocr_result(*item)
+
+
+def _iter_text_layer(pdf_path: str, workers: int = EXTRACT_WORKERS) -> Iterator[str]:
+    """
+    Yield the text layer of each page in order.
+
+    Large documents are split into chunks of EXTRACT_CHUNK_PAGES pages and
+    extracted on the process pool, with at most two chunks per worker in
+    flight so finished pages are not buffered without bound.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+        workers (int): Process pool size; <= 1 extracts in the calling thread.
+
+    Yields:
+        str: Page text ("" for pages without a text layer).
+    """
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(pdf_path)
+    page_count = len(reader.pages)
+
+    if workers <= 1 or page_count < EXTRACT_PARALLEL_MIN_PAGES:
+        for page in reader.pages:
+            yield page.extract_text() or ""
+        return
+
+    del reader
+    pool = _get_pool()
+    ranges = [(i, min(i + EXTRACT_CHUNK_PAGES, page_count)) for i in range(0, page_count, EXTRACT_CHUNK_PAGES)]
+    window = max(2 * workers, 1)
+    pending = [pool.submit(_extract_range, pdf_path, a, b) for a, b in ranges[:window]]
+    next_range = len(pending)
+    while pending:
+        pages = pending.pop(0).result()
+        if next_range < len(ranges):
+            pending.append(pool.submit(_extract_range, pdf_path, *ranges[next_range]))
+            next_range += 1
+        yield from pages
+
+
+def iter_clean_lines(pages: Iterable[str]) -> Iterator[str]:
+    """
+    Split pages into lines and collapse runs of empty lines to a single one,
+    in one pass.
+    """
+    empty_line_count = 0
+    for text in pages:
+        # each page is terminated by a newline, as if the pages were concatenated
+        for line in (text + "\n").splitlines():
+            if line.strip():  # Non-empty line
+                empty_line_count = 0
+                yield line
+            else:  # Empty line
+                empty_line_count += 1
+                if empty_line_count <= 1:  # Allow only one empty line
+                    yield line
+
+
+def extract_pdf_to_file(pdf_path: str, out_path: str, workers: int = EXTRACT_WORKERS) -> int:
+    """
+    Extract a PDF's text and write it to `out_path` as pages arrive.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+        out_path (str): Destination text file (e.g. ocr_results/{uid}.txt).
+        workers (int): Process pool size.
+
+    Returns:
+        int: Number of characters written.
+    """
+    written = 0
+    tmp_path = out_path + ".part"
+    with open(tmp_path, "w", encoding="utf-8") as out:
+        for n, line in enumerate(iter_clean_lines(iter_pages(pdf_path, workers))):
+            chunk = line if n == 0 else "\n" + line
+            out.write(chunk)
+            written += len(chunk)
+    os.replace(tmp_path, out_path)
+    return written
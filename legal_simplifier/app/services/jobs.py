@@ -0,0 +1,235 @@
+"""
+Background job queue – runs document processing off the request path
+A job is a list of named stages (extract → segment → classify) that a
+bounded pool of asyncio workers executes in order. Job state is kept in
+memory while the job is waiting or running (plus the JOB_HISTORY most
+recently finished jobs) and can be polled by uid; set JobQueue.on_update
+to also persist it.
+Jobs are grouped (one group per bulk upload, single uploads on their own)
+and workers take jobs from the groups in turn, so a large batch cannot
+starve other uploads.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from app.services.metrics import registry, span, trace_id_var
+
+logger = logging.getLogger(__name__)
+
+# Number of documents processed at the same time
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+# Maximum number of jobs waiting for a worker before uploads are rejected
+# (a waiting job only holds the path of its uploaded file)
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", 5000))
+# Finished jobs kept in memory for polling; older ones are only in the store (on_update)
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", 1000))
+
+# A stage receives the job and either returns nothing or a value stored on job.result.
+# Plain functions run in a worker thread so they never block the event loop.
+StageFn = Callable[["Job"], Union[Any, Awaitable[Any]]]
+Stage = Tuple[str, StageFn]
+
+JOBS_FINISHED = registry.counter("jobs_finished_total", "Finished jobs by final status")
+JOB_QUEUE_WAIT = registry.histogram("job_queue_wait_seconds", "Time a job waited for a worker")
+
+
+class Job:
+    """
+    A single unit of work plus its pollable state.
+
+    Attributes:
+        uid (str): Document identifier, also the job identifier.
+        stages (list): Ordered (name, function) pairs to run.
+        context (dict): Free-form data shared between stages (file path, text, ...).
+        status (str): "queued", "running", "completed" or "failed".
+        stage (str | None): Name of the stage currently running (or last run).
+        error (str | None): Error message if the job failed, or of an optional
+            stage that failed without failing the job.
+        result (Any): Return value of the last stage that returned something.
+        trace_id (str): Trace id of the request that submitted the job.
+    """
+
+    def __init__(self, uid: str, stages: List[Stage], context: Dict[str, Any]):
+        self.uid = uid
+        self.stages = stages
+        self.context = context
+        self.status = "queued"
+        self.stage: Optional[str] = None
+        self.error: Optional[str] = None
+        self.result: Any = None
+        self.trace_id = trace_id_var.get()
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+
+    def _set(self, **fields):
+        for key, value in fields.items():
+            setattr(self, key, value)
+        self.updated_at = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "uid": self.uid,
+            "status": self.status,
+            "stage": self.stage,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class JobQueue:
+    """
+    Bounded round-robin queue over job groups, drained by a fixed number of
+    worker tasks.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, maxsize: int = JOB_QUEUE_SIZE, history: int = JOB_HISTORY):
+        self.workers = workers
+        self.maxsize = maxsize
+        self.history = history
+        # group -> waiting jobs; the group served next is at the front
+        self._groups: "OrderedDict[str, deque]" = OrderedDict()
+        self._pending = 0
+        self._ready: Optional[asyncio.Semaphore] = None
+        self._tasks: List[asyncio.Task] = []
+        # waiting and running jobs, and the most recently finished ones (oldest first)
+        self._jobs: Dict[str, Job] = {}
+        self._finished: "OrderedDict[str, Job]" = OrderedDict()
+        # called with job.to_dict() whenever a job changes state
+        self.on_update: Optional[Callable[[Dict[str, Any]], None]] = None
+
+    async def start(self):
+        """
+        Spawn the worker tasks. Safe to call more than once.
+        """
+        if self._tasks:
+            return
+        # counts waiting jobs, so idle workers sleep until one is submitted
+        self._ready = asyncio.Semaphore(self._pending)
+        self._tasks = [
+            asyncio.create_task(self._worker(n), name=f"job-worker-{n}")
+            for n in range(self.workers)
+        ]
+        logger.info("Started %d job workers (queue size %d)", self.workers, self.maxsize)
+
+    async def stop(self):
+        """
+        Cancel the worker tasks. Jobs still waiting in the queue are dropped.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._groups.clear()
+        self._pending = 0
+        self._ready = None
+
+    async def submit(self, uid: str, stages: List[Stage], group: Optional[str] = None, **context) -> Job:
+        """
+        Register a job and put it on the queue without waiting for a free slot.
+
+        Args:
+            uid (str): Document identifier.
+            stages (list): Ordered (name, function) pairs to run.
+            group (str, optional): Fair-share group (e.g. a batch id); defaults to the uid.
+            **context: Initial values for job.context.
+
+        Returns:
+            Job: The queued job.
+
+        Raises:
+            asyncio.QueueFull: If the queue is at capacity.
+        """
+        await self.start()
+        if self._pending >= self.maxsize:
+            raise asyncio.QueueFull
+        job = Job(uid, stages, context)
+        group = group or uid
+        if group not in self._groups:
+            self._groups[group] = deque()
+        self._groups[group].append(job)
+        self._pending += 1
+        self._jobs[uid] = job
+        await self._notify(job)
+        self._ready.release()
+        return job
+
+    def get(self, uid: str) -> Optional[Job]:
+        return self._jobs.get(uid) or self._finished.get(uid)
+
+    def depth(self) -> int:
+        return self._pending
+
+    def _next(self) -> Job:
+        # take from the front group, then move that group to the back
+        group, jobs = next(iter(self._groups.items()))
+        job = jobs.popleft()
+        if jobs:
+            self._groups.move_to_end(group)
+        else:
+            del self._groups[group]
+        self._pending -= 1
+        return job
+
+    def _retire(self, job: Job):
+        # a finished job stays pollable through the store; keep only the latest in memory
+        self._jobs.pop(job.uid, None)
+        if self.history <= 0:
+            return
+        self._finished[job.uid] = job
+        self._finished.move_to_end(job.uid)
+        while len(self._finished) > self.history:
+            self._finished.popitem(last=False)
+
+    async def _notify(self, job: Job):
+        if self.on_update is None:
+            return
+        try:
+            # on_update writes to SQLite; keep it off the event loop
+            await asyncio.to_thread(self.on_update, job.to_dict())
+        except Exception as e:
+            # losing a status update must not fail the job itself
+            logger.warning("Could not record state of job %s: %s", job.uid, str(e))
+
+    async def _worker(self, n: int):
+        while True:
+            await self._ready.acquire()
+            await self._run(self._next())
+
+    async def _run(self, job: Job):
+        # log lines of the job carry the trace id of the upload request
+        token = trace_id_var.set(job.trace_id)
+        JOB_QUEUE_WAIT.observe(time.time() - job.created_at)
+        job._set(status="running")
+        try:
+            for name, fn in job.stages:
+                job._set(stage=name)
+                await self._notify(job)
+                with span(name, uid=job.uid):
+                    if asyncio.iscoroutinefunction(fn):
+                        value = await fn(job)
+                    else:
+                        value = await asyncio.to_thread(fn, job)
+                if value is not None:
+                    job.result = value
+            job._set(status="completed")
+            await self._notify(job)
+            logger.info("Job %s completed", job.uid)
+        except Exception as e:
+            logger.error("Job %s failed in stage %s: %s", job.uid, job.stage, str(e))
+            job._set(status="failed", error=str(e))
+            await self._notify(job)
+        finally:
+            JOBS_FINISHED.inc(status=job.status)
+            self._retire(job)
+            trace_id_var.reset(token)
+
+
+# Shared queue used by the upload pipeline
+job_queue = JobQueue()
+
+registry.gauge("job_queue_depth", "Jobs waiting for a worker", callback=lambda: {(): job_queue.depth()})
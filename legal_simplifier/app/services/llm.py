@@ -0,0 +1,467 @@
+"""
+Shared async LLM gateway
+One process-wide gateway (see get_llm) owns the HTTP connection pool, the
+concurrency limit, the rate-limit buckets and the retry policy for every LLM
+call. The provider sits behind a small backend interface; "groq" talks to
+the real API and "stub" answers locally so the pipeline can be load-tested
+offline. Routers receive the gateway through FastAPI dependency injection.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+from typing import AsyncIterator, Dict, List, Mapping, Optional
+
+from app import config
+from app.services.metrics import registry
+from app.services.ratelimit import TokenBucket, backoff_delay, parse_duration
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~4 characters per token) used for rate limiting.
+    """
+    return len(text) // 4 + 1
+
+
+LLM_LATENCY = registry.histogram("llm_request_duration_seconds", "Latency of single LLM backend calls")
+LLM_WAIT = registry.histogram("llm_wait_seconds", "Time an LLM call waited for the concurrency and rate limits")
+LLM_REQUESTS = registry.counter("llm_requests_total", "LLM backend calls by outcome")
+LLM_RETRIES = registry.counter("llm_retries_total", "LLM calls retried after a rate-limit or transient error")
+LLM_TOKENS = registry.counter("llm_tokens_total", "Tokens reported by the backend, by direction (in/out)")
+LLM_FIRST_TOKEN = registry.histogram("llm_time_to_first_token_seconds", "Time from sending a streamed call to its first token")
+
+class LLMError(Exception):
+    """
+    Base class for backend errors the gateway knows how to handle.
+    """
+
+    def __init__(self, message: str, headers: Optional[Mapping[str, str]] = None):
+        super().__init__(message)
+        self.headers = headers or {}
+
+
+class LLMRateLimitError(LLMError):
+    """
+    429 from the provider; retried after backoff / retry-after.
+    """
+
+
+class LLMTransientError(LLMError):
+    """
+    5xx, timeout or connection failure; retried after backoff.
+    """
+
+
+class LLMResponse:
+    def __init__(self, text: Optional[str], headers: Optional[Mapping[str, str]] = None,
+                 prompt_tokens: int = 0, completion_tokens: int = 0):
+        self.text = text
+        self.headers = headers or {}
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+
+class LLMBackend:
+    """
+    Provider interface. Implementations raise LLMRateLimitError /
+    LLMTransientError for retryable failures.
+    """
+
+    name = "base"
+
+    async def complete(self, messages: List[Dict[str, str]], model: str, temperature: float,
+                       max_tokens: int, timeout: float) -> LLMResponse:
+        raise NotImplementedError
+
+    async def stream(self, messages: List[Dict[str, str]], model: str, temperature: float,
+                     max_tokens: int, timeout: float) -> AsyncIterator[LLMResponse]:
+        """
+        Yield the completion in pieces as the provider produces it: each item
+        carries a text delta (or None), headers when known and token usage
+        on the item that reports it. Backends without streaming yield the
+        whole answer at once.
+        """
+        yield await self.complete(messages, model, temperature, max_tokens, timeout)
+
+    async def aclose(self):
+        pass
+
+
+class GroqBackend(LLMBackend):
+    """
+    Groq chat completions over a tuned keep-alive connection pool.
+    """
+
+    name = "groq"
+
+    def __init__(self, api_key: Optional[str] = config.GROQ_API_KEY):
+        import groq
+        import httpx
+
+        self._groq = groq
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=config.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=config.LLM_MAX_KEEPALIVE,
+                keepalive_expiry=config.LLM_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(config.LLM_TIMEOUT, connect=config.LLM_CONNECT_TIMEOUT),
+        )
+        # retries are handled by the gateway so the SDK must not retry on its own
+        self._client = groq.AsyncGroq(api_key=api_key, http_client=self._http, max_retries=0)
+
+    async def complete(self, messages, model, temperature, max_tokens, timeout) -> LLMResponse:
+        groq = self._groq
+        try:
+            raw = await self._client.chat.completions.with_raw_response.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout=timeout,
+            )
+        except groq.RateLimitError as e:
+            raise LLMRateLimitError(str(e), e.response.headers) from e
+        except groq.InternalServerError as e:
+            raise LLMTransientError(str(e), e.response.headers) from e
+        except (groq.APIConnectionError, groq.APITimeoutError) as e:
+            raise LLMTransientError(str(e)) from e
+
+        response = await raw.parse()
+        text = None
+        if response.choices and response.choices[0].message.content:
+            text = response.choices[0].message.content.strip()
+        usage = getattr(response, "usage", None)
+        return LLMResponse(
+            text,
+            raw.headers,
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+        )
+
+    async def stream(self, messages, model, temperature, max_tokens, timeout):
+        groq = self._groq
+        try:
+            raw = await self._client.chat.completions.with_raw_response.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout=timeout,
+                stream=True,
+            )
+            chunks = await raw.parse()
+            yield LLMResponse(None, raw.headers)
+            async for chunk in chunks:
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                # Groq reports usage on the last chunk
+                usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+                yield LLMResponse(
+                    text,
+                    prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+                    completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+                )
+        except groq.RateLimitError as e:
+            raise LLMRateLimitError(str(e), e.response.headers) from e
+        except groq.InternalServerError as e:
+            raise LLMTransientError(str(e), e.response.headers) from e
+        except (groq.APIConnectionError, groq.APITimeoutError) as e:
+            raise LLMTransientError(str(e)) from e
+
+    async def aclose(self):
+        await self._http.aclose()
+
+
+class StubBackend(LLMBackend):
+    """
+    Offline backend: deterministic, schema-valid answers for the prompts used
+    in this app after a fixed delay. No network access.
+    """
+
+    name = "stub"
+    _RATINGS = ("green", "green", "yellow", "red")
+
+    def __init__(self, latency: float = config.LLM_STUB_LATENCY):
+        self.latency = latency
+        self.calls = 0
+
+    def _analysis(self, text: str) -> dict:
+        digest = int(hashlib.sha256(text.encode("utf-8")).hexdigest(), 16)
+        rating = self._RATINGS[digest % len(self._RATINGS)]
+        return {
+            "rating": rating,
+            "severity": {"green": 2, "yellow": 5, "red": 8}[rating],
+            "detailed_rationale": "Stub analysis.",
+            "risky_phrases": [],
+            "risk_types": ["Other"] if rating != "green" else [],
+            "confidence": "low",
+        }
+
+    def reply(self, prompt: str) -> str:
+        if "BATCH MODE" in prompt:
+            body = prompt.split("CLAUSES:\n", 1)[-1]
+            parts = re.split(r"^\[(\d+)\]\n", body, flags=re.MULTILINE)
+            items = [dict(self._analysis(text), id=int(n)) for n, text in zip(parts[1::2], parts[2::2])]
+            return json.dumps(items)
+        if "REWRITE MODE" in prompt:
+            body = prompt.split("CLAUSES:\n", 1)[-1]
+            parts = re.split(r"^\[(\d+)\]\n", body, flags=re.MULTILINE)
+            items = []
+            for n, text in zip(parts[1::2], parts[2::2]):
+                phrases = re.search(r"^Risky phrases: (.*)$", text, flags=re.MULTILINE).group(1)
+                clause = text.split("Clause: ", 1)[-1].strip()
+                rewrites = [{"phrase": p, "replacement": f"{p}, subject to mutual written agreement", "risk_type": "Other"}
+                            for p in phrases.split(" | ") if p != "none identified" and p in clause]
+                items.append({"id": int(n), "suggested_text": clause + " (subject to mutual written agreement)",
+                              "rewrites": rewrites})
+            return json.dumps(items)
+        if "TIMELINE MODE" in prompt:
+            ids = re.findall(r"^\[(\d+)\]$", prompt.split("SENTENCES:\n", 1)[-1], flags=re.MULTILINE)
+            return json.dumps([{"id": int(n), "events": []} for n in ids])
+        if "Contract Excerpt:" in prompt:
+            checklist, excerpt = prompt.split("Contract Excerpt:", 1)
+            names = re.findall(r"^- ([^:]+):", checklist, flags=re.MULTILINE)
+            return json.dumps([n for n in names if n.split()[0].lower() in excerpt.lower()])
+        if "CLAUSE:\n" in prompt:
+            return json.dumps(self._analysis(prompt.split("CLAUSE:\n", 1)[-1]))
+        return "This is a stub answer."
+
+    async def complete(self, messages, model, temperature, max_tokens, timeout) -> LLMResponse:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        prompt = messages[-1]["content"]
+        text = self.reply(prompt)
+        return LLMResponse(text, {}, prompt_tokens=estimate_tokens(prompt), completion_tokens=estimate_tokens(text))
+
+    async def stream(self, messages, model, temperature, max_tokens, timeout):
+        # first token after the configured latency, then word by word
+        response = await self.complete(messages, model, temperature, max_tokens, timeout)
+        for word in re.findall(r"\S+\s*", response.text):
+            yield LLMResponse(word)
+            await asyncio.sleep(0)
+        yield LLMResponse(None, prompt_tokens=response.prompt_tokens, completion_tokens=response.completion_tokens)
+
+
+def make_backend(name: str = config.LLM_BACKEND) -> LLMBackend:
+    if name == "stub":
+        return StubBackend()
+    if name == "groq":
+        return GroqBackend()
+    raise ValueError(f"Unknown LLM backend: {name}")
+
+
+class LLMGateway:
+    """
+    Concurrency- and rate-limit-aware front for an LLM backend.
+    """
+
+    def __init__(
+        self,
+        backend: LLMBackend,
+        concurrency: int = config.LLM_CONCURRENCY,
+        rpm: float = config.LLM_RPM,
+        tpm: float = config.LLM_TPM,
+        max_retries: int = config.LLM_MAX_RETRIES,
+        timeout: float = config.LLM_TIMEOUT,
+        share: float = 1.0,
+    ):
+        self.backend = backend
+        self.concurrency = concurrency
+        # share: fraction of the account's limits (as reported in the headers) this gateway may use
+        self.requests = TokenBucket(rpm, share=share)
+        self.tokens = TokenBucket(tpm, share=share)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # created lazily so the gateway can be built outside an event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def complete(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 512,
+        timeout: Optional[float] = None,
+    ) -> Optional[str]:
+        """
+        Send a single-message chat completion and return the text content.
+
+        Args:
+            prompt (str): User message.
+            model (str, optional): Model name; defaults to config.LLM_MODEL.
+            temperature (float): Sampling temperature.
+            max_tokens (int): Completion token limit.
+            timeout (float, optional): Per-request timeout in seconds.
+
+        Returns:
+            str | None: The stripped message content, or None if the response was empty.
+        """
+        messages = [{"role": "user", "content": prompt}]
+        cost = estimate_tokens(prompt) + max_tokens
+        waited = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            async with self.semaphore:
+                await self.requests.acquire()
+                await self.tokens.acquire(cost)
+                started = time.perf_counter()
+                LLM_WAIT.observe(started - waited)
+                try:
+                    response = await self.backend.complete(
+                        messages,
+                        model=model or config.LLM_MODEL,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        timeout=timeout or self.timeout,
+                    )
+                except (LLMRateLimitError, LLMTransientError) as e:
+                    if attempt == self.max_retries:
+                        self._record_failure(e, started)
+                        raise
+                    delay = self._retry_delay(e, attempt, started)
+                except Exception:
+                    LLM_REQUESTS.inc(outcome="error")
+                    raise
+                else:
+                    LLM_LATENCY.observe(time.perf_counter() - started, outcome="ok")
+                    LLM_REQUESTS.inc(outcome="ok")
+                    LLM_TOKENS.inc(response.prompt_tokens, direction="in")
+                    LLM_TOKENS.inc(response.completion_tokens, direction="out")
+                    self._update_limits(response.headers)
+                    return response.text
+            # the concurrency slot is free while waiting to retry
+            await asyncio.sleep(delay)
+            waited = time.perf_counter()
+
+    async def stream(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 512,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Like complete(), but yield the answer text as the backend produces it.
+
+        Failures before the first piece of text are retried like complete();
+        once text has been yielded a failure is raised to the caller.
+        """
+        messages = [{"role": "user", "content": prompt}]
+        cost = estimate_tokens(prompt) + max_tokens
+        waited = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            async with self.semaphore:
+                await self.requests.acquire()
+                await self.tokens.acquire(cost)
+                started = time.perf_counter()
+                LLM_WAIT.observe(started - waited)
+                first_token, prompt_tokens, completion_tokens, text_length = None, 0, 0, 0
+                try:
+                    async for chunk in self.backend.stream(
+                        messages,
+                        model=model or config.LLM_MODEL,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        timeout=timeout or self.timeout,
+                    ):
+                        if chunk.headers:
+                            self._update_limits(chunk.headers)
+                        prompt_tokens = chunk.prompt_tokens or prompt_tokens
+                        completion_tokens = chunk.completion_tokens or completion_tokens
+                        if chunk.text:
+                            if first_token is None:
+                                first_token = time.perf_counter()
+                                LLM_FIRST_TOKEN.observe(first_token - started)
+                            text_length += len(chunk.text)
+                            yield chunk.text
+                except (LLMRateLimitError, LLMTransientError) as e:
+                    if first_token is not None or attempt == self.max_retries:
+                        self._record_failure(e, started)
+                        raise
+                    delay = self._retry_delay(e, attempt, started)
+                except Exception:
+                    LLM_REQUESTS.inc(outcome="error")
+                    raise
+                else:
+                    LLM_LATENCY.observe(time.perf_counter() - started, outcome="ok")
+                    LLM_REQUESTS.inc(outcome="ok")
+                    LLM_TOKENS.inc(prompt_tokens or estimate_tokens(prompt), direction="in")
+                    LLM_TOKENS.inc(completion_tokens or text_length // 4, direction="out")
+                    return
+            # the concurrency slot is free while waiting to retry
+            await asyncio.sleep(delay)
+            waited = time.perf_counter()
+
+    def _record_failure(self, e: LLMError, started: float) -> str:
+        outcome = "rate_limited" if isinstance(e, LLMRateLimitError) else "transient_error"
+        LLM_LATENCY.observe(time.perf_counter() - started, outcome=outcome)
+        LLM_REQUESTS.inc(outcome=outcome)
+        return outcome
+
+    def _update_limits(self, headers):
+        # both buckets follow the provider's x-ratelimit-* headers
+        self.requests.update_from_headers(headers, kind="requests")
+        self.tokens.update_from_headers(headers, kind="tokens")
+
+    def _retry_delay(self, e: LLMError, attempt: int, started: float) -> float:
+        """
+        Record a failed call and return how long to wait before retrying it,
+        honouring retry-after and rate-limit headers.
+        """
+        outcome = self._record_failure(e, started)
+        LLM_RETRIES.inc(reason=outcome)
+        delay = backoff_delay(attempt)
+        self._update_limits(e.headers)
+        retry_after = parse_duration(e.headers.get("retry-after"))
+        if retry_after:
+            delay = max(delay, retry_after)
+            self.requests.pause(retry_after)
+            self.tokens.pause(retry_after)
+        logger.warning("LLM call failed (%s), retry %d in %.2fs", type(e).__name__, attempt + 1, delay)
+        return delay
+
+    async def aclose(self):
+        await self.backend.aclose()
+
+
+_gateway: Optional[LLMGateway] = None
+
+
+def get_llm() -> LLMGateway:
+    """
+    FastAPI dependency (and plain accessor for background jobs) returning the
+    process-wide gateway, created on first use.
+    """
+    global _gateway
+    if _gateway is None:
+        # each worker process gets its share of the account's rate limits
+        _gateway = LLMGateway(make_backend(), rpm=config.LLM_RPM / config.WEB_WORKERS,
+                              tpm=config.LLM_TPM / config.WEB_WORKERS, share=1 / config.WEB_WORKERS)
+        logger.info("LLM gateway ready (backend=%s, model=%s)", _gateway.backend.name, config.LLM_MODEL)
+    return _gateway
+
+
+def set_llm(gateway: Optional[LLMGateway]):
+    """
+    Replace the process-wide gateway (e.g. with a stub backend in tests).
+    """
+    global _gateway
+    _gateway = gateway
+
+
+async def close_llm():
+    global _gateway
+    if _gateway is not None:
+        await _gateway.aclose()
+        _gateway = None
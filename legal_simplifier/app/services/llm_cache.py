@@ -0,0 +1,215 @@
+"""
+Content-addressed LLM response cache
+Keyed on sha256(model, prompt version, normalized text, temperature).
+An in-memory LRU sits in front of a SQLite table; both tiers evict by
+size and TTL and keep hit/miss counters. The SQLite tier runs in WAL mode
+and is shared by all worker processes of server.py. A disk hit does not
+write: its LRU timestamp is queued and written with the next set() or
+once LLM_CACHE_TOUCH_BATCH hits are pending.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from app.services.metrics import labelled, registry
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "cache/llm_cache.sqlite3")
+LLM_CACHE_MEMORY_ITEMS = int(os.getenv("LLM_CACHE_MEMORY_ITEMS", 2048))
+LLM_CACHE_DISK_ITEMS = int(os.getenv("LLM_CACHE_DISK_ITEMS", 200_000))
+# 0 disables expiry
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 30 * 24 * 3600))
+# Seconds to wait for another process's write before giving up
+LLM_CACHE_TIMEOUT = float(os.getenv("LLM_CACHE_TIMEOUT", 10))
+# Disk hits whose accessed_at update is held back and written in one transaction
+LLM_CACHE_TOUCH_BATCH = int(os.getenv("LLM_CACHE_TOUCH_BATCH", 256))
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Collapse whitespace so that reflowed copies of a clause share a key.
+    """
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def cache_key(model: str, prompt_version: str, text: str, temperature: float) -> str:
+    """
+    Build the content address for an LLM call.
+
+    Args:
+        model (str): Model name.
+        prompt_version (str): Version tag of the prompt template.
+        text (str): The variable input (clause or document text).
+        temperature (float): Sampling temperature.
+
+    Returns:
+        str: Hex sha256 digest.
+    """
+    payload = json.dumps([model, prompt_version, normalize_text(text), round(float(temperature), 3)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Two-tier (memory LRU + SQLite) cache for LLM response strings.
+    """
+
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        memory_items: int = LLM_CACHE_MEMORY_ITEMS,
+        disk_items: int = LLM_CACHE_DISK_ITEMS,
+        ttl: float = LLM_CACHE_TTL,
+    ):
+        self.path = path
+        self.memory_items = memory_items
+        self.disk_items = disk_items
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        # key -> accessed_at of disk hits not yet written back
+        self._touched: Dict[str, float] = {}
+        self.stats: Dict[str, int] = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    def _conn(self) -> sqlite3.Connection:
+        # opened on first use so importing a router never touches the disk;
+        # reopened after a fork, a connection must not cross processes
+        if self._db is None or self._pid != os.getpid():
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=LLM_CACHE_TIMEOUT, check_same_thread=False)
+            self._pid = os.getpid()
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+            self._db.commit()
+        return self._db
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return bool(self.ttl) and now - created_at > self.ttl
+
+    def _remember(self, key: str, value: str, created_at: float):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get(self, key: str, record_stats: bool = True) -> Optional[str]:
+        """
+        Return the cached response for `key`, or None on a miss.
+        Pass record_stats=False for look-ahead checks that should not count
+        towards the hit/miss counters.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[1], now):
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += record_stats
+                    return entry[0]
+                del self._memory[key]
+
+            row = self._conn().execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and not self._expired(row[1], now):
+                self._touched[key] = now
+                if len(self._touched) >= LLM_CACHE_TOUCH_BATCH:
+                    self._write_touches(self._conn())
+                    self._conn().commit()
+                self._remember(key, row[0], row[1])
+                self.stats["disk_hits"] += record_stats
+                return row[0]
+
+            self.stats["misses"] += record_stats
+            return None
+
+    def set(self, key: str, value: str):
+        """
+        Store a response in both tiers and evict the least recently used
+        disk rows once the table is over its size limit.
+        """
+        self.set_many({key: value})
+
+    def set_many(self, items: Dict[str, str]):
+        """
+        Store several responses in one transaction (e.g. the answers of a batch).
+        """
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            for key, value in items.items():
+                self._remember(key, value, now)
+                db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now),
+                )
+                self.stats["writes"] += 1
+                # amortise eviction: only check every 100 writes
+                if self.stats["writes"] % 100 == 0:
+                    self._evict(db, now)
+            self._write_touches(db)
+            db.commit()
+
+    def _write_touches(self, db: sqlite3.Connection):
+        # LRU order on disk only needs to be roughly right, so touches are batched
+        if self._touched:
+            db.executemany("UPDATE llm_cache SET accessed_at = ? WHERE key = ?",
+                           [(at, key) for key, at in self._touched.items()])
+            self._touched.clear()
+
+    def flush(self):
+        """
+        Write pending LRU timestamps (e.g. before shutdown).
+        """
+        with self._lock:
+            if self._touched:
+                db = self._conn()
+                self._write_touches(db)
+                db.commit()
+
+    def _evict(self, db: sqlite3.Connection, now: float):
+        if self.ttl:
+            cur = db.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,))
+            self.stats["evictions"] += cur.rowcount
+        (count,) = db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        if count > self.disk_items:
+            cur = db.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                " SELECT key FROM llm_cache ORDER BY accessed_at LIMIT ?)",
+                (count - self.disk_items,),
+            )
+            self.stats["evictions"] += cur.rowcount
+
+    def hit_rate(self) -> float:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+
+# Shared by upload, result and insert-ghost
+llm_cache = LLMCache()
+
+registry.counter("llm_cache_events_total", "LLM cache lookups and maintenance by event",
+                 callback=lambda: labelled(llm_cache.stats, "event"))
+registry.gauge("llm_cache_hit_ratio", "Share of LLM cache lookups served from memory or disk",
+               callback=lambda: {(): round(llm_cache.hit_rate(), 4)})
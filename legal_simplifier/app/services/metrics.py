@@ -0,0 +1,223 @@
+"""
+Process metrics in the Prometheus text format, timing spans and trace ids
+Counters, gauges and histograms live in one registry that GET /metrics
+renders. span() times a block of code into the stage_duration_seconds
+histogram and logs one structured line per span. The trace id of the current
+request (or of the job it started) is kept in a context variable and added
+to every log record.
+"""
+import bisect
+import contextvars
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Log one line per finished span (stage, duration, trace id)
+METRICS_LOG_SPANS = os.getenv("METRICS_LOG_SPANS", "0") == "1"
+# Default latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+trace_id_var: contextvars.ContextVar = contextvars.ContextVar("trace_id", default="-")
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey, le: Optional[str] = None) -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in key]
+    if le is not None:
+        parts.append(f'le="{le}"')
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self.samples())
+
+
+class Counter(Metric):
+    """
+    Monotonic counter, incremented explicitly or read from a callback at
+    scrape time (for components that keep their own counts).
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, callback: Optional[Callable[[], Dict[LabelKey, float]]] = None):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+        self.callback = callback
+
+    def inc(self, amount: float = 1, **labels):
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        if self.callback is not None:
+            try:
+                values.update(self.callback())
+            except Exception as e:
+                logger.warning("Metric %s callback failed: %s", self.name, str(e))
+        return [f"{self.name}{_format_labels(k)} {v}" for k, v in sorted(values.items())]
+
+
+class Gauge(Counter):
+    """
+    Value that can go up and down; set explicitly or read from a callback.
+    """
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> (per-bucket counts, sum, count)
+        self._values: Dict[LabelKey, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = _key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    lines.append(f"{self.name}_bucket{_format_labels(key, str(bound))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, '+Inf')} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help_text: str, callback=None) -> Counter:
+        return self._register(Counter(name, help_text, callback))
+
+    def gauge(self, name: str, help_text: str, callback=None) -> Gauge:
+        return self._register(Gauge(name, help_text, callback))
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+registry = Registry()
+
+STAGE_DURATION = registry.histogram("stage_duration_seconds", "Time spent per pipeline stage / hot-path span")
+STAGE_ERRORS = registry.counter("stage_errors_total", "Spans that ended with an exception")
+
+
+def labelled(values: Dict[str, float], label: str) -> Dict[LabelKey, float]:
+    """
+    Turn {"a": 1, "b": 2} into callback samples labelled label="a", label="b".
+    """
+    return {_key({label: name}): value for name, value in values.items()}
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+@contextmanager
+def span(stage: str, **fields) -> Iterator[dict]:
+    """
+    Time a block into stage_duration_seconds{stage=...}.
+
+    The yielded dict can be filled with extra fields (counts, tokens, ...)
+    that are logged with the span when METRICS_LOG_SPANS=1.
+    """
+    info = dict(fields)
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield info
+    except BaseException:
+        failed = True
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_DURATION.observe(elapsed, stage=stage)
+        if METRICS_LOG_SPANS:
+            extra = " ".join(f"{k}={v}" for k, v in info.items())
+            logger.info("span stage=%s duration_ms=%.1f ok=%s %s", stage, elapsed * 1000, not failed, extra)
+
+
+class TraceIdFilter(logging.Filter):
+    """
+    Adds record.trace_id (the current request's or job's trace id, "-" if none).
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = trace_id_var.get()
+        return True
+
+
+def install_trace_logging(fmt: str = "%(levelname)s:%(name)s:[%(trace_id)s] %(message)s"):
+    """
+    Prefix every log line of the root handlers with the trace id.
+    """
+    root = logging.getLogger()
+    if not root.handlers:
+        logging.basicConfig(level=logging.INFO)
+    for handler in root.handlers:
+        handler.addFilter(TraceIdFilter())
+        handler.setFormatter(logging.Formatter(fmt))
@@ -0,0 +1,147 @@
+"""
+Import the legacy file layout into the document store
+    store/{uid}_{filename}.pdf   -> documents.pdf
+    store/{uid}/{n}.txt          -> clauses (plus offsets from segments.json)
+    ocr_results/{uid}.txt        -> documents.text
+    results/{uid}.json           -> results
+    store/versions.json          -> doc_name / version of each document
+
+Documents already in the store are skipped, so it is safe to run again.
+The source files are left in place.
+
+Usage (from legal_simplifier/):
+    python -m app.services.migrate [--store store] [--ocr ocr_results] [--results results]
+    python -m app.services.migrate --reindex    # rebuild the search index only
+    python -m app.services.migrate --timeline   # build missing timelines (parser only)
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+from typing import Dict, Optional
+
+from app.services.store import DocumentStore, doc_store
+
+logger = logging.getLogger(__name__)
+
+_UID_RE = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+
+def _read_json(path: str):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _clause_files(folder: str) -> list:
+    # numeric order: the old string sort put 10.txt before 2.txt
+    names = [f for f in os.listdir(folder) if f.endswith(".txt")]
+    return sorted(names, key=lambda name: (not name[:-4].isdigit(), int(name[:-4]) if name[:-4].isdigit() else 0, name))
+
+
+def migrate(store_dir: str = "store", ocr_dir: str = "ocr_results", results_dir: str = "results",
+            store: DocumentStore = doc_store) -> Dict[str, int]:
+    """
+    Copy every legacy document into `store`.
+
+    Returns:
+        dict: Counts of imported documents, clauses and results, and skipped documents.
+    """
+    counts = {"documents": 0, "clauses": 0, "results": 0, "skipped": 0}
+
+    pdfs: Dict[str, str] = {}
+    uids = set()
+    if os.path.isdir(store_dir):
+        for name in os.listdir(store_dir):
+            match = _UID_RE.match(name)
+            if not match:
+                continue
+            uid = match.group(0)
+            uids.add(uid)
+            if name.lower().endswith(".pdf"):
+                pdfs[uid] = name
+    if os.path.isdir(ocr_dir):
+        uids.update(name[:-4] for name in os.listdir(ocr_dir) if _UID_RE.match(name) and name.endswith(".txt"))
+
+    # doc_name of each uid, and upload order within a doc_name, from the version registry if present
+    doc_names: Dict[str, str] = {}
+    for doc_name, versioned in (_read_json(os.path.join(store_dir, "versions.json")) or {}).items():
+        for uid in versioned:
+            doc_names[uid] = doc_name
+
+    def created_at(uid: str) -> float:
+        paths = [os.path.join(store_dir, pdfs.get(uid, uid)), os.path.join(ocr_dir, f"{uid}.txt")]
+        return min((os.path.getmtime(p) for p in paths if os.path.exists(p)), default=0.0)
+
+    for uid in sorted(uids, key=created_at):
+        if store.get_document(uid) is not None:
+            counts["skipped"] += 1
+            continue
+
+        filename: Optional[str] = pdfs[uid][len(uid) + 1:] if uid in pdfs else None
+        doc_name = doc_names.get(uid) or filename or uid
+        store.add_document(uid, doc_name, filename=filename, created_at=created_at(uid))
+        if uid in pdfs:
+            store.put_pdf(uid, os.path.join(store_dir, pdfs[uid]))
+
+        text_path = os.path.join(ocr_dir, f"{uid}.txt")
+        if os.path.exists(text_path):
+            with open(text_path, "r") as f:
+                store.set_text(uid, f.read())
+
+        clause_dir = os.path.join(store_dir, uid)
+        if os.path.isdir(clause_dir):
+            segments = _read_json(os.path.join(clause_dir, "segments.json")) or {}
+            clauses = []
+            for name in _clause_files(clause_dir):
+                with open(os.path.join(clause_dir, name), "r") as f:
+                    clauses.append(dict(segments.get(name, {}), clause_id=name, text=f.read()))
+            store.put_clauses(uid, clauses)
+            counts["clauses"] += len(clauses)
+
+        record = _read_json(os.path.join(results_dir, f"{uid}.json"))
+        if record and "version" in record and "clauses" in record:
+            store.save_result(dict(record, uid=uid))
+            counts["results"] += 1
+
+        counts["documents"] += 1
+        logger.info("Imported %s (%s)", uid, doc_name)
+    return counts
+
+
+def build_timelines(store: DocumentStore = doc_store) -> int:
+    """
+    Build the timeline of every document that has clauses but no timeline
+    of the current version. Uses the local parser only, no LLM calls.
+    """
+    from app.services.timeline import TIMELINE_VERSION, build_timeline
+
+    uids = store.timelines.missing(TIMELINE_VERSION)
+
+    async def build_all():
+        for uid in uids:
+            await build_timeline(uid, None, store)
+
+    asyncio.run(build_all())
+    return len(uids)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Import store/, ocr_results/ and results/ into the document store")
+    parser.add_argument("--store", default="store")
+    parser.add_argument("--ocr", default="ocr_results")
+    parser.add_argument("--results", default="results")
+    parser.add_argument("--reindex", action="store_true", help="Rebuild the full-text search index from stored results")
+    parser.add_argument("--timeline", action="store_true", help="Build the timeline index of documents that lack one")
+    args = parser.parse_args()
+    if args.reindex:
+        print(json.dumps({"reindexed": doc_store.search.reindex()}))
+    elif args.timeline:
+        print(json.dumps({"timelines": build_timelines()}))
+    else:
+        print(json.dumps(migrate(args.store, args.ocr, args.results)))
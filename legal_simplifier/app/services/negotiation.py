@@ -0,0 +1,386 @@
+"""
+Negotiation – safer wording for red and yellow clauses
+Suggestions come from a library of vetted rewrites: a risky phrase, the
+wording to put in its place and the risk type it addresses. Each risky
+phrase of a clause is looked up among the entries for the clause's risk
+types and "Other" (an inverted index over normalised phrase words); when
+every phrase has a close enough entry, the suggested text is built by
+substitution and no LLM call is made.
+Only the remaining clauses go to the LLM, batched and through the LLM
+cache. Generated rewrites are not served to other documents until a user
+accepts them; their phrase-level rewrites then join the library, so the
+share of clauses answered from it grows over time. Entries that keep being
+rejected are retired.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+
+from app import config
+from app.models import BatchClauseRewrite
+from app.services.batching import make_batches, parse_json_array
+from app.services.clustering import normalize
+from app.services.llm import LLMGateway, estimate_tokens
+from app.services.llm_cache import cache_key, llm_cache
+from app.services.metrics import registry
+from app.services.store import DocumentStore, doc_store
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever generate_prompt changes
+NEGOTIATE_PROMPT_VERSION = "rewrite-v1"
+# Word overlap (Jaccard) between a risky phrase and a library phrase needed to use the entry
+NEGOTIATE_MATCH_THRESHOLD = float(os.getenv("NEGOTIATE_MATCH_THRESHOLD", 0.7))
+# 0 serves library suggestions only
+NEGOTIATE_LLM_FALLBACK = os.getenv("NEGOTIATE_LLM_FALLBACK", "1") == "1"
+# Unmatched clauses per LLM request, token budget for their text, completion tokens per clause
+NEGOTIATE_BATCH_SIZE = int(os.getenv("NEGOTIATE_BATCH_SIZE", 6))
+NEGOTIATE_BATCH_TOKENS = int(os.getenv("NEGOTIATE_BATCH_TOKENS", 2000))
+NEGOTIATE_OUTPUT_TOKENS = int(os.getenv("NEGOTIATE_OUTPUT_TOKENS", 400))
+# Library entries rejected this often (and more often than accepted) are retired
+NEGOTIATE_RETIRE_AFTER = int(os.getenv("NEGOTIATE_RETIRE_AFTER", 3))
+
+negotiate_model = config.LLM_MODEL
+negotiate_temperature = 0.2
+
+# Ratings that get a suggestion
+NEGOTIABLE = ("red", "yellow")
+
+# (risk type, phrase, replacement) – the red and yellow cues of the clause prompt
+SEED_REWRITES = [
+    ("Liability", "unlimited liability",
+     "liability capped at the total fees paid under this Agreement in the twelve (12) months preceding the claim"),
+    ("Liability", "uncapped indemnity",
+     "indemnity capped at the total fees paid under this Agreement in the twelve (12) months preceding the claim"),
+    ("Liability", "indemnify and hold harmless without limitation",
+     "indemnify and hold harmless, to the extent caused by its negligence or wilful misconduct and subject to the agreed liability cap,"),
+    ("Liability", "liability shall not be limited",
+     "liability shall be limited to direct damages not exceeding the fees paid in the preceding twelve (12) months"),
+    ("Regulatory", "waives all statutory rights", "retains all rights available to it under applicable law"),
+    ("Regulatory", "waiver of statutory rights", "preservation of all rights available under applicable law"),
+    ("Regulatory", "class action waiver",
+     "right to bring claims individually or collectively as permitted by applicable law"),
+    ("IP", "irrevocably assigns all rights title and interest",
+     "grants a non-exclusive licence, limited to the purposes of this Agreement, to"),
+    ("IP", "assigns all intellectual property without compensation",
+     "assigns the intellectual property created specifically under this Agreement, against payment of the agreed fees"),
+    ("Privacy", "perpetual irrevocable worldwide royalty-free licence to use data",
+     "limited licence, for the term of this Agreement, to use data solely to provide the services"),
+    ("Financial", "automatically renews with penalty",
+     "renews only with the written consent of both parties, without penalty for non-renewal"),
+    ("Financial", "forfeit the entire security deposit",
+     "forfeit only the part of the security deposit needed to cover documented unpaid dues or damage"),
+    ("Operational", "may amend these terms without notice",
+     "may amend these terms with at least thirty (30) days' prior written notice and the other party's written consent"),
+    ("Operational", "may terminate at any time without notice",
+     "may terminate on at least thirty (30) days' prior written notice"),
+    ("Operational", "sole discretion", "reasonable discretion, exercised in good faith"),
+    ("Operational", "at any time", "on at least thirty (30) days' prior written notice"),
+    ("Performance", "reasonable efforts", "commercially reasonable efforts, measured against the agreed service levels"),
+    ("Other", "without any liability", "subject to the remedies set out in this Agreement"),
+]
+
+_STOPWORDS = frozenset("the a an of to and or for in on by with this that such be is are its their your".split())
+_QUOTES = "'\"‘’“”` "
+
+REWRITE_SUGGESTIONS = registry.counter("rewrite_suggestions_total", "Clause rewrites suggested, by source (library, llm)")
+
+
+def phrase_words(phrase: str) -> frozenset:
+    """
+    Normalised content words of a phrase (plural and third-person "s" dropped).
+    """
+    words = set()
+    # lower-cased first: a capitalised phrase ("Unlimited Liability") is not a party name
+    for word in normalize(phrase.lower()):
+        if word in _STOPWORDS:
+            continue
+        if word.endswith("ies") and len(word) > 4:
+            word = word[:-3] + "y"
+        elif word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+            word = word[:-1]
+        words.add(word)
+    return frozenset(words)
+
+
+def find_phrase(text: str, phrase: str) -> Optional[Tuple[int, int]]:
+    """
+    Span of `phrase` in `text`, ignoring case, quotes around the phrase and
+    differences in whitespace; None if it does not occur.
+    """
+    words = phrase.strip(_QUOTES).split()
+    if not words:
+        return None
+    match = re.search(r"\s+".join(re.escape(word) for word in words), text, re.IGNORECASE)
+    return match.span() if match else None
+
+
+def substitute(text: str, replacements: List[Tuple[Tuple[int, int], str]]) -> str:
+    """
+    Replace the given spans of `text` (overlapping ones are skipped, the
+    earlier span wins); a replacement starting a sentence is capitalised.
+    """
+    out, end = [], 0
+    for (start, stop), replacement in sorted(replacements):
+        if start < end:
+            continue
+        if text[start:start + 1].isupper():
+            replacement = replacement[:1].upper() + replacement[1:]
+        out += [text[end:start], replacement]
+        end = stop
+    out.append(text[end:])
+    return "".join(out)
+
+
+class RewriteLibrary:
+    """
+    In-process index over the vetted entries of the rewrite library, reloaded
+    whenever the stored library changes (other workers learn too).
+    """
+
+    def __init__(self, store: DocumentStore = doc_store, threshold: float = NEGOTIATE_MATCH_THRESHOLD):
+        self.store = store
+        self.threshold = threshold
+        self._entries: Dict[int, dict] = {}
+        # risk type -> word -> ids of the entries whose phrase has the word
+        self._index: Dict[str, Dict[str, Set[int]]] = {}
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        stamp = self.store.rewrites.stamp()
+        if stamp == self._stamp:
+            return
+        with self._lock:
+            if stamp == (0, 0) and self._stamp is None:
+                added = self.store.rewrites.add([(*entry, "seed") for entry in SEED_REWRITES])
+                logger.info("Seeded the rewrite library with %d entries", added)
+                stamp = self.store.rewrites.stamp()
+            entries, index = {}, {}
+            for row in self.store.rewrites.entries():
+                row["words"] = phrase_words(row["phrase"])
+                entries[row["id"]] = row
+                for word in row["words"]:
+                    index.setdefault(row["risk_type"], {}).setdefault(word, set()).add(row["id"])
+            self._entries, self._index, self._stamp = entries, index, stamp
+
+    def match(self, phrase: str, risk_types: List[str]) -> Optional[Tuple[dict, float]]:
+        """
+        Closest library entry for a risky phrase among the entries for
+        `risk_types` and "Other" (all risk types if none are known).
+
+        Returns:
+            tuple | None: (entry, similarity) if the similarity reaches the threshold.
+        """
+        words = phrase_words(phrase)
+        if not words:
+            return None
+        if risk_types:
+            indexes = [self._index[t] for t in dict.fromkeys([*risk_types, "Other"]) if t in self._index]
+        else:
+            indexes = list(self._index.values())
+        candidates = {i for index in indexes for word in words for i in index.get(word, ())}
+        best = None
+        for i in candidates:
+            entry = self._entries[i]
+            score = len(words & entry["words"]) / len(words | entry["words"])
+            if score >= self.threshold and (best is None or score > best[1] or
+                                            (score == best[1] and entry["accepted"] > best[0]["accepted"])):
+                best = (entry, score)
+        return best
+
+    def suggest(self, clause: dict) -> Optional[dict]:
+        """
+        Suggestion for a classified clause built from the library alone, or
+        None unless every risky phrase of the clause has a close entry.
+        """
+        text = clause.get("original_clause") or ""
+        phrases = [p for p in clause.get("risky_phrases") or [] if p.strip(_QUOTES)]
+        if not phrases:
+            return None
+        replacements, rewrites, scores = [], [], []
+        for phrase in phrases:
+            span = find_phrase(text, phrase)
+            found = self.match(phrase, clause.get("risk_types") or []) if span else None
+            if found is None:
+                return None
+            entry, score = found
+            replacements.append((span, entry["replacement"]))
+            rewrites.append({"phrase": text[span[0]:span[1]], "replacement": entry["replacement"],
+                             "risk_type": entry["risk_type"], "rewrite_id": entry["id"]})
+            scores.append(score)
+        return {"suggested_text": substitute(text, replacements), "source": "library",
+                "similarity": round(min(scores), 3), "rewrites": rewrites}
+
+    def learn(self, rewrites: List[dict]) -> int:
+        """
+        Add the phrase rewrites of an accepted generated suggestion to the library.
+        """
+        added = self.store.rewrites.add([
+            (r.get("risk_type") or "Other", r["phrase"].strip(_QUOTES).lower(), r["replacement"], "accepted")
+            for r in rewrites if r.get("rewrite_id") is None and r["phrase"].strip(_QUOTES)
+        ])
+        if added:
+            logger.info("Added %d accepted rewrites to the library", added)
+        return added
+
+
+def generate_prompt(clauses: List[dict]) -> str:
+    """
+    One prompt asking for rewrites of several clauses, numbered from 1.
+    """
+    numbered = "\n\n".join(
+        f"[{n}]\nRisk types: {', '.join(c.get('risk_types') or []) or 'unknown'}\n"
+        f"Risky phrases: {' | '.join(p.strip(_QUOTES) for p in c.get('risky_phrases') or []) or 'none identified'}\n"
+        f"Clause: {c['original_clause']}"
+        for n, c in enumerate(clauses, start=1)
+    )
+    return (
+        "REWRITE MODE. You are a contract negotiator acting for the party receiving this contract. "
+        "For every numbered clause propose a fairer version that keeps its purpose: cap or narrow open-ended "
+        "liability, make unilateral rights mutual or subject to notice, add time limits and remedies. "
+        "Change as little wording as possible.\n"
+        "Respond with ONLY a JSON array containing one object per clause: "
+        '{"id": <clause number>, "suggested_text": "<the full rewritten clause>", '
+        '"rewrites": [{"phrase": "<exact words of the clause that you replaced>", '
+        '"replacement": "<the words you put in their place>", '
+        '"risk_type": "Financial|Liability|Privacy|IP|Operational|Regulatory|Reputational|Performance|Other"}]}\n\n'
+        f"CLAUSES:\n{numbered}\n"
+    )
+
+
+def _rewrite_key(clause: dict) -> str:
+    phrases = "\n".join(clause.get("risky_phrases") or [])
+    return cache_key(negotiate_model, NEGOTIATE_PROMPT_VERSION, f"{clause['original_clause']}\n{phrases}",
+                     negotiate_temperature)
+
+
+def _suggestion(clause: dict, answer: dict) -> dict:
+    # only phrase rewrites that quote the clause can be learned and reused
+    text = clause["original_clause"]
+    rewrites = [dict(r, rewrite_id=None) for r in answer.get("rewrites") or [] if find_phrase(text, r["phrase"])]
+    return {"suggested_text": answer["suggested_text"], "source": "llm", "similarity": None, "rewrites": rewrites}
+
+
+async def generate_rewrites(clauses: List[dict], llm: LLMGateway) -> List[Optional[dict]]:
+    """
+    Suggestions for clauses the library has no answer for, in batched LLM
+    requests; answers are cached per clause. A batch that fails leaves its
+    clauses without a suggestion.
+
+    Returns:
+        list: One suggestion per clause (None where the LLM gave no valid answer).
+    """
+    results: List[Optional[dict]] = [None] * len(clauses)
+    pending = []
+    cached_answers = await asyncio.to_thread(lambda: [llm_cache.get(_rewrite_key(clause)) for clause in clauses])
+    for n, (clause, cached) in enumerate(zip(clauses, cached_answers)):
+        if cached is not None:
+            results[n] = _suggestion(clause, json.loads(cached))
+        else:
+            pending.append(n)
+
+    async def run_batch(batch: List[int]):
+        response = await llm.complete(generate_prompt([clauses[n] for n in batch]), model=negotiate_model,
+                                      temperature=negotiate_temperature,
+                                      max_tokens=NEGOTIATE_OUTPUT_TOKENS * len(batch))
+        answers = {}
+        for item in parse_json_array(response) or []:
+            try:
+                answer = BatchClauseRewrite.model_validate(item)
+            except ValidationError:
+                continue
+            answers.setdefault(answer.id, answer.model_dump(exclude={"id"}))
+        for number, n in enumerate(batch, start=1):
+            if number in answers:
+                results[n] = _suggestion(clauses[n], answers[number])
+        await asyncio.to_thread(llm_cache.set_many, {
+            _rewrite_key(clauses[n]): json.dumps(answers[number])
+            for number, n in enumerate(batch, start=1) if number in answers
+        })
+
+    batches = make_batches(
+        pending,
+        cost=lambda n: estimate_tokens(clauses[n]["original_clause"]),
+        token_budget=NEGOTIATE_BATCH_TOKENS,
+        max_items=NEGOTIATE_BATCH_SIZE,
+    )
+    outcomes = await asyncio.gather(*(run_batch(batch) for batch in batches), return_exceptions=True)
+    for batch, outcome in zip(batches, outcomes):
+        # a failed batch only loses its own clauses; the others keep their suggestions
+        if isinstance(outcome, Exception):
+            logger.warning("Rewrite batch of %d clauses failed: %s", len(batch), str(outcome))
+    missing = sum(result is None for result in results)
+    if missing:
+        logger.warning("No valid rewrite for %d of %d clauses", missing, len(clauses))
+    return results
+
+
+async def negotiate(uid: str, record: dict, llm: Optional[LLMGateway], store: DocumentStore = doc_store) -> List[dict]:
+    """
+    Suggest rewrites for the red and yellow clauses of a result and store
+    them. Suggestions already stored for the same result are reused.
+
+    Args:
+        uid (str): Document identifier.
+        record (dict): The stored result (see app.services.result_store).
+        llm (LLMGateway, optional): Used for clauses the library cannot
+            answer; None (or NEGOTIATE_LLM_FALLBACK=0) skips them.
+        store (DocumentStore): Where the library and suggestions are kept.
+
+    Returns:
+        list: Stored suggestions (see RewriteStore.get_suggestions).
+    """
+    stored = await asyncio.to_thread(store.rewrites.get_suggestions, uid)
+    if stored and all(s["etag"] == record["etag"] for s in stored):
+        return stored
+
+    clauses = [c for c in record["clauses"] if c.get("rating") in NEGOTIABLE and "error" not in c]
+    await asyncio.to_thread(rewrite_library.refresh)
+    suggestions = [rewrite_library.suggest(clause) for clause in clauses]
+    unmatched = [n for n, suggestion in enumerate(suggestions) if suggestion is None]
+    if unmatched and llm is not None and NEGOTIATE_LLM_FALLBACK:
+        try:
+            generated = await generate_rewrites([clauses[n] for n in unmatched], llm)
+            for n, suggestion in zip(unmatched, generated):
+                suggestions[n] = suggestion
+        except Exception as e:
+            logger.warning("Rewrite generation for %s failed, keeping library suggestions: %s", uid, str(e))
+
+    found = [dict(suggestion, id=clause["id"]) for clause, suggestion in zip(clauses, suggestions) if suggestion]
+    for suggestion in found:
+        REWRITE_SUGGESTIONS.inc(source=suggestion["source"])
+    served = [r["rewrite_id"] for s in found for r in s["rewrites"] if r["rewrite_id"] is not None]
+    await asyncio.to_thread(store.rewrites.put_suggestions, uid, record["etag"], found)
+    if served:
+        await asyncio.to_thread(store.rewrites.count_served, served)
+    logger.info("%s: %d rewrites suggested (%d from the library, %d clauses sent to the LLM)",
+                uid, len(found), len(clauses) - len(unmatched), len(unmatched))
+    return await asyncio.to_thread(store.rewrites.get_suggestions, uid)
+
+
+def review(uid: str, clause_id: str, accepted: bool, store: DocumentStore = doc_store) -> Optional[dict]:
+    """
+    Record a user's verdict on a suggestion. Accepting a generated suggestion
+    adds its phrase rewrites to the library.
+
+    Returns:
+        dict | None: The reviewed suggestion, or None if there is none.
+    """
+    status = "accepted" if accepted else "rejected"
+    suggestion = store.rewrites.review_suggestion(uid, clause_id, status, retire_after=NEGOTIATE_RETIRE_AFTER)
+    if suggestion is None:
+        return None
+    if accepted and suggestion["status"] != "accepted" and suggestion["source"] == "llm":
+        rewrite_library.learn(suggestion["rewrites"])
+    return dict(suggestion, status=status)
+
+
+# Shared by the negotiate router
+rewrite_library = RewriteLibrary()
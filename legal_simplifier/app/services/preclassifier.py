@@ -0,0 +1,342 @@
+"""
+Local pre-classifier – rates obvious clauses without calling the LLM
+Two in-process tiers run before the LLM:
+    rules – one compiled phrase automaton (a single regex alternation) with
+            the red cues of the clause prompt, plus structural checks for
+            headings, definitions and signature blocks (green).
+    model – a multinomial naive Bayes over clause words, trained on the
+            ratings the LLM gave to stored clauses and refreshed periodically.
+            Part of those clauses is held out to calibrate it: the model
+            only decides clauses whose length-normalised log-likelihood
+            margin is at or above the lowest cut-off whose held-out accuracy
+            reaches PRECLASSIFY_TARGET_ACCURACY, and stays off if none does.
+A clause is only decided locally when a tier is confident; everything else
+goes to the LLM. Counters per tier are kept so the target can be tuned.
+"""
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from app.services.metrics import labelled, registry
+from app.services.store import DocumentStore, doc_store
+
+logger = logging.getLogger(__name__)
+
+# 0 disables local decisions entirely
+PRECLASSIFY_ENABLED = os.getenv("PRECLASSIFY_ENABLED", "1") == "1"
+# Held-out accuracy (lower 95% confidence bound) the model must reach on the clauses it decides
+PRECLASSIFY_TARGET_ACCURACY = float(os.getenv("PRECLASSIFY_TARGET_ACCURACY", 0.95))
+# Share of the training clauses held out for calibration, and fewest held-out decisions a cut-off is based on
+PRECLASSIFY_HOLDOUT = float(os.getenv("PRECLASSIFY_HOLDOUT", 0.25))
+PRECLASSIFY_MIN_CALIBRATION = int(os.getenv("PRECLASSIFY_MIN_CALIBRATION", 50))
+# The model only decides once it has seen this many LLM-rated clauses per rating
+PRECLASSIFY_MIN_EXAMPLES = int(os.getenv("PRECLASSIFY_MIN_EXAMPLES", 50))
+# Most recent LLM-rated clauses used for training, and retraining interval (seconds)
+PRECLASSIFY_TRAIN_MAX = int(os.getenv("PRECLASSIFY_TRAIN_MAX", 20000))
+PRECLASSIFY_RETRAIN_SECONDS = float(os.getenv("PRECLASSIFY_RETRAIN_SECONDS", 600))
+
+RATINGS = ("red", "yellow", "green")
+# Severity reported for local decisions
+DEFAULT_SEVERITY = {"red": 8, "yellow": 5, "green": 2}
+
+# (pattern, risk type) – red cues from CLAUSE_INSTRUCTIONS in result.py
+RED_CUES = [
+    (r"(?:unlimited|uncapped) (?:indemnit(?:y|ies)|liability)", "Liability"),
+    (r"indemnif(?:y|ies) and hold harmless[^.]{0,40}\bwithout limitation", "Liability"),
+    (r"liability (?:shall|will) (?:be unlimited|not be (?:capped|limited))", "Liability"),
+    (r"waive[sd]? (?:any|all)? ?(?:of )?(?:its |their |your )?statutory rights", "Regulatory"),
+    (r"waiver of (?:any |all )?statutory rights", "Regulatory"),
+    (r"irrevocabl[ey] assign(?:s|ment of)? (?:all|any) (?:right|intellectual property)", "IP"),
+    (r"assigns? all (?:rights?, title and interest|intellectual property)[^.]{0,40}without (?:any )?compensation", "IP"),
+    (r"perpetual,? (?:irrevocable,? )?(?:worldwide,? )?(?:royalty-free,? )?licen[cs]e to (?:use|exploit)[^.]{0,40}(?:data|content)", "Privacy"),
+    (r"automatic(?:ally)? renew(?:s|al|ed)?[^.]{0,60}penalt(?:y|ies)", "Financial"),
+    (r"(?:may|can|reserves the right to) (?:unilaterally )?(?:amend|modify|change) (?:this agreement|these terms|the terms)[^.]{0,40}without (?:prior )?(?:notice|consent)", "Operational"),
+    (r"unilateral(?:ly)? (?:amend|modify|change)[^.]{0,40}without (?:prior )?(?:notice|consent)", "Operational"),
+    (r"class action waiver|waive[sd]? (?:any )?right to (?:participate in|bring) (?:a )?class action", "Regulatory"),
+    (r"forfeit(?:s|ure of)? (?:the )?(?:entire|full|whole) (?:deposit|security deposit|amount)", "Financial"),
+]
+# Words that, just before a red cue, make it uncertain ("shall not have unlimited liability")
+_NEGATION_RE = re.compile(r"\b(?:not|no|neither|nor|never|without|in no event)\b[\w\s,]{0,30}$", re.IGNORECASE)
+
+_RED_RE = re.compile("|".join(f"(?P<c{n}>{pattern})" for n, (pattern, _) in enumerate(RED_CUES)), re.IGNORECASE)
+# Anything that could carry an obligation or a risk keeps a clause away from the green rules
+_OBLIGATION_RE = re.compile(
+    r"\b(?:shall(?! mean)|must|will|may|agrees?|undertakes?|liable|liability|indemnif\w*|penalt\w*|terminat\w*|"
+    r"waive\w*|pay\w*|fees?|deposit|interest|damages|breach|exclusive\w*|irrevocabl\w*|perpetual\w*|"
+    r"reasonable|appropriate|necessary|discretion)\b",
+    re.IGNORECASE,
+)
+_SIGNATURE_RE = re.compile(
+    r"\b(?:in witness whereof|signed (?:by|on behalf of)|signature|witness(?:es)?|name\s*:|date\s*:|designation\s*:)",
+    re.IGNORECASE,
+)
+_DEFINITION_RE = re.compile(
+    r"\b(?:hereinafter (?:referred to as|called)|shall mean|means|refers to|is made (?:on|between)|by and between)\b",
+    re.IGNORECASE,
+)
+# Optionally numbered, one line, no sentence punctuation: "12. GOVERNING LAW", "Schedule 2 – Fees"
+_HEADING_RE = re.compile(
+    r"^(?:(?:article|section|clause|schedule|annex(?:ure)?|appendix|exhibit)\s+)?"
+    r"(?:[\dIVXivx]+(?:\.\d+)*[.)]?\s+)?[A-Z][^.;!?\n]*:?$",
+    re.IGNORECASE,
+)
+_MINOR_WORDS = {"a", "an", "and", "as", "at", "by", "for", "in", "of", "on", "or", "the", "to", "with"}
+_WORD_RE = re.compile(r"[a-z][a-z'-]+")
+HEADING_MAX_WORDS = 12
+
+
+def tokenize(text: str) -> List[str]:
+    words = _WORD_RE.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def is_heading(text: str) -> bool:
+    """
+    True for a short title line: upper case or title case, no sentence punctuation.
+    """
+    text = text.strip()
+    words = [w for w in re.findall(r"[A-Za-z][\w'-]*", text) if w.lower() not in _MINOR_WORDS]
+    if not words or len(text.split()) > HEADING_MAX_WORDS or not _HEADING_RE.match(text):
+        return False
+    return sum(w[0].isupper() for w in words) == len(words)
+
+
+def wilson_lower(correct: int, total: int, z: float = 1.96) -> float:
+    """
+    Lower bound of the Wilson score interval for an observed accuracy.
+    """
+    if not total:
+        return 0.0
+    p = correct / total
+    centre = p + z * z / (2 * total)
+    spread = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total))
+    return (centre - spread) / (1 + z * z / total)
+
+
+def calibrate(scored: List[Tuple[float, bool]], target: float, min_count: int) -> Optional[float]:
+    """
+    Lowest confidence cut-off at which the held-out predictions it admits
+    are accurate enough.
+
+    Args:
+        scored (list): (confidence, prediction was correct) per held-out clause.
+        target (float): Required accuracy (lower 95% bound) above the cut-off.
+        min_count (int): Fewest held-out predictions a cut-off may rest on.
+
+    Returns:
+        float | None: The cut-off, or None if no cut-off reaches the target.
+    """
+    cutoff, correct = None, 0
+    ranked = sorted(scored, key=lambda item: item[0], reverse=True)
+    for n, (confidence, right) in enumerate(ranked, start=1):
+        correct += right
+        # ties cannot be split: only consider the last clause with this confidence
+        if n < len(ranked) and ranked[n][0] == confidence:
+            continue
+        if n >= min_count and wilson_lower(correct, n) >= target:
+            cutoff = confidence
+    return cutoff
+
+
+class NaiveBayes:
+    """
+    Multinomial naive Bayes with add-one smoothing.
+    """
+
+    def __init__(self):
+        self.class_counts: Counter = Counter()
+        self.word_counts: Dict[str, Counter] = defaultdict(Counter)
+        self.totals: Counter = Counter()
+        self.vocabulary = set()
+
+    def fit(self, examples):
+        for text, rating in examples:
+            tokens = tokenize(text)
+            self.class_counts[rating] += 1
+            self.word_counts[rating].update(tokens)
+            self.totals[rating] += len(tokens)
+            self.vocabulary.update(tokens)
+        return self
+
+    def _scores(self, text: str) -> Tuple[Dict[str, float], int]:
+        # log joint probability per rating, and the number of known tokens
+        tokens = [t for t in tokenize(text) if t in self.vocabulary]
+        examples = sum(self.class_counts.values())
+        size = len(self.vocabulary) + 1
+        scores = {}
+        for rating, count in self.class_counts.items():
+            words, total = self.word_counts[rating], self.totals[rating] + size
+            scores[rating] = math.log(count / examples) + sum(math.log((words[t] + 1) / total) for t in tokens)
+        return scores, len(tokens)
+
+    def predict(self, text: str) -> Dict[str, float]:
+        """
+        Posterior probability of each rating.
+        """
+        scores, _ = self._scores(text)
+        top = max(scores.values())
+        norm = sum(math.exp(s - top) for s in scores.values())
+        return {rating: math.exp(s - top) / norm for rating, s in scores.items()}
+
+    def margin(self, text: str) -> Tuple[str, float]:
+        """
+        Most likely rating and its confidence: the log-likelihood margin
+        over the runner-up per known token. Unlike the posterior, this does
+        not saturate at 1.0 for long clauses.
+        """
+        scores, known = self._scores(text)
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        gap = scores[ranked[0]] - scores[ranked[1]] if len(ranked) > 1 else 0.0
+        return ranked[0], gap / max(1, known)
+
+
+class PreClassifier:
+    """
+    Rules + model tiers in front of the LLM.
+    """
+
+    def __init__(self, store: DocumentStore = doc_store, target: float = PRECLASSIFY_TARGET_ACCURACY,
+                 enabled: bool = PRECLASSIFY_ENABLED):
+        self.store = store
+        self.target = target
+        self.enabled = enabled
+        self._model: Optional[NaiveBayes] = None
+        # margin cut-off calibrated on held-out clauses (None: the model does not decide)
+        self.cutoff: Optional[float] = None
+        self._trained_at = 0.0
+        self._lock = threading.Lock()
+        self.stats: Counter = Counter()
+
+    def _refresh_model(self):
+        if time.time() - self._trained_at < PRECLASSIFY_RETRAIN_SECONDS:
+            return
+        with self._lock:
+            if time.time() - self._trained_at < PRECLASSIFY_RETRAIN_SECONDS:
+                return
+            examples = self.store.training_clauses(PRECLASSIFY_TRAIN_MAX)
+            counts = Counter(rating for _, rating in examples)
+            if all(counts[rating] >= PRECLASSIFY_MIN_EXAMPLES for rating in RATINGS):
+                self.train(examples)
+            self._trained_at = time.time()
+
+    def train(self, examples: List[Tuple[str, str]]):
+        """
+        Fit the model on part of `examples` and calibrate its cut-off on the rest.
+        """
+        examples = list(examples)
+        # fixed seed: the split only has to be unbiased, not different on every retrain
+        random.Random(0).shuffle(examples)
+        held = int(len(examples) * PRECLASSIFY_HOLDOUT)
+        model = NaiveBayes().fit(examples[held:])
+        scored = []
+        for text, rating in examples[:held]:
+            predicted, confidence = model.margin(text)
+            scored.append((confidence, predicted == rating))
+        cutoff = calibrate(scored, self.target, PRECLASSIFY_MIN_CALIBRATION)
+        self._model, self.cutoff = model, cutoff
+        if cutoff is None:
+            logger.info("Pre-classifier trained on %d clauses %s; held-out accuracy below %.2f, model tier off",
+                        len(examples) - held, dict(Counter(r for _, r in examples)), self.target)
+        else:
+            covered = sum(confidence >= cutoff for confidence, _ in scored)
+            logger.info("Pre-classifier trained on %d clauses %s; decides %d of %d held-out clauses (margin >= %.3f)",
+                        len(examples) - held, dict(Counter(r for _, r in examples)), covered, held, cutoff)
+
+    def _rules(self, text: str) -> Optional[dict]:
+        cues, uncertain = [], False
+        for match in _RED_RE.finditer(text):
+            if _NEGATION_RE.search(text[max(0, match.start() - 40):match.start()]):
+                uncertain = True
+                continue
+            cues.append((match.group(0), RED_CUES[int(match.lastgroup[1:])][1]))
+        if cues:
+            phrases = list(dict.fromkeys(phrase for phrase, _ in cues))
+            return {
+                "rating": "red",
+                "severity": min(10, DEFAULT_SEVERITY["red"] + len(phrases) - 1),
+                "detailed_rationale": "Matched high-risk wording: " + "; ".join(f"'{p}'" for p in phrases) + ".",
+                "risky_phrases": phrases,
+                "risk_types": list(dict.fromkeys(risk for _, risk in cues)),
+                "confidence": "high",
+            }
+        if uncertain or _OBLIGATION_RE.search(text):
+            return None
+
+        words = len(text.split())
+        if is_heading(text) or _SIGNATURE_RE.search(text) or (_DEFINITION_RE.search(text) and words <= 80):
+            return {
+                "rating": "green",
+                "severity": 1,
+                "detailed_rationale": "Heading, definition or signature block without obligations.",
+                "risky_phrases": [],
+                "risk_types": [],
+                "confidence": "high",
+            }
+        return None
+
+    def _predict(self, text: str) -> Optional[dict]:
+        if self._model is None or self.cutoff is None:
+            return None
+        rating, confidence = self._model.margin(text)
+        if confidence < self.cutoff:
+            return None
+        return {
+            "rating": rating,
+            "severity": DEFAULT_SEVERITY[rating],
+            "detailed_rationale": f"Rated locally by similarity to previously reviewed clauses (margin={confidence:.2f}).",
+            "risky_phrases": [],
+            "risk_types": [],
+            "confidence": "medium",
+        }
+
+    def classify(self, text: str) -> Optional[dict]:
+        """
+        Decide a clause locally.
+
+        Args:
+            text (str): The clause text.
+
+        Returns:
+            dict | None: An analysis in the LLM response schema plus
+                         "decided_by" ("rules" or "model"), or None if the
+                         clause should go to the LLM.
+        """
+        if not self.enabled:
+            return None
+        for tier, decide in (("rules", self._rules), ("model", self._predict)):
+            analysis = decide(text)
+            if analysis is not None:
+                self.stats[tier] += 1
+                return dict(analysis, decided_by=tier)
+        return None
+
+    def classify_many(self, texts: List[str]) -> List[Optional[dict]]:
+        """
+        classify() for several clauses; (re)trains the model first when due.
+        """
+        if self.enabled:
+            self._refresh_model()
+        return [self.classify(text) for text in texts]
+
+    def record_llm(self, count: int = 1):
+        self.stats["llm"] += count
+
+    def shares(self) -> Dict[str, float]:
+        """
+        Fraction of clauses decided by each tier since startup.
+        """
+        total = sum(self.stats.values())
+        return {tier: round(self.stats[tier] / total, 4) if total else 0.0 for tier in ("rules", "model", "llm")}
+
+
+# Shared by the classification pipeline
+pre_classifier = PreClassifier()
+
+registry.counter("clauses_decided_total", "Classified clauses by deciding tier (rules, model, llm)",
+                 callback=lambda: labelled(pre_classifier.stats, "decided_by"))
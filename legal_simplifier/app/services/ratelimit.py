@@ -0,0 +1,118 @@
+"""
+Rate limiting helpers for LLM calls
+Token bucket fed by the provider's x-ratelimit-* headers, plus jittered backoff.
+"""
+import asyncio
+import random
+import re
+import time
+from typing import Mapping, Optional
+
+# "2m59.56s", "7.66s", "320ms", "1h2m3s"
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNIT_SECONDS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Groq/OpenAI style reset duration into seconds.
+
+    Args:
+        value (str | None): Header value such as "2m59.56s" or "12".
+
+    Returns:
+        float | None: Seconds, or None if the value cannot be parsed.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(n) * _UNIT_SECONDS[unit] for n, unit in parts)
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """
+    Exponential backoff with full jitter.
+
+    Args:
+        attempt (int): Zero-based retry attempt.
+        base (float): Delay for the first retry, in seconds.
+        cap (float): Upper bound for the delay, in seconds.
+
+    Returns:
+        float: Seconds to sleep before the next attempt.
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class TokenBucket:
+    """
+    Async token bucket. Capacity and refill rate start from configuration and
+    are corrected from the rate-limit headers returned with every response.
+    The headers describe the whole account; a bucket that gets only part of
+    it (one of several worker processes) scales them by `share`. Headers can
+    only tighten the configured limit, never raise it: Groq reports requests
+    per day, not per minute.
+    """
+
+    def __init__(self, capacity: float, per_seconds: float = 60.0, share: float = 1.0):
+        self.share = share
+        self.capacity = self.max_capacity = float(capacity)
+        self.rate = self.max_rate = self.capacity / per_seconds
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0):
+        """
+        Wait until `amount` tokens are available and take them.
+        Requests larger than the bucket only wait for a full bucket.
+        """
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def update_from_headers(self, headers: Mapping[str, str], kind: str = "tokens"):
+        """
+        Sync the bucket with x-ratelimit-{limit,remaining,reset}-{kind} headers.
+        """
+        limit = headers.get(f"x-ratelimit-limit-{kind}")
+        remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+        reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+        try:
+            if limit is not None:
+                self.capacity = min(float(limit) * self.share, self.max_capacity)
+            if remaining is not None:
+                remaining = float(remaining) * self.share
+                self._refill()
+                self.tokens = min(self.tokens, remaining)
+                if reset and self.capacity > remaining:
+                    # tokens come back linearly until the window resets
+                    self.rate = min((self.capacity - remaining) / reset, self.max_rate)
+                else:
+                    self.rate = self.max_rate
+        except ValueError:
+            pass
+
+    def pause(self, seconds: float):
+        """
+        Drain the bucket so that nothing is sent for roughly `seconds` (used on 429).
+        """
+        self._refill()
+        self.tokens = -seconds * self.rate
@@ -0,0 +1,278 @@
+"""
+Risk report rendering – annotated PDF and DOCX exports of a classified document
+Reports are rendered in a small process pool so large documents never
+block the event loop, written to a temporary file and moved into an
+on-disk cache keyed on the result version and ETag. A second download of
+the same result is served straight from that file; identical exports
+requested at the same time share one render.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+logger = logging.getLogger(__name__)
+
+# Rendered reports, one folder per document
+EXPORT_DIR = os.getenv("EXPORT_DIR", "cache/exports")
+# Render processes; 0 renders in a worker thread of this process instead
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", 2))
+# Bytes per chunk when streaming a report to the client
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 64 * 1024))
+# Bump whenever the report layout changes so cached files are re-rendered
+REPORT_VERSION = "report-v1"
+
+FORMATS = {
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+RATING_COLOURS = {"red": "#d32f2f", "yellow": "#f9a825", "green": "#388e3c"}
+
+_pool: Optional[ProcessPoolExecutor] = None
+# cache path -> running render, so concurrent downloads of one report render it once
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=EXPORT_WORKERS)
+    return _pool
+
+
+def shutdown_pool():
+    """
+    Stop the render process pool (called on app shutdown).
+    """
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+def report_key(record: dict, fmt: str) -> str:
+    """
+    Cache key of a rendered report: changes with the result and the layout.
+    """
+    digest = hashlib.sha256(f"{REPORT_VERSION}:{record['version']}:{record['etag']}:{fmt}".encode("utf-8"))
+    return digest.hexdigest()[:24]
+
+
+def report_path(uid: str, key: str, fmt: str) -> str:
+    return os.path.join(EXPORT_DIR, uid, f"{key}.{fmt}")
+
+
+def _split_phrases(text: str, phrases: List[str]) -> List[Tuple[str, bool]]:
+    """
+    Split clause text into (part, is_risky_phrase) runs, matching the risky
+    phrases case-insensitively; overlapping matches keep the earliest.
+    """
+    lowered = text.lower()
+    spans = []
+    for phrase in {p.strip() for p in phrases if p and p.strip()}:
+        start = lowered.find(phrase.lower())
+        while start != -1:
+            spans.append((start, start + len(phrase)))
+            start = lowered.find(phrase.lower(), start + len(phrase))
+    runs, pos = [], 0
+    for start, end in sorted(spans):
+        if start < pos:
+            continue
+        if start > pos:
+            runs.append((text[pos:start], False))
+        runs.append((text[start:end], True))
+        pos = end
+    if pos < len(text):
+        runs.append((text[pos:], False))
+    return runs
+
+
+def _summary_rows(clauses: List[dict]) -> List[Tuple[str, str]]:
+    ratings = Counter(c.get("rating", "unrated") for c in clauses)
+    rows = [("Clauses", str(len(clauses)))]
+    rows += [(rating.capitalize(), str(ratings.get(rating, 0))) for rating in ("red", "yellow", "green")]
+    if ratings.get("unrated"):
+        rows.append(("Not rated", str(ratings["unrated"])))
+    risk_types = Counter(t for c in clauses for t in c.get("risk_types") or [])
+    if risk_types:
+        rows.append(("Risk types", ", ".join(f"{t} ({n})" for t, n in risk_types.most_common())))
+    return rows
+
+
+def _clause_title(clause: dict, n: int) -> str:
+    number = clause.get("number") or str(n)
+    heading = clause.get("heading")
+    return f"Clause {number}" + (f" – {heading}" if heading else "")
+
+
+def render_pdf(document: dict, clauses: List[dict], path: str):
+    """
+    Write an annotated PDF report: summary table, then one block per clause
+    with its rating, rationale and the clause text with risky phrases highlighted.
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import mm
+    from reportlab.platypus import KeepTogether, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    styles = getSampleStyleSheet()
+    body = styles["BodyText"]
+    story = [
+        Paragraph(escape(f"Risk report: {document['doc_name']}"), styles["Title"]),
+        Paragraph(escape(f"Version {document['version']} · {document.get('filename') or ''} · "
+                         f"generated {time.strftime('%Y-%m-%d %H:%M')}"), body),
+        Spacer(1, 6 * mm),
+    ]
+    summary = Table(_summary_rows(clauses), colWidths=[40 * mm, 130 * mm])
+    summary.setStyle(TableStyle([
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+        ("BACKGROUND", (0, 0), (0, -1), colors.whitesmoke),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+    ]))
+    story += [summary, Spacer(1, 8 * mm)]
+
+    for n, clause in enumerate(clauses, start=1):
+        rating = clause.get("rating")
+        colour = RATING_COLOURS.get(rating, "#757575")
+        label = f"{rating.upper()} · severity {clause.get('severity', '-')}" if rating else "NOT RATED"
+        text = "".join(
+            f'<font backColor="#ffe082">{escape(part)}</font>' if risky else escape(part)
+            for part, risky in _split_phrases(clause.get("original_clause", ""), clause.get("risky_phrases") or [])
+        )
+        block = [
+            Paragraph(f'<b>{escape(_clause_title(clause, n))}</b> <font color="{colour}"><b>{escape(label)}</b></font>', body),
+            Paragraph(text, body),
+        ]
+        if clause.get("detailed_rationale") or clause.get("error"):
+            block.append(Paragraph(f"<i>{escape(clause.get('detailed_rationale') or clause['error'])}</i>", body))
+        if clause.get("risk_types"):
+            block.append(Paragraph(escape("Risk types: " + ", ".join(clause["risk_types"])), body))
+        # short clauses stay on one page; long ones may break across pages
+        if len(text) < 1500:
+            story.append(KeepTogether(block))
+        else:
+            story += block
+        story.append(Spacer(1, 4 * mm))
+
+    SimpleDocTemplate(path, pagesize=A4, title=f"Risk report: {document['doc_name']}",
+                      leftMargin=18 * mm, rightMargin=18 * mm).build(story)
+
+
+def render_docx(document: dict, clauses: List[dict], path: str):
+    """
+    Write the same report as a Word document; risky phrases are highlighted.
+    """
+    from docx import Document
+    from docx.enum.text import WD_COLOR_INDEX
+    from docx.shared import RGBColor
+
+    doc = Document()
+    doc.add_heading(f"Risk report: {document['doc_name']}", level=0)
+    doc.add_paragraph(f"Version {document['version']} · {document.get('filename') or ''} · "
+                      f"generated {time.strftime('%Y-%m-%d %H:%M')}")
+    rows = _summary_rows(clauses)
+    table = doc.add_table(rows=len(rows), cols=2)
+    table.style = "Table Grid"
+    for row, (name, value) in zip(table.rows, rows):
+        row.cells[0].text, row.cells[1].text = name, value
+
+    for n, clause in enumerate(clauses, start=1):
+        rating = clause.get("rating")
+        heading = doc.add_paragraph()
+        heading.add_run(_clause_title(clause, n) + "  ").bold = True
+        label = heading.add_run(f"{rating.upper()} · severity {clause.get('severity', '-')}" if rating else "NOT RATED")
+        label.bold = True
+        label.font.color.rgb = RGBColor.from_string(RATING_COLOURS.get(rating, "#757575")[1:])
+
+        text = doc.add_paragraph()
+        for part, risky in _split_phrases(clause.get("original_clause", ""), clause.get("risky_phrases") or []):
+            run = text.add_run(part)
+            if risky:
+                run.font.highlight_color = WD_COLOR_INDEX.YELLOW
+        if clause.get("detailed_rationale") or clause.get("error"):
+            doc.add_paragraph().add_run(clause.get("detailed_rationale") or clause["error"]).italic = True
+        if clause.get("risk_types"):
+            doc.add_paragraph("Risk types: " + ", ".join(clause["risk_types"]))
+    doc.save(path)
+
+
+RENDERERS = {"pdf": render_pdf, "docx": render_docx}
+
+
+def _render_to(fmt: str, document: dict, clauses: List[dict], path: str) -> int:
+    # runs in a worker process: render next to the final path, then move it in place
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        RENDERERS[fmt](document, clauses, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return os.path.getsize(path)
+
+
+async def get_or_render(uid: str, document: dict, record: dict, fmt: str) -> Tuple[str, bool]:
+    """
+    Path of the rendered report, rendering it off the event loop if needed.
+
+    Args:
+        uid (str): Document identifier.
+        document (dict): Document metadata from the document store.
+        record (dict): Stored result (version, etag, clauses).
+        fmt (str): "pdf" or "docx".
+
+    Returns:
+        tuple: (path of the report file, whether it came from the cache).
+    """
+    key = report_key(record, fmt)
+    path = report_path(uid, key, fmt)
+    if os.path.exists(path):
+        return path, True
+
+    render = _inflight.get(path)
+    if render is None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        loop = asyncio.get_running_loop()
+        args = (fmt, document, record["clauses"], path)
+        if EXPORT_WORKERS > 0:
+            render = loop.run_in_executor(_get_pool(), _render_to, *args)
+        else:
+            render = asyncio.ensure_future(asyncio.to_thread(_render_to, *args))
+        _inflight[path] = render
+        render.add_done_callback(lambda _: _inflight.pop(path, None))
+        render.add_done_callback(lambda future: future.exception() is None and _drop_stale(uid, path, fmt))
+    started = time.perf_counter()
+    size = await asyncio.shield(render)
+    logger.info("Rendered %s report for %s (%d clauses, %d bytes) in %.2fs",
+                fmt, uid, len(record["clauses"]), size, time.perf_counter() - started)
+    return path, False
+
+
+def _drop_stale(uid: str, keep: str, fmt: str):
+    # only the report of the current result is kept per format
+    folder = os.path.join(EXPORT_DIR, uid)
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if name.endswith(f".{fmt}") and path != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def iter_file(path: str, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Read a report in chunks (StreamingResponse runs sync iterators in a thread).
+    """
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
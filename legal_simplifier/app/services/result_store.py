@@ -0,0 +1,78 @@
+"""
+Result store – classified clause payloads persisted per document
+Each record is tagged with a version (prompt + model) and an ETag so that
+GET /result/{uid} can be served without calling the LLM again. Records live
+in the results table of the document store.
+"""
+import hashlib
+import json
+import time
+from typing import Any, Dict, Optional
+
+from app.services.store import doc_store
+
+
+def result_version(model: str, prompt_version: str) -> str:
+    """
+    Version tag for results produced by a given model and prompt template.
+    """
+    return f"{prompt_version}:{model}"
+
+
+def compute_etag(payload: Any) -> str:
+    """
+    Strong ETag over the canonical JSON form of the payload.
+    """
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches an ETag (RFC 9110 section 13.1.2):
+    "*" matches any current representation, otherwise the comma-separated
+    entity tags are compared weakly, i.e. ignoring a "W/" prefix.
+    """
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    if "*" in tags:
+        return True
+    return _opaque_tag(etag) in {_opaque_tag(tag) for tag in tags if tag}
+
+
+def _opaque_tag(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def save_result(uid: str, clauses: list, version: str) -> Dict[str, Any]:
+    """
+    Persist the classified clauses for a document.
+
+    Args:
+        uid (str): Document identifier.
+        clauses (list): The payload returned by GET /result/{uid}.
+        version (str): Value of result_version() used to produce it.
+
+    Returns:
+        dict: The stored record (version, etag, created_at, clauses).
+    """
+    record = {
+        "uid": uid,
+        "version": version,
+        "etag": compute_etag(clauses),
+        "created_at": time.time(),
+        "clauses": clauses,
+    }
+    doc_store.save_result(record)
+    return record
+
+
+def load_result(uid: str, version: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Load a stored record, or None if missing or produced by another version.
+    """
+    record = doc_store.load_result(uid)
+    if record is None:
+        return None
+    if version is not None and record.get("version") != version:
+        return None
+    return record
@@ -0,0 +1,176 @@
+"""
+Rewrite store – the negotiation rewrite library and the suggestions made from it
+Kept in the document store so every worker serves and learns from the same
+library (app.services.negotiation).
+"""
+import json
+import sqlite3
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from app.services.store import DocumentStore
+
+SCHEMA = """
+-- negotiation rewrite library: a safer wording for a risky phrase, per risk
+-- type (app.services.negotiation); only vetted entries are served
+CREATE TABLE IF NOT EXISTS rewrites (
+    id INTEGER PRIMARY KEY,
+    risk_type TEXT NOT NULL,
+    phrase TEXT NOT NULL,
+    replacement TEXT NOT NULL,
+    source TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'vetted',
+    served INTEGER NOT NULL DEFAULT 0,
+    accepted INTEGER NOT NULL DEFAULT 0,
+    rejected INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    UNIQUE (risk_type, phrase)
+);
+
+-- suggested rewrites of the red and yellow clauses of a result (by its etag)
+CREATE TABLE IF NOT EXISTS suggestions (
+    uid TEXT NOT NULL,
+    clause_id TEXT NOT NULL,
+    etag TEXT NOT NULL,
+    suggested_text TEXT NOT NULL,
+    source TEXT NOT NULL,
+    similarity REAL,
+    rewrites TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'proposed',
+    created_at REAL NOT NULL,
+    PRIMARY KEY (uid, clause_id)
+);
+"""
+
+_SUGGESTION_COLUMNS = "clause_id, etag, suggested_text, source, similarity, rewrites, status, created_at"
+
+
+class RewriteStore:
+    """
+    Rewrite library entries and per-document suggestions of a document store.
+    """
+
+    def __init__(self, store: "DocumentStore"):
+        self.store = store
+
+    # library --------------------------------------------------------------
+
+    def add(self, rows: List[Tuple[str, str, str, str]]) -> int:
+        """
+        Add entries to the rewrite library; a phrase already in the library
+        for the same risk type is kept as it is.
+
+        Args:
+            rows (list): (risk type, phrase, replacement, source) tuples.
+
+        Returns:
+            int: Number of entries added.
+        """
+        now = time.time()
+        with self.store.transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO rewrites (risk_type, phrase, replacement, source, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(*row, now) for row in rows],
+            )
+            return conn.total_changes - before
+
+    def entries(self, risk_type: Optional[str] = None, status: str = "vetted") -> List[Dict[str, Any]]:
+        """
+        Library entries with `status` (and `risk_type`), most accepted first.
+        """
+        where, args = "status = ?", [status]
+        if risk_type is not None:
+            where += " AND risk_type = ?"
+            args.append(risk_type)
+        rows = self.store.connection().execute(
+            "SELECT id, risk_type, phrase, replacement, source, status, served, accepted, rejected, created_at"
+            f" FROM rewrites WHERE {where} ORDER BY accepted DESC, id",
+            args,
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def stamp(self) -> Tuple[int, int]:
+        """
+        (number of entries, sum of their ids) of the vetted library; changes
+        whenever an entry is added or retired, so caches know when to reload.
+        """
+        row = self.store.connection().execute(
+            "SELECT count(*), coalesce(sum(id), 0) FROM rewrites WHERE status = 'vetted'"
+        ).fetchone()
+        return row[0], row[1]
+
+    def count_served(self, rewrite_ids: List[int]):
+        with self.store.transaction() as conn:
+            conn.executemany("UPDATE rewrites SET served = served + 1 WHERE id = ?", [(i,) for i in rewrite_ids])
+
+    # suggestions ----------------------------------------------------------
+
+    def put_suggestions(self, uid: str, etag: str, suggestions: List[Dict[str, Any]]):
+        """
+        Replace the suggestions for a document.
+
+        Args:
+            uid (str): Document identifier.
+            etag (str): ETag of the result the suggestions were made for.
+            suggestions (list): Dicts with id (clause id), suggested_text,
+                source, similarity and rewrites.
+        """
+        now = time.time()
+        with self.store.transaction() as conn:
+            conn.execute("DELETE FROM suggestions WHERE uid = ?", (uid,))
+            conn.executemany(
+                "INSERT INTO suggestions (uid, clause_id, etag, suggested_text, source, similarity, rewrites, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(uid, s["id"], etag, s["suggested_text"], s["source"], s.get("similarity"), json.dumps(s["rewrites"]), now)
+                 for s in suggestions],
+            )
+
+    def get_suggestions(self, uid: str, clause_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Stored suggestions for a document (or one of its clauses).
+        """
+        where, args = "uid = ?", [uid]
+        if clause_id is not None:
+            where += " AND clause_id = ?"
+            args.append(clause_id)
+        rows = self.store.connection().execute(
+            f"SELECT {_SUGGESTION_COLUMNS} FROM suggestions WHERE {where}", args
+        ).fetchall()
+        return [dict(row, rewrites=json.loads(row["rewrites"])) for row in rows]
+
+    def review_suggestion(self, uid: str, clause_id: str, status: str, retire_after: int) -> Optional[Dict[str, Any]]:
+        """
+        Record that a suggestion was accepted or rejected, and count it for
+        the library entries it was built from. An entry rejected at least
+        `retire_after` times, and more often than accepted, is retired.
+
+        Returns:
+            dict | None: The suggestion as it was before the review, or None if there is none.
+        """
+        if status not in ("accepted", "rejected"):
+            raise ValueError(f"Unknown review status: {status}")
+        with self.store.transaction() as conn:
+            row = conn.execute(
+                f"SELECT {_SUGGESTION_COLUMNS} FROM suggestions WHERE uid = ? AND clause_id = ?", (uid, clause_id)
+            ).fetchone()
+            if row is None:
+                return None
+            suggestion = dict(row, rewrites=json.loads(row["rewrites"]))
+            if suggestion["status"] == status:
+                return suggestion
+            conn.execute("UPDATE suggestions SET status = ? WHERE uid = ? AND clause_id = ?", (status, uid, clause_id))
+            ids = [(r["rewrite_id"],) for r in suggestion["rewrites"] if r.get("rewrite_id") is not None]
+            # a changed review moves the count from one column to the other
+            if suggestion["status"] in ("accepted", "rejected"):
+                conn.executemany(f"UPDATE rewrites SET {suggestion['status']} = {suggestion['status']} - 1 WHERE id = ?", ids)
+            conn.executemany(f"UPDATE rewrites SET {status} = {status} + 1 WHERE id = ?", ids)
+            conn.executemany(
+                "UPDATE rewrites SET status = 'retired' WHERE id = ? AND rejected >= ? AND rejected > accepted",
+                [(i, retire_after) for i, in ids],
+            )
+            return suggestion
+
+    def delete(self, conn: sqlite3.Connection, uid: str):
+        conn.execute("DELETE FROM suggestions WHERE uid = ?", (uid,))
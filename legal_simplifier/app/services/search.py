@@ -0,0 +1,97 @@
+"""
+Optional semantic index for portfolio search
+Keyword search is served by the FTS5 index in the document store. When
+SEARCH_EMBED_MODEL is set (and sentence-transformers is installed), clause
+texts are also embedded into an in-memory matrix so queries can be ranked by
+meaning. The matrix is filled from the store on first use and then only
+embeds clauses whose result was written since the last sync.
+"""
+import logging
+import os
+import threading
+from typing import List, Optional
+
+from app.services.store import DocumentStore, doc_store
+
+logger = logging.getLogger(__name__)
+
+# e.g. "sentence-transformers/all-MiniLM-L6-v2"; empty disables semantic search
+SEARCH_EMBED_MODEL = os.getenv("SEARCH_EMBED_MODEL", "")
+# Nearest clauses considered before the rating/severity/doc_type filters are applied
+SEARCH_SEMANTIC_CANDIDATES = int(os.getenv("SEARCH_SEMANTIC_CANDIDATES", 1000))
+
+
+class EmbeddingIndex:
+    """
+    Normalised clause embeddings keyed by clause rowid.
+    """
+
+    def __init__(self, model_name: str = SEARCH_EMBED_MODEL, store: DocumentStore = doc_store):
+        self.model_name = model_name
+        self.store = store
+        self._model = None
+        self._lock = threading.Lock()
+        self._rowids: List[int] = []
+        self._uids: List[str] = []
+        self._matrix = None
+        self._synced_at = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.model_name)
+
+    def _embed(self, texts: List[str]):
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+
+            self._model = SentenceTransformer(self.model_name)
+        return self._model.encode(texts, batch_size=64, normalize_embeddings=True, convert_to_numpy=True)
+
+    def sync(self):
+        """
+        Embed the clauses of results written since the last sync. A document
+        whose result was rewritten replaces its previous vectors.
+        """
+        import numpy as np
+
+        with self._lock:
+            rows = list(self.store.search.iter_indexed(self._synced_at))
+            if not rows:
+                return
+            changed = {row["uid"] for row in rows}
+            keep = [n for n, uid in enumerate(self._uids) if uid not in changed]
+            vectors = self._embed([row["text"] for row in rows]).astype(np.float32)
+            if self._matrix is not None and keep:
+                vectors = np.vstack([self._matrix[keep], vectors])
+            self._rowids = [self._rowids[n] for n in keep] + [row["rowid"] for row in rows]
+            self._uids = [self._uids[n] for n in keep] + [row["uid"] for row in rows]
+            self._matrix = vectors
+            self._synced_at = max(row["created_at"] for row in rows)
+            logger.info("Embedded %d clauses from %d documents (%d total)", len(rows), len(changed), len(self._rowids))
+
+    def nearest(self, query: str, k: int = SEARCH_SEMANTIC_CANDIDATES) -> List[int]:
+        """
+        Clause rowids most similar to `query`, best first.
+        """
+        import numpy as np
+
+        self.sync()
+        if self._matrix is None:
+            return []
+        scores = self._matrix @ self._embed([query])[0]
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return [self._rowids[n] for n in top[np.argsort(-scores[top])]]
+
+
+# Shared by the search router
+embedding_index = EmbeddingIndex()
+
+
+def semantic_candidates(query: str) -> Optional[List[int]]:
+    """
+    Rowids for a semantic query, or None if semantic search is disabled.
+    """
+    if not embedding_index.enabled:
+        return None
+    return embedding_index.nearest(query)
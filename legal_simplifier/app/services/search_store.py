@@ -0,0 +1,238 @@
+"""
+Search store – FTS5 full-text index of classified clauses
+The index (clause_fts) is written in the same transaction as the result it
+comes from, and serves portfolio search and chat retrieval. Rows share
+their rowid with the clauses table of the document store.
+"""
+import os
+import re
+import sqlite3
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from app.services.store import DocumentStore
+
+# Very broad searches: totals are counted up to SEARCH_COUNT_LIMIT, and
+# keyword queries with more matches than SEARCH_RANK_LIMIT come back newest
+# first instead of by relevance (ranking every match would be too slow)
+SEARCH_COUNT_LIMIT = int(os.getenv("SEARCH_COUNT_LIMIT", 10000))
+SEARCH_RANK_LIMIT = int(os.getenv("SEARCH_RANK_LIMIT", 20000))
+
+SCHEMA = """
+-- rowid = clauses.rowid; list columns hold one item per line
+CREATE VIRTUAL TABLE IF NOT EXISTS clause_fts USING fts5 (
+    text, risky_phrases, risk_types, tokenize = 'porter unicode61'
+);
+"""
+
+_QUERY_TERM_RE = re.compile(r'"([^"]+)"|(\w+)')
+
+
+def fts_query(text: str) -> str:
+    """
+    Turn free text into a safe FTS5 query: every word (or "quoted phrase")
+    must match, operators and punctuation are ignored.
+    """
+    terms = []
+    for phrase, word in _QUERY_TERM_RE.findall(text):
+        term = phrase or word
+        terms.append('"' + term.replace('"', '') + '"')
+    return " ".join(terms)
+
+
+# Words too common in questions to help ranking ("what does the contract say about ...")
+_QUESTION_STOPWORDS = frozenset(
+    "a an and are as at be but by can could do does for from has have how i if in is it its may me my of on "
+    "or our say says should that the their them there this to us was we what when where which who why will "
+    "with would you your about any agreement contract clause clauses document".split()
+)
+
+
+def fts_any_query(text: str) -> str:
+    """
+    FTS5 query matching clauses that contain any of the meaningful words of
+    a natural-language question (bm25 then favours clauses matching more).
+    """
+    words = {word.lower() for _, word in _QUERY_TERM_RE.findall(text) if word}
+    terms = sorted(w for w in words if w not in _QUESTION_STOPWORDS and len(w) > 1)
+    return " OR ".join(f'"{term}"' for term in terms)
+
+
+def _list_column(values) -> str:
+    return "\n".join(str(v) for v in values) if isinstance(values, list) else ""
+
+
+class ClauseSearch:
+    """
+    Full-text index of the classified clauses of a document store.
+    """
+
+    def __init__(self, store: "DocumentStore"):
+        self.store = store
+
+    def index_result(self, conn: sqlite3.Connection, record: Dict[str, Any]):
+        """
+        (Re)index the clauses of a result record inside the caller's transaction.
+        """
+        uid = record["uid"]
+        self.delete(conn, uid)
+        conn.executemany(
+            "INSERT INTO clause_fts (rowid, text, risky_phrases, risk_types)"
+            " SELECT rowid, text, ?, ? FROM clauses WHERE uid = ? AND clause_id = ?",
+            [
+                (_list_column(c.get("risky_phrases")), _list_column(c.get("risk_types")), uid, c.get("id"))
+                for c in record["clauses"]
+            ],
+        )
+
+    def delete(self, conn: sqlite3.Connection, uid: str):
+        conn.execute("DELETE FROM clause_fts WHERE rowid IN (SELECT rowid FROM clauses WHERE uid = ?)", (uid,))
+
+    def reindex(self) -> int:
+        """
+        Rebuild the full-text index from the stored results (e.g. after a migration).
+
+        Returns:
+            int: Number of documents indexed.
+        """
+        uids = [row["uid"] for row in self.store.connection().execute("SELECT uid FROM results").fetchall()]
+        with self.store.transaction() as conn:
+            conn.execute("DELETE FROM clause_fts")
+        for uid in uids:
+            record = self.store.load_result(uid)
+            with self.store.transaction() as conn:
+                self.index_result(conn, record)
+        return len(uids)
+
+    def clauses(
+        self,
+        query: Optional[str] = None,
+        rating: Optional[str] = None,
+        min_severity: Optional[int] = None,
+        max_severity: Optional[int] = None,
+        doc_type: Optional[str] = None,
+        risk_type: Optional[str] = None,
+        created_after: Optional[float] = None,
+        created_before: Optional[float] = None,
+        rowids: Optional[List[int]] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Search classified clauses across all documents.
+
+        Args:
+            query (str, optional): Free text matched against the clause text,
+                risky phrases and risk types (all words must match); results
+                are ranked by BM25 (newest first past SEARCH_RANK_LIMIT
+                matches). Without a query, most severe first.
+            rating, min_severity, max_severity, doc_type, risk_type: Filters.
+            created_after, created_before (float, optional): Upload time range (epoch seconds).
+            rowids (list, optional): Restrict to these clause rowids (semantic candidates).
+            limit, offset (int): Page.
+
+        Returns:
+            tuple: (number of matches, at most SEARCH_COUNT_LIMIT; page of result dicts).
+        """
+        where, args = ["c.rating IS NOT NULL"], []
+        match = fts_query(query) if query else ""
+        if risk_type:
+            match = f'{match} risk_types : "{risk_type.replace(chr(34), "")}"'.strip()
+        if match:
+            where.append("clause_fts MATCH ?")
+            args.append(match)
+        for clause, value in (
+            ("c.rating = ?", rating),
+            ("c.severity >= ?", min_severity),
+            ("c.severity <= ?", max_severity),
+            ("d.doc_type = ?", doc_type),
+            ("d.created_at >= ?", created_after),
+            ("d.created_at < ?", created_before),
+        ):
+            if value is not None:
+                where.append(clause)
+                args.append(value)
+        if rowids is not None:
+            where.append(f"c.rowid IN ({', '.join('?' * len(rowids))})")
+            args.extend(rowids)
+
+        conn = self.store.connection()
+        if match:
+            # CROSS JOIN pins the join order: walk the FTS matches and look the
+            # clause rows up by rowid, never re-run MATCH once per clause row
+            joins = (
+                " FROM clause_fts CROSS JOIN clauses c ON c.rowid = clause_fts.rowid"
+                " CROSS JOIN documents d ON d.uid = c.uid WHERE " + " AND ".join(where)
+            )
+            (matches,) = conn.execute("SELECT COUNT(*) FROM clause_fts WHERE clause_fts MATCH ?", (match,)).fetchone()
+            order = "bm25(clause_fts, 1.0, 2.0, 2.0)" if matches <= SEARCH_RANK_LIMIT else "clause_fts.rowid DESC"
+            snippet = "snippet(clause_fts, 0, '[', ']', '…', 16)"
+            page_joins = joins
+        else:
+            # filters only: served by the clause and document indexes; the FTS
+            # table is only joined for the rows of the returned page
+            joins = " FROM clauses c JOIN documents d ON d.uid = c.uid WHERE " + " AND ".join(where)
+            # same order as the clauses_risk index, so no sort over all matches
+            order = "c.severity DESC, c.uid DESC, c.rowid DESC"
+            snippet = "substr(c.text, 1, 200)"
+            page_joins = joins.replace(" WHERE ", " LEFT JOIN clause_fts ON clause_fts.rowid = c.rowid WHERE ", 1)
+
+        (total,) = conn.execute(f"SELECT COUNT(*) FROM (SELECT 1{joins} LIMIT {SEARCH_COUNT_LIMIT})", args).fetchone()
+        rows = conn.execute(
+            "SELECT c.rowid AS rowid, c.uid, d.doc_name, d.doc_type, d.created_at, c.clause_id, c.rating, c.severity,"
+            f" clause_fts.risky_phrases, clause_fts.risk_types, {snippet} AS snippet"
+            + page_joins + f" ORDER BY {order} LIMIT ? OFFSET ?",
+            (*args, limit, offset),
+        ).fetchall()
+
+        items = []
+        for row in rows:
+            item = dict(row)
+            item["risky_phrases"] = [p for p in (item["risky_phrases"] or "").split("\n") if p]
+            item["risk_types"] = [t for t in (item["risk_types"] or "").split("\n") if t]
+            items.append(item)
+        return total, items
+
+    def relevant(self, uid: str, question: str, limit: int) -> List[Dict[str, Any]]:
+        """
+        Clauses of one document most relevant to a question, best first.
+
+        Uses the full-text index written when the document's result was
+        saved. A document's clauses are inserted in one transaction, so their
+        rowids form one range and the MATCH only walks that range of the
+        index. Falls back to the most severe clauses when nothing matches.
+        """
+        conn = self.store.connection()
+        low, high = conn.execute("SELECT MIN(rowid), MAX(rowid) FROM clauses WHERE uid = ?", (uid,)).fetchone()
+        if low is None:
+            return []
+        columns = "c.clause_id, c.number, c.heading, c.text, c.rating, c.severity"
+        rows = []
+        match = fts_any_query(question)
+        if match:
+            rows = conn.execute(
+                f"SELECT {columns} FROM clause_fts CROSS JOIN clauses c ON c.rowid = clause_fts.rowid"
+                " WHERE clause_fts MATCH ? AND clause_fts.rowid BETWEEN ? AND ? AND c.uid = ?"
+                " ORDER BY bm25(clause_fts) LIMIT ?",
+                (match, low, high, uid, limit),
+            ).fetchall()
+        if not rows:
+            rows = conn.execute(
+                f"SELECT {columns} FROM clauses c WHERE c.uid = ?"
+                " ORDER BY c.severity IS NULL, c.severity DESC, c.position LIMIT ?",
+                (uid, limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def iter_indexed(self, since: float = 0.0) -> Iterator[Dict[str, Any]]:
+        """
+        Clause rowid, uid and text of every document whose result was written
+        after `since` (for building secondary indexes incrementally).
+        """
+        rows = self.store.connection().execute(
+            "SELECT c.rowid AS rowid, c.uid, c.text, r.created_at FROM results r"
+            " JOIN clauses c ON c.uid = r.uid WHERE r.created_at > ? ORDER BY r.created_at",
+            (since,),
+        )
+        for row in rows:
+            yield dict(row)
@@ -0,0 +1,205 @@
+"""
+Rule-based clause segmenter
+Splits extracted contract text into clauses in-process, without an LLM call.
+Recognises "1." / "1.1" / "I." / "Article 3" / "Section 2.1" numbering,
+keeps "(a)" / "(iv)" sub-clauses and wrapped lines inside their parent, and
+attaches an ALL-CAPS heading to the clause that follows it. Text before the
+first numbered clause becomes a "PREAMBLE" clause numbered "0". Every segment
+records its character offsets in the source text.
+"""
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Numbered levels deeper than this ("1.1.1") stay inside their parent clause
+SEGMENT_MAX_DEPTH = int(os.getenv("SEGMENT_MAX_DEPTH", 2))
+
+# Number and heading of the clause holding the text before the first numbered clause
+PREAMBLE_NUMBER = "0"
+PREAMBLE_HEADING = "PREAMBLE"
+
+# "1." "12." "3.2" "3.2." "4.1.7" "1 ." "1.Clause" – at most 3 digits per part to skip years
+_DECIMAL_RE = re.compile(r"^\s*(\d{1,3}(?:\.\d{1,3})*)\s?(?:(\.|\))\s*|\s+)(?=\S)")
+# "Article 4", "SECTION 2.1", "Clause IX:"
+_KEYWORD_RE = re.compile(r"^\s*(?:article|section|clause)\s+([ivxlc]+|\d{1,3}(?:\.\d{1,3})*)\b[.:\-–]?\s*", re.IGNORECASE)
+# "IV." roman top-level numbering
+_ROMAN_RE = re.compile(r"^\s*([IVXLC]{1,6})\.\s+(?=\S)")
+# "(a)", "(iv)", "a)" – always a sub-clause
+_SUB_RE = re.compile(r"^\s*\(?([a-z]|[ivx]{1,5})\)\s+", re.IGNORECASE)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_ROMAN_VALUES = {"I": 1, "V": 5, "X": 10, "L": 50, "C": 100}
+
+
+def _roman_to_int(value: str) -> Optional[int]:
+    total, prev = 0, 0
+    for char in reversed(value.upper()):
+        n = _ROMAN_VALUES.get(char)
+        if n is None:
+            return None
+        total = total - n if n < prev else total + n
+        prev = max(prev, n)
+    return total
+
+
+def _is_heading(line: str) -> bool:
+    """
+    Short ALL-CAPS line without a sentence-ending period, e.g. "TERMINATION".
+    """
+    stripped = line.strip()
+    letters = [c for c in stripped if c.isalpha()]
+    if len(letters) < 3 or len(stripped) > 80 or stripped.endswith((".", ",", ";", ":")):
+        return False
+    return sum(c.isupper() for c in letters) / len(letters) > 0.9
+
+
+def _marker(line: str) -> Optional[Tuple[str, Tuple[int, ...]]]:
+    """
+    Return (scheme, number parts) if the line opens a numbered clause.
+    """
+    if _SUB_RE.match(line):
+        return None
+    match = _KEYWORD_RE.match(line)
+    if match:
+        label = match.group(1)
+        if label.isdigit() or "." in label:
+            return "keyword", tuple(int(p) for p in label.split("."))
+        roman = _roman_to_int(label)
+        return ("keyword", (roman,)) if roman else None
+    match = _ROMAN_RE.match(line)
+    if match:
+        roman = _roman_to_int(match.group(1))
+        return ("roman", (roman,)) if roman else None
+    match = _DECIMAL_RE.match(line)
+    if match:
+        parts = tuple(int(p) for p in match.group(1).split("."))
+        # a bare "5 " without "." or ")" is usually a wrapped number, not a marker
+        if len(parts) == 1 and not match.group(2):
+            return None
+        return "decimal", parts
+    return None
+
+
+def _iter_lines(text: str):
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        yield offset, line
+        offset += len(line)
+
+
+def _accept(parts: Tuple[int, ...], last: Optional[Tuple[int, ...]]) -> bool:
+    """
+    Only accept a marker that plausibly continues the current numbering
+    (next sibling, first child, or next top-level number).
+    """
+    if len(parts) > SEGMENT_MAX_DEPTH:
+        return False
+    if last is None:
+        return True
+    if len(parts) == 1:
+        return parts[0] == last[0] + 1
+    prefix, n = parts[:-1], parts[-1]
+    if last[: len(prefix)] != prefix:
+        return False
+    if len(last) == len(parts):
+        return n == last[-1] + 1
+    return len(last) == len(parts) - 1 and n in (0, 1)
+
+
+def _span(text: str, start: int, end: int) -> Tuple[int, int]:
+    """
+    Shrink [start, end) so it does not begin or end with whitespace.
+    """
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _make(text: str, start: int, end: int, number: Optional[str], heading: Optional[str]) -> Optional[Dict]:
+    start, end = _span(text, start, end)
+    if start >= end:
+        return None
+    return {
+        "number": number,
+        "heading": heading,
+        # wrapped lines are joined; offsets still point at the original text
+        "text": _WHITESPACE_RE.sub(" ", text[start:end]),
+        "start_idx": start,
+        "end_idx": end,
+    }
+
+
+def _split_numbered(text: str) -> List[Dict]:
+    boundaries: List[Tuple[int, str, Optional[str]]] = []
+    scheme: Optional[str] = None
+    last: Optional[Tuple[int, ...]] = None
+    heading: Optional[Tuple[int, str]] = None  # (offset, text) of a pending heading line
+
+    for offset, line in _iter_lines(text):
+        if not line.strip():
+            continue
+        found = _marker(line)
+        if found and (scheme is None or found[0] == scheme) and _accept(found[1], last):
+            scheme, last = found[0], found[1]
+            number = ".".join(str(p) for p in found[1])
+            if heading is not None:
+                boundaries.append((heading[0], number, heading[1]))
+            else:
+                boundaries.append((offset, number, None))
+            heading = None
+            continue
+        heading = (offset, line.strip()) if _is_heading(line) else None
+
+    if boundaries and boundaries[0][0] > 0:
+        # title, parties and recitals carry obligations too
+        boundaries.insert(0, (0, PREAMBLE_NUMBER, PREAMBLE_HEADING))
+    segments = []
+    for i, (start, number, head) in enumerate(boundaries):
+        end = boundaries[i + 1][0] if i + 1 < len(boundaries) else len(text)
+        segment = _make(text, start, end, number, head)
+        if segment:
+            segments.append(segment)
+    return segments
+
+
+def _split_headings_or_paragraphs(text: str) -> List[Dict]:
+    starts: List[Tuple[int, Optional[str]]] = []
+    headings = [(o, line.strip()) for o, line in _iter_lines(text) if _is_heading(line)]
+    if len(headings) >= 2:
+        starts = headings
+    else:
+        # paragraphs separated by blank lines
+        starts = [(0, None)] + [(m.end(), None) for m in re.finditer(r"\n\s*\n", text)]
+    segments = []
+    for i, (start, head) in enumerate(starts):
+        end = starts[i + 1][0] if i + 1 < len(starts) else len(text)
+        segment = _make(text, start, end, None, head)
+        if segment:
+            segments.append(segment)
+    return segments
+
+
+def segment_clauses(text: str) -> List[Dict]:
+    """
+    Split contract text into clauses.
+
+    Text before the first numbered clause (title, parties, recitals) is
+    returned as a leading clause numbered PREAMBLE_NUMBER with heading
+    PREAMBLE_HEADING. Documents without any numbering are split on headings,
+    or on blank-line paragraphs if there are no headings either.
+
+    Args:
+        text (str): Text returned by extract_text_from_pdf.
+
+    Returns:
+        list: One dict per clause with "id" (1-based), "number", "heading",
+              "text", "start_idx" and "end_idx" (offsets into `text`).
+    """
+    segments = _split_numbered(text)
+    if not segments:
+        segments = _split_headings_or_paragraphs(text)
+    for idx, segment in enumerate(segments, start=1):
+        segment["id"] = idx
+    return segments
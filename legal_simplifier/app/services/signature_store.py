@@ -0,0 +1,135 @@
+"""
+Signature store – corpus LSH index of clause MinHash signatures
+Signatures are keyed by the LLM cache key of the clause text and bucketed by
+LSH band (app.services.clustering). Clauses whose verdict was copied from a
+near-duplicate are recorded in an audit trail written with the result.
+"""
+import sqlite3
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from app.services.store import DocumentStore
+
+SCHEMA = """
+-- MinHash signatures of classified clause texts, keyed by their LLM cache key,
+-- and their LSH band buckets (app.services.clustering)
+CREATE TABLE IF NOT EXISTS clause_signatures (
+    cache_key TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    uid TEXT NOT NULL,
+    clause_id TEXT NOT NULL,
+    negations INTEGER NOT NULL,
+    signature BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS clause_signatures_uid ON clause_signatures (uid);
+CREATE TABLE IF NOT EXISTS clause_lsh (
+    bucket INTEGER NOT NULL,
+    cache_key TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS clause_lsh_bucket ON clause_lsh (bucket);
+CREATE INDEX IF NOT EXISTS clause_lsh_key ON clause_lsh (cache_key);
+
+-- audit trail: clauses whose verdict was copied from a near-duplicate clause
+CREATE TABLE IF NOT EXISTS clause_inheritance (
+    uid TEXT NOT NULL,
+    clause_id TEXT NOT NULL,
+    source_uid TEXT NOT NULL,
+    source_clause_id TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    similarity REAL NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (uid, clause_id)
+);
+CREATE INDEX IF NOT EXISTS clause_inheritance_source ON clause_inheritance (source_uid, source_clause_id);
+"""
+
+
+class SignatureStore:
+    """
+    Near-duplicate clause signatures and inherited verdicts of a document store.
+    """
+
+    def __init__(self, store: "DocumentStore"):
+        self.store = store
+
+    def add(self, rows: List[Tuple[str, str, str, str, int, bytes, List[int]]]):
+        """
+        Add clause signatures to the corpus LSH index; keys already indexed are skipped.
+
+        Args:
+            rows (list): (cache key, result version, uid, clause id, negations,
+                packed signature, bucket ids) tuples.
+        """
+        with self.store.transaction() as conn:
+            for key, version, uid, clause_id, negations, signature, buckets in rows:
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO clause_signatures (cache_key, version, uid, clause_id, negations, signature)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, version, uid, clause_id, negations, signature),
+                )
+                if cur.rowcount:
+                    conn.executemany("INSERT INTO clause_lsh (bucket, cache_key) VALUES (?, ?)",
+                                     [(bucket, key) for bucket in buckets])
+
+    def candidates(self, buckets, version: str) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        Indexed signatures sharing an LSH bucket with the given ones.
+
+        Returns:
+            list: (bucket, row) pairs; a row has cache_key, uid, clause_id,
+                  negations and signature, and is shared between its buckets.
+        """
+        buckets, rows, found = list(buckets), {}, []
+        conn = self.store.connection()
+        # bounded IN lists stay below SQLite's variable limit
+        for start in range(0, len(buckets), 500):
+            chunk = buckets[start:start + 500]
+            for row in conn.execute(
+                "SELECT l.bucket, s.cache_key, s.uid, s.clause_id, s.negations, s.signature"
+                f" FROM clause_lsh l JOIN clause_signatures s ON s.cache_key = l.cache_key"
+                f" WHERE l.bucket IN ({', '.join('?' * len(chunk))}) AND s.version = ?",
+                (*chunk, version),
+            ):
+                entry = rows.setdefault(row["cache_key"], {k: row[k] for k in ("cache_key", "uid", "clause_id", "negations", "signature")})
+                found.append((row["bucket"], entry))
+        return found
+
+    def record_inheritance(self, conn: sqlite3.Connection, record: Dict[str, Any]):
+        """
+        Replace the audit trail of a result record ("inherited_from" of its
+        clauses) inside the caller's transaction.
+        """
+        conn.execute("DELETE FROM clause_inheritance WHERE uid = ?", (record["uid"],))
+        conn.executemany(
+            "INSERT INTO clause_inheritance (uid, clause_id, source_uid, source_clause_id, scope, similarity, created_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (record["uid"], c.get("id"), c["inherited_from"].get("uid") or record["uid"],
+                 c["inherited_from"]["clause_id"], c["inherited_from"]["scope"],
+                 c["inherited_from"]["similarity"], record["created_at"])
+                for c in record["clauses"] if c.get("inherited_from")
+            ],
+        )
+
+    def inherited(self, uid: Optional[str] = None, source_uid: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Audit trail of verdicts copied between near-duplicate clauses: the
+        clauses of `uid` that inherited one, and/or those that inherited from
+        clauses of `source_uid`.
+        """
+        where, args = [], []
+        for clause, value in (("uid = ?", uid), ("source_uid = ?", source_uid)):
+            if value is not None:
+                where.append(clause)
+                args.append(value)
+        rows = self.store.connection().execute(
+            "SELECT uid, clause_id, source_uid, source_clause_id, scope, similarity, created_at FROM clause_inheritance"
+            + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY created_at, uid, clause_id",
+            args,
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def delete(self, conn: sqlite3.Connection, uid: str):
+        conn.execute("DELETE FROM clause_lsh WHERE cache_key IN (SELECT cache_key FROM clause_signatures WHERE uid = ?)", (uid,))
+        conn.execute("DELETE FROM clause_signatures WHERE uid = ?", (uid,))
+        conn.execute("DELETE FROM clause_inheritance WHERE uid = ?", (uid,))
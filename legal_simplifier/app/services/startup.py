@@ -0,0 +1,96 @@
+"""
+Startup timing – where a cold start spends its time
+Phases (imports, app creation, lifespan steps) are timed with
+startup.phase(name) and summarised once the app is ready: one log line per
+phase plus a warning when the total exceeds STARTUP_BUDGET_SECONDS. The
+total counts from process start, so interpreter and import time are included.
+"""
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Seconds from process start until the app serves requests
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", 3.0))
+
+
+def process_age() -> Optional[float]:
+    """
+    Seconds since this process started (Linux), or None if unknown.
+    """
+    try:
+        with open("/proc/self/stat") as f:
+            # field 22 (starttime, in clock ticks since boot) follows the "(comm)" field
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupReport:
+    def __init__(self, budget: float = STARTUP_BUDGET_SECONDS):
+        self.budget = budget
+        self.phases: List[Tuple[str, float]] = []
+        self.ready_after: Optional[float] = None
+        self._forked_at: Optional[float] = None
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def reset(self):
+        """
+        Start a new report in a forked worker; its total then counts from the fork.
+        """
+        self.phases = []
+        self.ready_after = None
+        self._forked_at = time.perf_counter()
+
+    def report(self) -> Dict[str, Any]:
+        timed = sum(seconds for _, seconds in self.phases)
+        total = self.ready_after if self.ready_after is not None else timed
+        return {
+            "pid": os.getpid(),
+            "total_seconds": round(total, 3),
+            "budget_seconds": self.budget,
+            "within_budget": total <= self.budget,
+            "phases": {name: round(seconds, 3) for name, seconds in self.phases},
+            # interpreter start-up and imports not wrapped in a phase
+            "untimed_seconds": round(max(0.0, total - timed), 3),
+        }
+
+    def ready(self) -> Dict[str, Any]:
+        """
+        Mark the app as ready to serve; log and return the report.
+        """
+        if self._forked_at is not None:
+            self.ready_after = time.perf_counter() - self._forked_at
+        else:
+            self.ready_after = process_age()
+        report = self.report()
+        for name, seconds in report["phases"].items():
+            logger.info("startup %-28s %6.3fs", name, seconds)
+        if report["within_budget"]:
+            logger.info("Ready in %.3fs (budget %.1fs)", report["total_seconds"], self.budget)
+        else:
+            logger.warning("Startup took %.3fs, over the %.1fs budget: %s",
+                           report["total_seconds"], self.budget, report["phases"])
+        return report
+
+
+# Filled in by main.py and server.py
+startup = StartupReport()
+
+registry.gauge("startup_seconds", "Duration of each startup phase of this process",
+               callback=lambda: {(("phase", name),): seconds for name, seconds in startup.phases})
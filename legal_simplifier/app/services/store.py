@@ -0,0 +1,441 @@
+"""
+Document store – one SQLite database (WAL mode) for documents, clauses,
+results and jobs
+Replaces the store/{uid}/{n}.txt clause files, ocr_results/{uid}.txt and
+results/{uid}.json. Each thread (and process) gets its own connection, so
+readers never wait for the writer; writes are short transactions.
+Feature indexes share the database and its connections, each in its own
+module: full-text search (search_store), timelines (timeline_store),
+near-duplicate signatures (signature_store) and the negotiation rewrite
+library (rewrite_store).
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.services import rewrite_store, search_store, signature_store, timeline_store
+from app.services.rewrite_store import RewriteStore
+from app.services.search_store import ClauseSearch
+from app.services.signature_store import SignatureStore
+from app.services.timeline_store import TimelineStore
+
+logger = logging.getLogger(__name__)
+
+DOC_STORE_PATH = os.getenv("DOC_STORE_PATH", os.path.join("store", "documents.sqlite3"))
+# Seconds a writer waits for another process' transaction before failing
+DOC_STORE_TIMEOUT = float(os.getenv("DOC_STORE_TIMEOUT", 10))
+# PDF blobs are copied in and out in pieces of this many bytes
+BLOB_CHUNK_SIZE = 1 << 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    uid TEXT PRIMARY KEY,
+    doc_name TEXT NOT NULL,
+    doc_type TEXT,
+    filename TEXT,
+    version INTEGER NOT NULL,
+    previous_uid TEXT,
+    batch_id TEXT,
+    pdf BLOB,
+    text TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_name ON documents (doc_name, version);
+CREATE INDEX IF NOT EXISTS documents_type ON documents (doc_type, created_at);
+-- covering index for search filters joined from clauses
+CREATE INDEX IF NOT EXISTS documents_filter ON documents (uid, doc_type, created_at);
+
+CREATE TABLE IF NOT EXISTS clauses (
+    uid TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    clause_id TEXT NOT NULL,
+    number TEXT,
+    heading TEXT,
+    text TEXT NOT NULL,
+    start_idx INTEGER,
+    end_idx INTEGER,
+    rating TEXT,
+    severity INTEGER,
+    decided_by TEXT,
+    PRIMARY KEY (uid, position)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS clauses_id ON clauses (uid, clause_id);
+CREATE INDEX IF NOT EXISTS clauses_risk ON clauses (rating, severity, uid);
+
+CREATE TABLE IF NOT EXISTS results (
+    uid TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    etag TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    clauses TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS jobs (
+    uid TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    stage TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+"""
+# Tables of the feature indexes, created with the core ones
+_FEATURE_SCHEMAS = (search_store.SCHEMA, timeline_store.SCHEMA, signature_store.SCHEMA, rewrite_store.SCHEMA)
+
+# Columns added after the first release: (table, column, type), applied to older databases on open
+_ADDED_COLUMNS = [
+    ("clauses", "decided_by", "TEXT"),
+    ("documents", "batch_id", "TEXT"),
+    ("jobs", "worker_pid", "INTEGER"),
+]
+# Indexes on added columns, created once the columns exist
+_ADDED_INDEXES = """
+CREATE INDEX IF NOT EXISTS documents_batch ON documents (batch_id);
+CREATE INDEX IF NOT EXISTS jobs_worker ON jobs (worker_pid, status);
+"""
+
+_CLAUSE_COLUMNS = ("position", "clause_id", "number", "heading", "text", "start_idx", "end_idx", "rating", "severity")
+
+
+class DocumentStore:
+    """
+    Indexed storage for everything the pipeline produces about a document.
+    The feature indexes are reached through .search, .timelines,
+    .signatures and .rewrites.
+    """
+
+    def __init__(self, path: str = DOC_STORE_PATH, timeout: float = DOC_STORE_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self.search = ClauseSearch(self)
+        self.timelines = TimelineStore(self)
+        self.signatures = SignatureStore(self)
+        self.rewrites = RewriteStore(self)
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Connection of the calling thread (autocommit; use transaction() to write).
+        """
+        # per thread and per process: a connection must not cross a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # autocommit mode; transactions are opened explicitly in transaction()
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with self._schema_lock:
+            if not self._schema_ready:
+                conn.executescript(SCHEMA)
+                for schema in _FEATURE_SCHEMAS:
+                    conn.executescript(schema)
+                for table, column, kind in _ADDED_COLUMNS:
+                    if column not in {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}:
+                        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+                conn.executescript(_ADDED_INDEXES)
+                self._schema_ready = True
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        # IMMEDIATE takes the write lock up front, so read-then-write
+        # sequences (e.g. picking the next version number) cannot interleave
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # documents ------------------------------------------------------------
+
+    def add_document(self, uid: str, doc_name: str, doc_type: Optional[str] = None,
+                     filename: Optional[str] = None, created_at: Optional[float] = None,
+                     batch_id: Optional[str] = None) -> Tuple[int, Optional[str]]:
+        """
+        Register a new document as the newest version of `doc_name`.
+
+        Returns:
+            tuple: (version number starting at 1, uid of the previous version or None).
+        """
+        with self.transaction() as conn:
+            row = conn.execute(
+                "SELECT uid, version FROM documents WHERE doc_name = ? ORDER BY version DESC LIMIT 1", (doc_name,)
+            ).fetchone()
+            version, previous_uid = (row["version"] + 1, row["uid"]) if row else (1, None)
+            conn.execute(
+                "INSERT INTO documents (uid, doc_name, doc_type, filename, version, previous_uid, batch_id, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (uid, doc_name, doc_type, filename, version, previous_uid, batch_id, created_at or time.time()),
+            )
+        return version, previous_uid
+
+    def get_document(self, uid: str) -> Optional[Dict[str, Any]]:
+        """
+        Document metadata (without the PDF and text), or None.
+        """
+        row = self.connection().execute(
+            "SELECT uid, doc_name, doc_type, filename, version, previous_uid, created_at,"
+            " pdf IS NOT NULL AS has_pdf, text IS NOT NULL AS has_text FROM documents WHERE uid = ?",
+            (uid,),
+        ).fetchone()
+        return dict(row) if row else None
+
+    def batch_documents(self, batch_id: str) -> List[Dict[str, Any]]:
+        """
+        Documents of a bulk upload with their last recorded job state, in upload order.
+        """
+        rows = self.connection().execute(
+            "SELECT d.uid, d.filename, d.doc_name, d.version, COALESCE(j.status, 'queued') AS status, j.stage, j.error"
+            " FROM documents d LEFT JOIN jobs j ON j.uid = d.uid WHERE d.batch_id = ? ORDER BY d.rowid",
+            (batch_id,),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def previous_version(self, uid: str) -> Optional[str]:
+        row = self.connection().execute("SELECT previous_uid FROM documents WHERE uid = ?", (uid,)).fetchone()
+        return row["previous_uid"] if row else None
+
+    def delete_document(self, uid: str):
+        """
+        Remove a document and everything derived from it.
+        """
+        with self.transaction() as conn:
+            for feature in (self.search, self.timelines, self.signatures, self.rewrites):
+                feature.delete(conn, uid)
+            for table in ("documents", "clauses", "results", "jobs"):
+                conn.execute(f"DELETE FROM {table} WHERE uid = ?", (uid,))
+
+    def put_pdf(self, uid: str, path: str, chunk_size: int = BLOB_CHUNK_SIZE):
+        """
+        Copy a PDF file into the document row without loading it into memory.
+        """
+        size = os.path.getsize(path)
+        with self.transaction() as conn:
+            cur = conn.execute("UPDATE documents SET pdf = zeroblob(?) WHERE uid = ?", (size, uid))
+            if not cur.rowcount:
+                raise KeyError(f"Unknown document {uid}")
+            (rowid,) = conn.execute("SELECT rowid FROM documents WHERE uid = ?", (uid,)).fetchone()
+            if size:
+                with conn.blobopen("documents", "pdf", rowid) as blob, open(path, "rb") as f:
+                    for chunk in iter(lambda: f.read(chunk_size), b""):
+                        blob.write(chunk)
+
+    def iter_pdf(self, uid: str, chunk_size: int = BLOB_CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Stream the stored PDF in chunks.
+
+        Raises:
+            FileNotFoundError: If the document has no stored PDF.
+        """
+        conn = self.connection()
+        row = conn.execute("SELECT rowid FROM documents WHERE uid = ? AND pdf IS NOT NULL", (uid,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"No PDF stored for UID {uid}")
+        with conn.blobopen("documents", "pdf", row[0], readonly=True) as blob:
+            while True:
+                chunk = blob.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def set_text(self, uid: str, text: str):
+        with self.transaction() as conn:
+            conn.execute("UPDATE documents SET text = ? WHERE uid = ?", (text, uid))
+
+    def put_text_file(self, uid: str, path: str, chunk_size: int = BLOB_CHUNK_SIZE):
+        """
+        Copy a UTF-8 text file into the document row without loading it into
+        memory (stored as bytes, decoded by get_text).
+        """
+        size = os.path.getsize(path)
+        with self.transaction() as conn:
+            cur = conn.execute("UPDATE documents SET text = zeroblob(?) WHERE uid = ?", (size, uid))
+            if not cur.rowcount:
+                raise KeyError(f"Unknown document {uid}")
+            (rowid,) = conn.execute("SELECT rowid FROM documents WHERE uid = ?", (uid,)).fetchone()
+            if size:
+                with conn.blobopen("documents", "text", rowid) as blob, open(path, "rb") as f:
+                    for chunk in iter(lambda: f.read(chunk_size), b""):
+                        blob.write(chunk)
+
+    def get_text(self, uid: str) -> Optional[str]:
+        """
+        Extracted text of the document (what ocr_results/{uid}.txt used to hold), or None.
+        """
+        row = self.connection().execute("SELECT text FROM documents WHERE uid = ?", (uid,)).fetchone()
+        if row is None or row["text"] is None:
+            return None
+        text = row["text"]
+        return text.decode("utf-8", errors="replace") if isinstance(text, bytes) else text
+
+    # clauses --------------------------------------------------------------
+
+    def put_clauses(self, uid: str, clauses: List[Dict[str, Any]]):
+        """
+        Replace the clauses of a document in one transaction.
+
+        Args:
+            uid (str): Document identifier.
+            clauses (list): Dicts with clause_id and text, plus optional
+                number, heading, start_idx and end_idx; stored in list order.
+        """
+        rows = [
+            (uid, position, c["clause_id"], c.get("number"), c.get("heading"), c["text"],
+             c.get("start_idx"), c.get("end_idx"))
+            for position, c in enumerate(clauses)
+        ]
+        with self.transaction() as conn:
+            self.search.delete(conn, uid)
+            conn.execute("DELETE FROM clauses WHERE uid = ?", (uid,))
+            conn.executemany(
+                "INSERT INTO clauses (uid, position, clause_id, number, heading, text, start_idx, end_idx)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def get_clauses(self, uid: str) -> List[Dict[str, Any]]:
+        """
+        Clauses of a document in document order ([] if none).
+        """
+        rows = self.connection().execute(
+            f"SELECT {', '.join(_CLAUSE_COLUMNS)} FROM clauses WHERE uid = ? ORDER BY position", (uid,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_clause(self, uid: str, clause_id: str) -> Optional[Dict[str, Any]]:
+        row = self.connection().execute(
+            f"SELECT {', '.join(_CLAUSE_COLUMNS)} FROM clauses WHERE uid = ? AND clause_id = ?", (uid, clause_id)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def find_clauses(self, rating: Optional[str] = None, uid: Optional[str] = None,
+                     min_severity: Optional[int] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Classified clauses filtered by rating / document / minimum severity,
+        most severe first.
+        """
+        where, args = ["rating IS NOT NULL"], []
+        if rating is not None:
+            where.append("rating = ?")
+            args.append(rating)
+        if uid is not None:
+            where.append("uid = ?")
+            args.append(uid)
+        if min_severity is not None:
+            where.append("severity >= ?")
+            args.append(min_severity)
+        rows = self.connection().execute(
+            f"SELECT uid, {', '.join(_CLAUSE_COLUMNS)} FROM clauses WHERE {' AND '.join(where)}"
+            " ORDER BY severity DESC, uid, position LIMIT ?",
+            (*args, limit),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    # results --------------------------------------------------------------
+
+    def save_result(self, record: Dict[str, Any]):
+        """
+        Store a result record, copy each clause's rating/severity onto the
+        clause rows so they can be queried by risk, (re)index the clauses
+        for full-text search and record which clauses inherited their
+        verdict from a near-duplicate ("inherited_from").
+        """
+        ratings = [
+            (c.get("rating"), c.get("severity") if isinstance(c.get("severity"), int) else None,
+             c.get("decided_by"), record["uid"], c.get("id"))
+            for c in record["clauses"]
+        ]
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (uid, version, etag, created_at, clauses) VALUES (?, ?, ?, ?, ?)",
+                (record["uid"], record["version"], record["etag"], record["created_at"], json.dumps(record["clauses"])),
+            )
+            conn.executemany(
+                "UPDATE clauses SET rating = ?, severity = ?, decided_by = ? WHERE uid = ? AND clause_id = ?", ratings
+            )
+            self.search.index_result(conn, record)
+            self.signatures.record_inheritance(conn, record)
+
+    def training_clauses(self, limit: int) -> List[Tuple[str, str]]:
+        """
+        (text, rating) of the most recent clauses rated by the LLM (not by
+        the local pre-classifier), for training local models.
+        """
+        rows = self.connection().execute(
+            "SELECT text, rating FROM clauses WHERE rating IN ('red', 'yellow', 'green')"
+            " AND (decided_by IS NULL OR decided_by = 'llm') ORDER BY rowid DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+        return [(row["text"], row["rating"]) for row in rows]
+
+    def load_result(self, uid: str) -> Optional[Dict[str, Any]]:
+        row = self.connection().execute(
+            "SELECT uid, version, etag, created_at, clauses FROM results WHERE uid = ?", (uid,)
+        ).fetchone()
+        if row is None:
+            return None
+        record = dict(row)
+        record["clauses"] = json.loads(record["clauses"])
+        return record
+
+    # jobs -----------------------------------------------------------------
+
+    def save_job(self, job: Dict[str, Any]):
+        """
+        Upsert a job status dict (Job.to_dict()), owned by this process.
+        """
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (uid, status, stage, error, created_at, updated_at, worker_pid)"
+                " VALUES (:uid, :status, :stage, :error, :created_at, :updated_at, :worker_pid)",
+                dict(job, worker_pid=os.getpid()),
+            )
+
+    def get_job(self, uid: str) -> Optional[Dict[str, Any]]:
+        row = self.connection().execute(
+            "SELECT uid, status, stage, error, created_at, updated_at FROM jobs WHERE uid = ?", (uid,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def fail_interrupted_jobs(self, worker_pid: Optional[int] = None) -> int:
+        """
+        Mark jobs left queued/running by a previous process as failed.
+        Call once at startup, before any job is submitted.
+
+        Args:
+            worker_pid (int, optional): Only fail the jobs of this (dead)
+                worker process; the other workers keep running theirs.
+        """
+        query = ("UPDATE jobs SET status = 'failed', error = 'Interrupted by a server restart', updated_at = ?"
+                 " WHERE status IN ('queued', 'running')")
+        params: tuple = (time.time(),)
+        if worker_pid is not None:
+            query += " AND worker_pid = ?"
+            params += (worker_pid,)
+        with self.transaction() as conn:
+            cur = conn.execute(query, params)
+        if cur.rowcount:
+            logger.warning("Marked %d interrupted jobs as failed", cur.rowcount)
+        return cur.rowcount
+
+
+# Shared by the upload pipeline and all routers
+doc_store = DocumentStore()
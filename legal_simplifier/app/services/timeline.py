@@ -0,0 +1,496 @@
+"""
+Obligation and deadline timeline
+A local parser pulls explicit dates ("1 March 2025", "2025-03-01") and
+durations ("thirty (30) days' notice", "a term of two years from the
+Effective Date") out of every clause and resolves them against the
+document's effective and expiry dates into events: effective, expiry,
+renewal, notice deadlines, payment due dates and termination windows.
+Recurring obligations ("on the 1st day of every month") are expanded into
+dated occurrences over the term.
+Only sentences the parser cannot pin down (numeric dates that read both
+day-first and month-first, vague periods such as "quarterly" or "within a
+reasonable time") go to the LLM, batched and through the LLM cache.
+Events are kept in the document store; their dates sit in an R*Tree
+interval index, so range questions across all documents never re-read text.
+"""
+import asyncio
+import calendar
+import json
+import logging
+import os
+import re
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from app import config
+from app.services.batching import parse_json_array
+from app.services.llm import LLMGateway
+from app.services.llm_cache import cache_key, llm_cache
+from app.services.metrics import registry
+from app.services.store import DocumentStore, doc_store
+from app.services.timeline_store import TIMELINE_ID_STRIDE
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the parser or the fallback prompt change so timelines are rebuilt
+TIMELINE_VERSION = "timeline-v1"
+# How numeric dates like 03/04/2025 are read when nothing disambiguates them: "DMY" or "MDY"
+TIMELINE_DATE_ORDER = os.getenv("TIMELINE_DATE_ORDER", "DMY").upper()
+# 0 keeps the timeline parser-only (ambiguous sentences are resolved by TIMELINE_DATE_ORDER or skipped)
+TIMELINE_LLM_FALLBACK = os.getenv("TIMELINE_LLM_FALLBACK", "1") == "1"
+# Ambiguous sentences per LLM request
+TIMELINE_BATCH_SIZE = int(os.getenv("TIMELINE_BATCH_SIZE", 20))
+# Recurring obligations are expanded up to the expiry date, or this many years past the effective date
+TIMELINE_HORIZON_YEARS = int(os.getenv("TIMELINE_HORIZON_YEARS", 3))
+# Durations longer than this are ignored ("a term of 9999 years")
+TIMELINE_MAX_YEARS = int(os.getenv("TIMELINE_MAX_YEARS", 100))
+
+timeline_model = config.LLM_MODEL
+timeline_temperature = 0.0
+
+KINDS = ("effective", "expiry", "renewal", "notice", "payment", "termination", "other")
+# Most dated occurrences stored per event
+MAX_OCCURRENCES = TIMELINE_ID_STRIDE
+# Upper bound of each unit in days, to reject overlong durations before any date arithmetic
+_UNIT_DAYS = {"day": 1, "business day": 2, "week": 7, "month": 31, "year": 366}
+
+_MONTHS = {calendar.month_abbr[n].lower(): n for n in range(1, 13)}
+_MONTH = r"(?P<month>jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sept?(?:ember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+_DATE_RES = [
+    ("ymd", re.compile(r"\b(?P<y>\d{4})-(?P<m>\d{1,2})-(?P<d>\d{1,2})\b")),
+    ("mdy", re.compile(rf"\b{_MONTH}\.?\s+(?P<d>\d{{1,2}})(?:st|nd|rd|th)?,?\s+(?P<y>\d{{4}})\b", re.IGNORECASE)),
+    ("dmy", re.compile(rf"\b(?P<d>\d{{1,2}})(?:st|nd|rd|th)?\s+(?:day\s+of\s+)?{_MONTH}\.?,?\s+(?P<y>\d{{4}})\b", re.IGNORECASE)),
+    ("numeric", re.compile(r"\b(?P<a>\d{1,2})[/.-](?P<b>\d{1,2})[/.-](?P<y>\d{4})\b")),
+]
+
+_UNITS = {"zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
+          "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14, "fifteen": 15,
+          "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19}
+_TENS = {"twenty": 20, "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90}
+_WORD_NUMBER = (rf"(?:{'|'.join(_TENS)})(?:[\s-](?:{'|'.join(u for u in _UNITS if _UNITS[u] < 10)}))?"
+                rf"|{'|'.join(sorted(_UNITS, key=len, reverse=True))}")
+_DURATION_RE = re.compile(
+    rf"(?:\b(?P<words>{_WORD_NUMBER})(?:\s*\((?P<paren>\d{{1,4}})\))?|\(?\b(?P<digits>\d{{1,4}})\)?)"
+    r"[\s-]+(?P<business>(?:business|working)\s+)?(?:calendar\s+|clear\s+)?(?P<unit>day|week|month|year)s?(?![a-z])",
+    re.IGNORECASE,
+)
+
+# Sentence kind, first match wins
+_KIND_RES = [
+    ("renewal", re.compile(r"\brenew", re.IGNORECASE)),
+    ("payment", re.compile(r"\b(?:pay(?:able|ment)?|paid|invoices?|rent|fees?|instal+ments?|dues?)\b", re.IGNORECASE)),
+    ("termination", re.compile(r"\b(?:terminat\w*|cancel\w*|vacate|lock[- ]in)\b", re.IGNORECASE)),
+    ("expiry", re.compile(r"\b(?:expir\w*|end(?:s|ing)? on|until|term of|period of|duration)\b", re.IGNORECASE)),
+    ("effective", re.compile(r"\b(?:effective|commenc\w*|made (?:at [^.]{0,40})?on|dated|entered into|executed on|start(?:s|ing)? on)\b", re.IGNORECASE)),
+    ("notice", re.compile(r"\bnotice\b", re.IGNORECASE)),
+]
+_BEFORE_RE = re.compile(r"^[\s'’`]*(?:[\w']+\s+){0,4}?(?:prior to|before|preceding)\b", re.IGNORECASE)
+_AFTER_RE = re.compile(r"^[\s'’`]*(?:[\w']+\s+){0,4}?(?:from|after|following|of|commencing)\b", re.IGNORECASE)
+_EFFECTIVE_REF_RE = re.compile(r"effective date|commencement|start date|date of (?:this|the) (?:agreement|lease|contract)|execution|signing", re.IGNORECASE)
+_EXPIRY_REF_RE = re.compile(r"expir\w*|end of (?:the|this) (?:then[- ]current )?(?:term|agreement|lease)|termination date|renewal date", re.IGNORECASE)
+_WINDOW_RE = re.compile(r"\b(?:first|initial|lock[- ]in(?:\s+period)?(?:\s+of)?|within|during)\s*(?:a\s+period\s+of\s+)?$", re.IGNORECASE)
+_RECURRENCE_RE = re.compile(r"\b(?:each|every|per)\s+(?:\w+\s+){0,2}?(?P<unit>week|month|quarter|year)\b"
+                            r"|\b(?P<adverb>weekly|monthly|quarterly|annually|yearly)\b", re.IGNORECASE)
+_DAY_OF_MONTH_RE = re.compile(r"\b(?P<day>\d{1,2})(?:st|nd|rd|th)\s+(?:day\s*\]?\s+)?of\s+(?:each|every|the)\b", re.IGNORECASE)
+# Time phrases the parser cannot quantify; such sentences go to the LLM when nothing else was found
+_VAGUE_RE = re.compile(
+    r"\b(?:reasonable (?:time|period|notice)|promptly|forthwith|without undue delay|as soon as (?:reasonably )?practicable"
+    r"|end of (?:the|each|every) (?:calendar )?(?:month|quarter|year)|anniversary|fortnight(?:ly)?|half[- ]yearly"
+    r"|bi-?annual(?:ly)?|quarterly)\b",
+    re.IGNORECASE,
+)
+_SENTENCE_RE = re.compile(r"(?<=[.;:])\s+(?=[A-Z(\[])|\n{2,}")
+
+TIMELINE_EVENTS = registry.counter("timeline_events_total", "Timeline events extracted, by source")
+
+
+def find_dates(text: str, order: str = TIMELINE_DATE_ORDER) -> List[Tuple[int, date, bool]]:
+    """
+    Explicit calendar dates in a piece of text.
+
+    Args:
+        text (str): Sentence to scan.
+        order (str): "DMY" or "MDY", how to read numeric dates.
+
+    Returns:
+        list: (position, date, ambiguous) in text order; ambiguous is True for
+              numeric dates that are valid both day-first and month-first.
+    """
+    found, taken = [], []
+    for style, pattern in _DATE_RES:
+        for m in pattern.finditer(text):
+            if any(start < m.end() and m.start() < end for start, end in taken):
+                continue
+            ambiguous = False
+            try:
+                if style == "numeric":
+                    a, b = int(m["a"]), int(m["b"])
+                    day, month = (a, b) if order == "DMY" else (b, a)
+                    ambiguous = a != b and a <= 12 and b <= 12
+                    if month > 12:
+                        # only one reading is a valid date
+                        day, month = month, day
+                    value = date(int(m["y"]), month, day)
+                elif style == "ymd":
+                    value = date(int(m["y"]), int(m["m"]), int(m["d"]))
+                else:
+                    value = date(int(m["y"]), _MONTHS[m["month"].lower()[:3]], int(m["d"]))
+            except ValueError:
+                continue
+            taken.append((m.start(), m.end()))
+            found.append((m.start(), value, ambiguous))
+    return sorted(found, key=lambda item: item[0])
+
+
+def _number(m: re.Match) -> Optional[int]:
+    if m["paren"] or m["digits"]:
+        return int(m["paren"] or m["digits"])
+    words = re.split(r"[\s-]+", m["words"].lower())
+    return sum(_TENS.get(w, _UNITS.get(w, 0)) for w in words)
+
+
+def shift(day: date, n: int, unit: str, sign: int = 1) -> date:
+    """
+    Move a date by n days, business days, weeks, months or years.
+    Month arithmetic keeps the day of month, clamped to the month's length.
+
+    Raises:
+        ValueError: If the result is outside date.min..date.max.
+    """
+    try:
+        if unit in ("month", "year"):
+            months = day.month - 1 + sign * n * (12 if unit == "year" else 1)
+            year, month = day.year + months // 12, months % 12 + 1
+            return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+        if unit == "business day":
+            step, left = timedelta(days=sign), n
+            while left > 0:
+                day += step
+                left -= day.weekday() < 5
+            return day
+        return day + timedelta(days=sign * n * (7 if unit == "week" else 1))
+    except (OverflowError, ValueError):
+        raise ValueError(f"{day.isoformat()} shifted by {sign * n} {unit}(s) is out of range")
+
+
+def within_limit(n: int, unit: str) -> bool:
+    """
+    True if a duration is at most TIMELINE_MAX_YEARS long.
+    """
+    return n * _UNIT_DAYS.get(unit, 1) <= TIMELINE_MAX_YEARS * 366
+
+
+def _duration_days(n: int, unit: str) -> int:
+    start = date(2001, 1, 1)
+    return (shift(start, n, unit) - start).days
+
+
+def sentence_kind(sentence: str) -> str:
+    for kind, pattern in _KIND_RES:
+        if pattern.search(sentence):
+            return kind
+    return "other"
+
+
+def _recurrence(sentence: str) -> Optional[str]:
+    m = _RECURRENCE_RE.search(sentence)
+    if m is None:
+        return None
+    if m["adverb"]:
+        return {"weekly": "weekly", "monthly": "monthly", "quarterly": "quarterly"}.get(m["adverb"].lower(), "yearly")
+    return {"week": "weekly", "month": "monthly", "quarter": "quarterly"}.get(m["unit"].lower(), "yearly")
+
+
+def split_sentences(text: str) -> List[str]:
+    return [" ".join(s.split()) for s in _SENTENCE_RE.split(text) if s and s.strip()]
+
+
+def parse_sentence(sentence: str, clause_id: str) -> Tuple[List[dict], bool]:
+    """
+    Mentions of dates and durations in one sentence.
+
+    A mention is a dict: kind, date (explicit), or n/unit plus anchor
+    ("effective", "expiry", "event" or None), sign (+1 after the anchor,
+    -1 before it, 0 at it) and window (the whole span rather than its end),
+    and recurrence. Dates are resolved later by resolve().
+
+    Returns:
+        tuple: (mentions, ambiguous) – ambiguous when the LLM should read the sentence.
+    """
+    kind = sentence_kind(sentence)
+    recurrence = _recurrence(sentence) if kind in ("payment", "other", "notice") else None
+    base = dict(clause_id=clause_id, text=sentence, source="parser", recurrence=recurrence)
+    mentions, ambiguous = [], False
+
+    dates = find_dates(sentence)
+    for n, (_, value, unclear) in enumerate(dates):
+        ambiguous |= unclear
+        mention_kind = kind
+        # "from 1 April 2025 until 31 March 2026": start and end of the term
+        if len(dates) == 2 and kind in ("effective", "expiry"):
+            mention_kind = ("effective", "expiry")[n]
+        mentions.append(dict(base, kind=mention_kind, date=value))
+
+    for m in _DURATION_RE.finditer(sentence):
+        n = _number(m)
+        if not n:
+            continue
+        unit = "business day" if m["business"] and m["unit"].lower() == "day" else m["unit"].lower()
+        tail = sentence[m.end():m.end() + 90]
+        head = sentence[max(0, m.start() - 40):m.start()]
+        anchor, sign, mention_kind = None, 1, kind
+        if _BEFORE_RE.match(tail):
+            sign = -1
+            anchor = "expiry" if _EXPIRY_REF_RE.search(tail) else "event"
+            if anchor == "expiry" and re.search(r"\bnotice\b", sentence, re.IGNORECASE):
+                mention_kind = "notice"
+        elif _AFTER_RE.match(tail):
+            if _EFFECTIVE_REF_RE.search(tail):
+                anchor = "effective"
+            elif _EXPIRY_REF_RE.search(tail):
+                anchor = "expiry"
+            else:
+                anchor = "event"
+        elif kind == "expiry" or (kind == "effective" and re.search(r"\b(?:term|period) of\s*$", head, re.IGNORECASE)):
+            # "for a term of two years": the term runs from the effective date
+            anchor, mention_kind = "effective", "expiry"
+        elif kind == "renewal":
+            # "renews for successive one-year periods": renews at expiry
+            anchor, sign = "expiry", 0
+        window = bool(_WINDOW_RE.search(head))
+        if window and anchor is None and re.search(r"first|initial|lock", head, re.IGNORECASE):
+            anchor = "effective"
+        mentions.append(dict(base, kind=mention_kind, n=n, unit=unit, anchor=anchor, sign=sign, window=window))
+
+    if not mentions and recurrence:
+        # "on the 1st day of every month": dated from the effective date in resolve()
+        mentions.append(dict(base, kind=kind))
+    if not mentions and _VAGUE_RE.search(sentence):
+        ambiguous = True
+    return mentions, ambiguous
+
+
+def _day_of_month(sentence: str) -> Optional[int]:
+    m = _DAY_OF_MONTH_RE.search(sentence)
+    return int(m["day"]) if m and 1 <= int(m["day"]) <= 31 else None
+
+
+def _occurrences(start: date, until: date, recurrence: str, day_of_month: Optional[int]) -> List[date]:
+    step = {"weekly": (1, "week"), "monthly": (1, "month"), "quarterly": (3, "month"), "yearly": (1, "year")}[recurrence]
+    first = start
+    if day_of_month and recurrence != "weekly":
+        first = start.replace(day=min(day_of_month, calendar.monthrange(start.year, start.month)[1]))
+        if first < start:
+            first = shift(first, 1, "month")
+    days = []
+    while len(days) < MAX_OCCURRENCES:
+        # always step from the first date so month-end days do not drift
+        current = shift(first, step[0] * len(days), step[1])
+        if current > until:
+            break
+        days.append(current)
+    return days
+
+
+def resolve(mentions: List[dict]) -> Tuple[Dict[str, Optional[date]], List[dict]]:
+    """
+    Turn mentions into events with dates.
+
+    The effective date is the first explicit date of an "effective" mention
+    (else the first date of the document); the expiry date is the first
+    explicit "expiry" date, else effective date + stated term.
+
+    Returns:
+        tuple: ({"effective": date|None, "expiry": date|None}, events). Each
+               event has kind, start_date, end_date (None if undatable),
+               duration_days, recurrence, occurrences (dates) and text.
+    """
+    # overlong durations ("a term of 9999 years") cannot be dated; drop them
+    mentions = [m for m in mentions if not m.get("n") or within_limit(m["n"], m["unit"])]
+    dated = [m for m in mentions if m.get("date")]
+    effective = next((m["date"] for m in dated if m["kind"] == "effective"), None)
+    if effective is None and dated:
+        effective = dated[0]["date"]
+    expiry = next((m["date"] for m in dated if m["kind"] == "expiry"), None)
+    if expiry is None and effective is not None:
+        term = next((m for m in mentions if m["kind"] == "expiry" and m.get("anchor") == "effective"
+                     and not m.get("window")), None)
+        if term is not None:
+            try:
+                expiry = shift(effective, term["n"], term["unit"])
+            except ValueError as e:
+                logger.info("Ignoring the stated term: %s", str(e))
+    anchors = {"effective": effective, "expiry": expiry}
+
+    events, seen = [], set()
+    for m in mentions:
+        try:
+            start, end, duration, occurrences = _date_mention(m, anchors)
+        except ValueError as e:
+            # a date near date.min/date.max: skip the mention rather than the whole timeline
+            logger.info("Skipping timeline mention in clause %s: %s", m["clause_id"], str(e))
+            continue
+
+        key = (m["clause_id"], m["kind"], start, end, duration, m.get("recurrence"))
+        if key in seen:
+            continue
+        seen.add(key)
+        events.append({
+            "clause_id": m["clause_id"],
+            "kind": m["kind"],
+            "start_date": start.isoformat() if start else None,
+            "end_date": end.isoformat() if end else None,
+            "duration_days": duration,
+            "anchor": m.get("anchor"),
+            "recurrence": m.get("recurrence"),
+            "text": m["text"][:500],
+            "source": m["source"],
+            "occurrences": occurrences,
+        })
+        TIMELINE_EVENTS.inc(source=m["source"])
+    return anchors, events
+
+
+def _date_mention(m: dict, anchors: Dict[str, Optional[date]]) -> tuple:
+    # (start, end, duration in days, occurrences) of one mention
+    effective, expiry = anchors["effective"], anchors["expiry"]
+    start = end = None
+    duration = _duration_days(m["n"], m["unit"]) if m.get("n") else None
+    if m.get("date"):
+        start = end = m["date"]
+    elif m.get("anchor") in anchors and anchors[m["anchor"]] is not None:
+        base = anchors[m["anchor"]]
+        other = shift(base, m["n"], m["unit"], m["sign"]) if m["sign"] else base
+        start, end = (min(base, other), max(base, other)) if m.get("window") else (other, other)
+
+    occurrences = [(start, end)] if start else []
+    if m.get("recurrence") and effective is not None and start is None:
+        until = expiry or shift(effective, TIMELINE_HORIZON_YEARS, "year")
+        days = _occurrences(effective, until, m["recurrence"], _day_of_month(m["text"]))
+        occurrences = [(day, day) for day in days]
+        if days:
+            start, end = days[0], days[-1]
+    return start, end, duration, occurrences
+
+
+def extract_mentions(clauses: List[dict]) -> Tuple[List[dict], List[Tuple[str, str]]]:
+    """
+    Parse every sentence of the clauses.
+
+    Returns:
+        tuple: (mentions, [(clause_id, sentence), ...] of sentences for the LLM).
+    """
+    mentions, unclear = [], []
+    for clause in clauses:
+        for sentence in split_sentences(clause["text"]):
+            found, ambiguous = parse_sentence(sentence, clause["clause_id"])
+            if ambiguous:
+                unclear.append((clause["clause_id"], sentence))
+            mentions.extend(found)
+    return mentions, unclear
+
+
+def generate_prompt(sentences: List[str]) -> str:
+    numbered = "\n".join(f"[{n}]\n{sentence}" for n, sentence in enumerate(sentences, start=1))
+    return (
+        "TIMELINE MODE. You extract dates and deadlines from contract sentences. For every numbered sentence "
+        "list the dated obligations or periods it states. Read numeric dates day-first unless the sentence "
+        "makes month-first clear. Do not invent dates that are not stated or implied.\n"
+        "Respond with ONLY a JSON array with one object per sentence:\n"
+        '[{"id": 1, "events": [{"kind": "effective|expiry|renewal|notice|payment|termination|other", '
+        '"date": "YYYY-MM-DD" or null, "duration_days": integer or null, '
+        '"anchor": "effective|expiry|event" or null, "before_anchor": true|false, '
+        '"recurrence": "weekly|monthly|quarterly|yearly" or null}]}]\n'
+        "Use an empty events list when a sentence states no usable date or period.\n\n"
+        f"SENTENCES:\n{numbered}"
+    )
+
+
+def _llm_mentions(items: list, clause_id: str, sentence: str) -> List[dict]:
+    # validate the model's events into the parser's mention format
+    mentions = []
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict) or item.get("kind") not in KINDS:
+            continue
+        base = dict(clause_id=clause_id, text=sentence, source="llm", kind=item["kind"],
+                    recurrence=item.get("recurrence") if item.get("recurrence") in ("weekly", "monthly", "quarterly", "yearly") else None)
+        try:
+            if item.get("date"):
+                mentions.append(dict(base, date=date.fromisoformat(str(item["date"]))))
+                continue
+        except ValueError:
+            continue
+        days = item.get("duration_days")
+        if isinstance(days, int) and days > 0:
+            anchor = item.get("anchor") if item.get("anchor") in ("effective", "expiry", "event") else None
+            mentions.append(dict(base, n=days, unit="day", anchor=anchor,
+                                 sign=-1 if item.get("before_anchor") else 1, window=False))
+        elif base["recurrence"]:
+            mentions.append(base)
+    return mentions
+
+
+async def read_unclear(unclear: List[Tuple[str, str]], llm: LLMGateway) -> List[dict]:
+    """
+    Ask the LLM about the sentences the parser could not pin down, in
+    batches; answers are cached per sentence.
+    """
+    def key(sentence: str) -> str:
+        return cache_key(timeline_model, TIMELINE_VERSION, sentence, timeline_temperature)
+
+    # one thread for all lookups: a disk hit is a SQLite read
+    cached_answers = await asyncio.to_thread(lambda: [llm_cache.get(key(sentence)) for _, sentence in unclear])
+    mentions, pending = [], []
+    for (clause_id, sentence), cached in zip(unclear, cached_answers):
+        if cached is not None:
+            mentions += _llm_mentions(json.loads(cached), clause_id, sentence)
+        else:
+            pending.append((clause_id, sentence))
+
+    async def run_batch(batch):
+        response = await llm.complete(generate_prompt([s for _, s in batch]), model=timeline_model,
+                                      temperature=timeline_temperature, max_tokens=150 * len(batch))
+        answers = {item.get("id"): item.get("events") for item in parse_json_array(response) or []
+                   if isinstance(item, dict)}
+        found, answered = [], {}
+        for n, (clause_id, sentence) in enumerate(batch, start=1):
+            if n not in answers:
+                continue
+            answered[key(sentence)] = json.dumps(answers[n] or [])
+            found += _llm_mentions(answers[n], clause_id, sentence)
+        await asyncio.to_thread(llm_cache.set_many, answered)
+        return found
+
+    batches = [pending[i:i + TIMELINE_BATCH_SIZE] for i in range(0, len(pending), TIMELINE_BATCH_SIZE)]
+    for found in await asyncio.gather(*(run_batch(batch) for batch in batches)):
+        mentions += found
+    return mentions
+
+
+async def build_timeline(uid: str, llm: Optional[LLMGateway], store: DocumentStore = doc_store) -> dict:
+    """
+    Extract, resolve and store the timeline of a document.
+
+    Args:
+        uid (str): Document identifier.
+        llm (LLMGateway, optional): Used for ambiguous sentences; None (or
+            TIMELINE_LLM_FALLBACK=0) keeps the parser's reading.
+        store (DocumentStore): Where clauses are read and events written.
+
+    Returns:
+        dict: The stored timeline (see TimelineStore.get).
+    """
+    clauses = await asyncio.to_thread(store.get_clauses, uid)
+    mentions, unclear = extract_mentions(clauses)
+    if unclear and llm is not None and TIMELINE_LLM_FALLBACK:
+        try:
+            llm_mentions = await read_unclear(unclear, llm)
+            # the LLM's reading replaces the parser's for the sentences it answered
+            answered = {(m["clause_id"], m["text"]) for m in llm_mentions}
+            mentions = [m for m in mentions if (m["clause_id"], m["text"]) not in answered] + llm_mentions
+        except Exception as e:
+            logger.warning("Timeline LLM fallback for %s failed, keeping parser results: %s", uid, str(e))
+    anchors, events = resolve(mentions)
+    await asyncio.to_thread(store.timelines.put, uid, TIMELINE_VERSION, anchors, events)
+    logger.info("%s: %d timeline events (%d sentences sent to the LLM)", uid, len(events), len(unclear))
+    return await asyncio.to_thread(store.timelines.get, uid)
@@ -0,0 +1,180 @@
+"""
+Timeline store – per-document timelines and their R*Tree date index
+Deadlines, renewals and payment dates (app.services.timeline) have each dated
+occurrence in an interval index (timeline_index) for range queries across
+documents.
+"""
+import sqlite3
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from app.services.store import DocumentStore
+
+# Most dated occurrences indexed per timeline event
+TIMELINE_ID_STRIDE = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS timelines (
+    uid TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    effective_date TEXT,
+    expiry_date TEXT,
+    created_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS timeline_events (
+    id INTEGER PRIMARY KEY,
+    uid TEXT NOT NULL,
+    clause_id TEXT,
+    kind TEXT NOT NULL,
+    start_date TEXT,
+    end_date TEXT,
+    duration_days INTEGER,
+    anchor TEXT,
+    recurrence TEXT,
+    occurrences INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    source TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS timeline_events_uid ON timeline_events (uid);
+
+-- id = timeline_events.id * TIMELINE_ID_STRIDE + occurrence number; days are date.toordinal()
+CREATE VIRTUAL TABLE IF NOT EXISTS timeline_index USING rtree_i32 (id, start_day, end_day);
+"""
+
+_TIMELINE_COLUMNS = ("clause_id", "kind", "start_date", "end_date", "duration_days", "anchor", "recurrence",
+                     "occurrences", "text", "source")
+
+
+class TimelineStore:
+    """
+    Timelines of the documents of a document store.
+    """
+
+    def __init__(self, store: "DocumentStore"):
+        self.store = store
+
+    def put(self, uid: str, version: str, anchors: Dict[str, Any], events: List[Dict[str, Any]]):
+        """
+        Replace the timeline of a document in one transaction.
+
+        Args:
+            uid (str): Document identifier.
+            version (str): Parser/prompt version the timeline was built with.
+            anchors (dict): "effective" and "expiry" dates (date or None).
+            events (list): Event dicts (see app.services.timeline.resolve);
+                each dated occurrence goes into the interval index.
+        """
+        with self.store.transaction() as conn:
+            self.delete(conn, uid)
+            conn.execute(
+                "INSERT INTO timelines (uid, version, effective_date, expiry_date, created_at) VALUES (?, ?, ?, ?, ?)",
+                (uid, version, *(anchors[k].isoformat() if anchors.get(k) else None for k in ("effective", "expiry")),
+                 time.time()),
+            )
+            for event in events:
+                occurrences = event["occurrences"][:TIMELINE_ID_STRIDE]
+                row = dict(event, occurrences=len(occurrences))
+                cur = conn.execute(
+                    f"INSERT INTO timeline_events (uid, {', '.join(_TIMELINE_COLUMNS)})"
+                    f" VALUES (?, {', '.join('?' * len(_TIMELINE_COLUMNS))})",
+                    (uid, *(row.get(column) for column in _TIMELINE_COLUMNS)),
+                )
+                base = cur.lastrowid * TIMELINE_ID_STRIDE
+                conn.executemany(
+                    "INSERT INTO timeline_index (id, start_day, end_day) VALUES (?, ?, ?)",
+                    [(base + n, start.toordinal(), end.toordinal()) for n, (start, end) in enumerate(occurrences)],
+                )
+
+    def delete(self, conn: sqlite3.Connection, uid: str):
+        # index rows are deleted by id: R*Tree only looks up ids by equality
+        rows = conn.execute("SELECT id, occurrences FROM timeline_events WHERE uid = ?", (uid,)).fetchall()
+        conn.executemany(
+            "DELETE FROM timeline_index WHERE id = ?",
+            [(row["id"] * TIMELINE_ID_STRIDE + n,) for row in rows for n in range(row["occurrences"])],
+        )
+        conn.execute("DELETE FROM timeline_events WHERE uid = ?", (uid,))
+        conn.execute("DELETE FROM timelines WHERE uid = ?", (uid,))
+
+    def get(self, uid: str) -> Optional[Dict[str, Any]]:
+        """
+        Stored timeline of a document: version, effective_date, expiry_date
+        and its events (dated ones first, in date order), or None.
+        """
+        conn = self.store.connection()
+        row = conn.execute(
+            "SELECT uid, version, effective_date, expiry_date, created_at FROM timelines WHERE uid = ?", (uid,)
+        ).fetchone()
+        if row is None:
+            return None
+        timeline = dict(row)
+        timeline["events"] = [dict(event) for event in conn.execute(
+            f"SELECT {', '.join(_TIMELINE_COLUMNS)} FROM timeline_events WHERE uid = ?"
+            " ORDER BY start_date IS NULL, start_date, id",
+            (uid,),
+        )]
+        return timeline
+
+    def missing(self, version: str) -> List[str]:
+        """
+        Uids of documents with clauses but no timeline of `version`.
+        """
+        rows = self.store.connection().execute(
+            "SELECT d.uid FROM documents d WHERE EXISTS (SELECT 1 FROM clauses c WHERE c.uid = d.uid)"
+            " AND NOT EXISTS (SELECT 1 FROM timelines t WHERE t.uid = d.uid AND t.version = ?)"
+            " ORDER BY d.created_at",
+            (version,),
+        ).fetchall()
+        return [row["uid"] for row in rows]
+
+    def range(
+        self,
+        start_day: int,
+        end_day: int,
+        kinds: Optional[List[str]] = None,
+        doc_type: Optional[str] = None,
+        uid: Optional[str] = None,
+        latest_only: bool = True,
+        limit: int = 50,
+        offset: int = 0,
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Timeline occurrences overlapping a date range, across all documents.
+
+        Args:
+            start_day, end_day (int): Inclusive range as date ordinals.
+            kinds (list, optional): Event kinds to keep.
+            doc_type, uid (str, optional): Filters.
+            latest_only (bool): Skip documents that have a newer version.
+            limit, offset (int): Page.
+
+        Returns:
+            tuple: (number of occurrences, page of dicts in date order with
+                   start_day/end_day ordinals and the event and document fields).
+        """
+        where, args = ["i.start_day <= ?", "i.end_day >= ?"], [end_day, start_day]
+        if kinds:
+            where.append(f"e.kind IN ({', '.join('?' * len(kinds))})")
+            args.extend(kinds)
+        for clause, value in (("d.doc_type = ?", doc_type), ("e.uid = ?", uid)):
+            if value is not None:
+                where.append(clause)
+                args.append(value)
+        if latest_only:
+            where.append("NOT EXISTS (SELECT 1 FROM documents n WHERE n.doc_name = d.doc_name AND n.version > d.version)")
+        # CROSS JOIN pins the join order: the interval index finds the
+        # occurrences, events and documents are looked up by key
+        joins = (
+            f" FROM timeline_index i CROSS JOIN timeline_events e ON e.id = i.id / {TIMELINE_ID_STRIDE}"
+            " CROSS JOIN documents d ON d.uid = e.uid WHERE " + " AND ".join(where)
+        )
+        conn = self.store.connection()
+        (total,) = conn.execute("SELECT COUNT(*)" + joins, args).fetchone()
+        rows = conn.execute(
+            "SELECT e.uid, d.doc_name, d.doc_type, e.clause_id, e.kind, i.start_day, i.end_day,"
+            " e.duration_days, e.recurrence, e.text, e.source"
+            + joins + " ORDER BY i.start_day, i.id LIMIT ? OFFSET ?",
+            (*args, limit, offset),
+        ).fetchall()
+        return total, [dict(row) for row in rows]
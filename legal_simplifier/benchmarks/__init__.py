@@ -0,0 +1,4 @@
+"""
+Offline benchmarks for the upload → result → insert-ghost flow
+See benchmarks/run.py for usage.
+"""
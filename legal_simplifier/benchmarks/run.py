@@ -0,0 +1,367 @@
+"""
+Reproducible offline benchmark for the upload → result → insert-ghost flow
+Drives the real app (main.create_app) in-process through an ASGI client,
+with the LLM gateway pointed at FakeBackend: canned answers after a
+configurable latency, and an optional provider-side rate limit that answers
+429 + retry-after like the real API. Every concurrency level runs in a fresh
+subprocess and working directory, so the store, the LLM cache and peak RSS
+of one level do not leak into the next.
+
+Workload: the sample PDFs of the repository (rent_doc.pdf, legalissue1.pdf,
+changes.pdf) plus synthetic contracts of --synthetic-pages pages.
+
+Per level it reports p50/p95/p99 latency of each step and end to end,
+documents per minute, peak RSS (app process and extraction workers) and
+event-loop lag, plus LLM counters scraped from /metrics. Results are
+written as JSON; pass --baseline to print the change against an earlier run.
+
+Usage (from legal_simplifier/):
+    python -m benchmarks.run
+    python -m benchmarks.run --concurrency 1,4,16 --docs 48 --synthetic-pages 300 \\
+        --llm-latency 0.2 --llm-rpm 600 --out benchmarks/results/today.json --baseline benchmarks/results/last.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from benchmarks.synthetic import make_contract
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_PDFS = ["rent_doc.pdf", "legalissue1.pdf", "changes.pdf"]
+STEPS = ("upload", "processing", "result", "ghost", "total")
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """
+    Nearest-rank percentile (q in 0..100); None for an empty list.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), math.ceil(q / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 4) if values else None,
+        **{f"p{q}": (round(percentile(values, q), 4) if values else None) for q in (50, 95, 99)},
+        "max": round(max(values), 4) if values else None,
+    }
+
+
+def build_corpus(folder: str, synthetic: int, pages: int, seed: int) -> List[str]:
+    """
+    Copy the sample PDFs into `folder` and add `synthetic` generated contracts.
+    """
+    import shutil
+
+    os.makedirs(folder, exist_ok=True)
+    corpus = []
+    for name in SAMPLE_PDFS:
+        source = os.path.join(os.path.dirname(ROOT), name)
+        if os.path.exists(source):
+            shutil.copy(source, os.path.join(folder, name))
+            corpus.append(os.path.join(folder, name))
+    for n in range(synthetic):
+        path = os.path.join(folder, f"synthetic_{pages}p_{n}.pdf")
+        make_contract(path, pages, seed=seed + n)
+        corpus.append(path)
+    return corpus
+
+
+class LoopMonitor:
+    """
+    Measures event-loop lag (how late a periodic wake-up fires) and samples
+    the resident set size while the benchmark runs.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags: List[float] = []
+        self.peak_rss = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def rss() -> int:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            return 0
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        ticks = 0
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - expected))
+            ticks += 1
+            if ticks % 10 == 0:
+                self.peak_rss = max(self.peak_rss, self.rss())
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+
+def make_fake_backend(latency: float, jitter: float, rpm: float, error_rate: float, seed: int):
+    """
+    StubBackend with random extra latency, occasional transient errors and a
+    sliding-window requests-per-minute limit enforced like the provider.
+    """
+    from app.services.llm import LLMRateLimitError, LLMTransientError, StubBackend
+
+    class FakeBackend(StubBackend):
+        name = "fake"
+
+        def __init__(self):
+            super().__init__(latency)
+            self.rng = random.Random(seed)
+            self.window: deque = deque()
+            self.rejected = 0
+
+        async def complete(self, messages, model, temperature, max_tokens, timeout):
+            now = time.monotonic()
+            while self.window and now - self.window[0] >= 60:
+                self.window.popleft()
+            if rpm and len(self.window) >= rpm:
+                self.rejected += 1
+                raise LLMRateLimitError("429 Too Many Requests", {"retry-after": f"{60 - (now - self.window[0]):.2f}s"})
+            self.window.append(now)
+            if error_rate and self.rng.random() < error_rate:
+                await asyncio.sleep(self.latency)
+                raise LLMTransientError("503 Service Unavailable")
+            self.latency = latency + self.rng.uniform(0, jitter)
+            return await super().complete(messages, model, temperature, max_tokens, timeout)
+
+    return FakeBackend()
+
+
+def _scrape(text: str) -> Dict[str, float]:
+    # plain samples of the Prometheus text output, histograms reduced to _sum/_count
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith("#") or "_bucket{" in line or not line.strip():
+            continue
+        name, _, value = line.rpartition(" ")
+        samples[name] = float(value)
+    return samples
+
+
+async def run_level(args, corpus: List[str], concurrency: int) -> dict:
+    """
+    Push args.docs documents through the app with `concurrency` clients.
+    Runs inside the level subprocess (cwd is a fresh directory).
+    """
+    import httpx
+
+    import main
+    from app.services.llm import LLMGateway, set_llm
+
+    backend = make_fake_backend(args.llm_latency, args.llm_jitter, args.llm_rpm, args.llm_error_rate, args.seed)
+    set_llm(LLMGateway(backend, concurrency=args.llm_concurrency, rpm=args.gateway_rpm, tpm=args.gateway_tpm))
+    app = main.create_app()
+
+    timings: Dict[str, List[float]] = {step: [] for step in STEPS}
+    failures: List[str] = []
+    work = iter(range(args.docs))
+    monitor = LoopMonitor()
+
+    async def one(client: httpx.AsyncClient, n: int):
+        path = corpus[n % len(corpus)]
+        started = time.perf_counter()
+        with open(path, "rb") as f:
+            response = await client.post(
+                "/api/v1/upload",
+                files={"file": (os.path.basename(path), f.read(), "application/pdf")},
+                data={"doc_name": f"bench-{n}-{os.path.basename(path)}", "doc_type": "benchmark"},
+            )
+        uploaded = time.perf_counter()
+        if response.status_code != 200:
+            failures.append(f"upload {response.status_code}")
+            return
+        uid = response.json()["uid"]
+        while True:
+            status = (await client.get(f"/api/v1/upload/{uid}/status")).json()
+            if status["status"] in ("completed", "failed"):
+                break
+            await asyncio.sleep(args.poll_interval)
+        processed = time.perf_counter()
+        if status["status"] == "failed":
+            failures.append(f"job {status.get('stage')}: {status.get('error')}")
+            return
+        result = await client.get(f"/api/v1/result/{uid}")
+        fetched = time.perf_counter()
+        ghost = await client.post("/api/v1/insert-ghost", json={"uid": uid})
+        finished = time.perf_counter()
+        if result.status_code != 200 or ghost.status_code != 200:
+            failures.append(f"result {result.status_code} / insert-ghost {ghost.status_code}")
+            return
+        for step, value in zip(STEPS, (uploaded - started, processed - uploaded, fetched - processed,
+                                       finished - fetched, finished - started)):
+            timings[step].append(value)
+
+    async def client_loop(client: httpx.AsyncClient):
+        for n in work:
+            try:
+                await one(client, n)
+            except Exception as e:
+                failures.append(f"{type(e).__name__}: {e}")
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            monitor.start()
+            started = time.perf_counter()
+            await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+            await monitor.stop()
+            metrics = _scrape((await client.get("/metrics")).text)
+
+    completed = len(timings["total"])
+    return {
+        "concurrency": concurrency,
+        "documents": args.docs,
+        "completed": completed,
+        "failed": len(failures),
+        "failures": sorted(set(failures))[:10],
+        "elapsed_s": round(elapsed, 3),
+        "docs_per_min": round(completed / elapsed * 60, 2) if elapsed else None,
+        "latency_s": {step: summarize(values) for step, values in timings.items()},
+        "loop_lag_s": summarize(monitor.lags),
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(max(monitor.peak_rss, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024) / 2**20, 1),
+        "peak_rss_extract_workers_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+        "llm": {
+            "backend_calls": backend.calls,
+            "provider_429s": backend.rejected,
+            "requests": {k.split("=", 1)[1].strip('"}'): v for k, v in metrics.items() if k.startswith("llm_requests_total{")},
+            "retries": sum(v for k, v in metrics.items() if k.startswith("llm_retries_total")),
+            "tokens_in": metrics.get('llm_tokens_total{direction="in"}', 0),
+            "tokens_out": metrics.get('llm_tokens_total{direction="out"}', 0),
+            "cache_hit_ratio": metrics.get("llm_cache_hit_ratio"),
+            "decided_by": {k.split("=", 1)[1].strip('"}'): v for k, v in metrics.items() if k.startswith("clauses_decided_total{")},
+        },
+    }
+
+
+def run_level_subprocess(args, corpus_dir: str, concurrency: int) -> dict:
+    with tempfile.TemporaryDirectory(prefix=f"bench-c{concurrency}-") as workdir:
+        out = os.path.join(workdir, "level.json")
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+        command = [sys.executable, "-m", "benchmarks.run", "--level", str(concurrency),
+                   "--corpus", corpus_dir, "--level-out", out] + args.passthrough
+        subprocess.run(command, cwd=workdir, env=env, check=True)
+        with open(out) as f:
+            return json.load(f)
+
+
+def _change(new_value, old_value) -> str:
+    if new_value is None or old_value is None:
+        return "n/a"
+    change = (new_value - old_value) / old_value * 100 if old_value else 0.0
+    return f"{old_value:g} → {new_value:g} ({change:+.0f}%)"
+
+
+def compare(current: dict, baseline: dict):
+    before = {level["concurrency"]: level for level in baseline.get("levels", [])}
+    print(f"{'concurrency':>11} {'docs/min':>24} {'p95 total (s)':>24} {'peak RSS (MB)':>24}")
+    for level in current["levels"]:
+        old = before.get(level["concurrency"])
+        if old is None:
+            continue
+        print(f"{level['concurrency']:>11} {_change(level['docs_per_min'], old['docs_per_min']):>24} "
+              f"{_change(level['latency_s']['total']['p95'], old['latency_s']['total']['p95']):>24} "
+              f"{_change(level['peak_rss_mb'], old['peak_rss_mb']):>24}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline upload → result → insert-ghost benchmark")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated numbers of concurrent clients")
+    parser.add_argument("--docs", type=int, default=24, help="Documents processed per concurrency level")
+    parser.add_argument("--synthetic", type=int, default=2, help="Synthetic contracts added to the sample PDFs")
+    parser.add_argument("--synthetic-pages", type=int, default=100, help="Pages per synthetic contract")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Fake LLM base latency (s)")
+    parser.add_argument("--llm-jitter", type=float, default=0.05, help="Extra uniform random latency (s)")
+    parser.add_argument("--llm-rpm", type=float, default=0, help="Provider-side requests per minute (0 = unlimited)")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Share of calls failing with a transient error")
+    parser.add_argument("--llm-concurrency", type=int, default=8, help="Gateway concurrency limit")
+    parser.add_argument("--gateway-rpm", type=float, default=100_000, help="Gateway starting requests-per-minute budget")
+    parser.add_argument("--gateway-tpm", type=float, default=100_000_000, help="Gateway starting tokens-per-minute budget")
+    parser.add_argument("--poll-interval", type=float, default=0.02, help="Status polling interval (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="JSON results file (default benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", default=None, help="Earlier results file to compare against")
+    # internal: run a single level in this process
+    parser.add_argument("--level", type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--corpus", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--level-out", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    # settings forwarded unchanged to every level subprocess
+    args.passthrough = [
+        f"--docs={args.docs}", f"--llm-latency={args.llm_latency}", f"--llm-jitter={args.llm_jitter}",
+        f"--llm-rpm={args.llm_rpm}", f"--llm-error-rate={args.llm_error_rate}",
+        f"--llm-concurrency={args.llm_concurrency}", f"--gateway-rpm={args.gateway_rpm}",
+        f"--gateway-tpm={args.gateway_tpm}", f"--poll-interval={args.poll_interval}", f"--seed={args.seed}",
+    ]
+    return args
+
+
+def cli(argv=None):
+    args = parse_args(argv)
+
+    if args.level is not None:
+        corpus = sorted(os.path.join(args.corpus, name) for name in os.listdir(args.corpus))
+        result = asyncio.run(run_level(args, corpus, args.level))
+        with open(args.level_out, "w") as f:
+            json.dump(result, f)
+        return
+
+    levels = [int(n) for n in args.concurrency.split(",") if n.strip()]
+    with tempfile.TemporaryDirectory(prefix="bench-corpus-") as corpus_dir:
+        corpus = build_corpus(corpus_dir, args.synthetic, args.synthetic_pages, args.seed)
+        report = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+            "settings": {k: v for k, v in vars(args).items() if k not in ("level", "corpus", "level_out", "passthrough")},
+            "corpus": [{"file": os.path.basename(p), "bytes": os.path.getsize(p)} for p in corpus],
+            "levels": [],
+        }
+        for concurrency in levels:
+            level = run_level_subprocess(args, corpus_dir, concurrency)
+            report["levels"].append(level)
+            total = level["latency_s"]["total"]
+            print(f"concurrency {concurrency:>3}: {level['docs_per_min']} docs/min, total p50/p95/p99 "
+                  f"{total['p50']}/{total['p95']}/{total['p99']} s, loop lag p99 {level['loop_lag_s']['p99']} s, "
+                  f"peak RSS {level['peak_rss_mb']} MB, failed {level['failed']}")
+
+    out = args.out or os.path.join(ROOT, "benchmarks", "results", time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    cli()
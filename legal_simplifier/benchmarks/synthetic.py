@@ -0,0 +1,107 @@
+"""
+Synthetic contracts for the benchmark
+Builds numbered, plain-text contracts of a requested page count and writes
+them as text-layer PDFs (Helvetica, one content stream per page) without any
+PDF library, so the extraction stage reads them like a real upload. Output
+is deterministic for a given seed.
+"""
+import random
+import textwrap
+from typing import List
+
+LINES_PER_PAGE = 48
+LINE_WIDTH = 95
+
+HEADINGS = [
+    "DEFINITIONS", "TERM", "RENT AND PAYMENT", "SECURITY DEPOSIT", "USE OF PREMISES", "MAINTENANCE",
+    "CONFIDENTIALITY", "INTELLECTUAL PROPERTY", "DATA PROTECTION", "INDEMNIFICATION", "LIMITATION OF LIABILITY",
+    "TERMINATION", "FORCE MAJEURE", "GOVERNING LAW", "DISPUTE RESOLUTION", "NOTICES", "ASSIGNMENT",
+    "AMENDMENT", "SEVERABILITY", "ENTIRE AGREEMENT",
+]
+SENTENCES = [
+    "The {party} shall pay the sum of Rs. {amount} on or before the {day} day of each calendar month.",
+    "Either party may terminate this Agreement by giving {days} days written notice to the other party.",
+    "The {party} shall keep confidential all information received under this Agreement for {years} years.",
+    "Any dispute arising out of this Agreement shall be referred to arbitration in {city}.",
+    "This Agreement shall be governed by the laws of India and the courts at {city} shall have jurisdiction.",
+    "The {party} shall indemnify and hold harmless the other party against all third party claims.",
+    "The {party} shall maintain the premises in good and tenantable condition at its own cost.",
+    "Late payment shall attract interest at {rate} percent per annum until the date of payment.",
+    "The security deposit of Rs. {amount} shall be refunded within {days} days of vacating the premises.",
+    "Neither party shall assign its rights under this Agreement without the prior written consent of the other.",
+    "The {party} may modify these terms without prior notice and continued use shall mean acceptance.",
+    "The liability of the {party} shall not exceed the fees paid in the {months} months preceding the claim.",
+    "The {party} irrevocably assigns all intellectual property in the deliverables without any compensation.",
+    "All notices shall be in writing and delivered by registered post to the addresses stated above.",
+    "The {party} shall comply with all applicable laws, rules and regulations in performing its obligations.",
+]
+PARTIES = ["Tenant", "Landlord", "Service Provider", "Client", "Licensee", "Licensor", "Employee", "Company"]
+CITIES = ["Mumbai", "Delhi", "Bengaluru", "Chennai", "Pune", "Hyderabad", "Kolkata"]
+
+
+def contract_lines(pages: int, seed: int = 0) -> List[str]:
+    """
+    Wrapped lines of a numbered contract filling roughly `pages` pages.
+    """
+    rng = random.Random(seed)
+    lines = [f"AGREEMENT NO. {rng.randint(10000, 99999)}", "",
+             "This Agreement is made between the parties named in the schedule.", ""]
+    target = pages * LINES_PER_PAGE
+    number = 0
+    while len(lines) < target:
+        number += 1
+        heading = HEADINGS[(number - 1) % len(HEADINGS)]
+        lines += [f"{number}. {heading}", ""]
+        for sub in range(1, rng.randint(2, 5)):
+            text = " ".join(
+                rng.choice(SENTENCES).format(
+                    party=rng.choice(PARTIES), amount=rng.randint(5, 500) * 1000, day=rng.randint(1, 28),
+                    days=rng.choice((15, 30, 60, 90)), years=rng.randint(1, 5), city=rng.choice(CITIES),
+                    rate=rng.choice((12, 18, 24)), months=rng.choice((3, 6, 12)),
+                )
+                for _ in range(rng.randint(1, 4))
+            )
+            lines += textwrap.wrap(f"{number}.{sub} {text}", LINE_WIDTH) + [""]
+    return lines[:target]
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, lines: List[str]):
+    """
+    Write `lines` as a text-layer PDF, LINES_PER_PAGE lines per page.
+    """
+    pages = [lines[n:n + LINES_PER_PAGE] for n in range(0, len(lines), LINES_PER_PAGE)] or [[]]
+    # objects: 1 catalog, 2 page tree, 3 font, then (page, content) pairs
+    objects = {1: b"<< /Type /Catalog /Pages 2 0 R >>", 3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    kids = []
+    for n, page in enumerate(pages):
+        page_id, content_id = 4 + 2 * n, 5 + 2 * n
+        kids.append(f"{page_id} 0 R")
+        body = "BT /F1 10 Tf 12 TL 50 800 Td " + " ".join(f"({_escape(line)}) '" for line in page) + " ET"
+        stream = body.encode("latin-1", "replace")
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode()
+        objects[content_id] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id in sorted(objects):
+        offsets[obj_id] = len(out)
+        out += b"%d 0 obj\n%s\nendobj\n" % (obj_id, objects[obj_id])
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for obj_id in sorted(objects):
+        out += b"%010d 00000 n \n" % offsets[obj_id]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def make_contract(path: str, pages: int, seed: int = 0):
+    write_pdf(path, contract_lines(pages, seed))
@@ -0,0 +1,173 @@
+"""
+Production entry point
+    python server.py [--host 0.0.0.0] [--port 8000] [--workers N]
+    python server.py --startup-report
+With one worker the app is served by uvicorn in this process. With N > 1
+workers the app is imported once, the listening socket is bound, and N
+worker processes are forked from that warm parent (pre-fork): the kernel
+spreads connections over them, and they share documents, job states and the
+LLM cache through the SQLite stores rather than process memory. The parent
+restarts workers that die and fails only the jobs the dead worker owned.
+Metrics on /metrics are per worker process.
+--reload is for development only and implies a single worker.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+import time
+
+from app import config
+
+logger = logging.getLogger("server")
+
+# Listen address, overridable by --host / --port
+HOST = os.getenv("HOST", "127.0.0.1")
+PORT = int(os.getenv("PORT", 8000))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "info")
+# Seconds to wait before restarting a worker that died right after starting
+RESPAWN_DELAY = float(os.getenv("RESPAWN_DELAY", 1.0))
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the LegalSimplifier API")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=config.WEB_WORKERS,
+                        help="worker processes (default: WEB_WORKERS or 1)")
+    parser.add_argument("--reload", action="store_true", help="restart on code changes (development)")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="start the app once, print the startup timing as JSON and exit "
+                             "(exit code 1 if over STARTUP_BUDGET_SECONDS)")
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.reload and args.workers > 1:
+        parser.error("--reload runs a single worker")
+    return args
+
+
+def startup_report() -> dict:
+    """
+    Import and start the app (without recovering jobs, so a running server
+    is not disturbed), stop it again and return the startup report.
+    """
+    from app.services.startup import startup
+
+    import main
+
+    app = main.create_app(recover_jobs=False)
+
+    async def start_and_stop():
+        async with app.router.lifespan_context(app):
+            pass
+
+    asyncio.run(start_and_stop())
+    return startup.report()
+
+
+def _spawn(uvicorn_config, sock) -> int:
+    """
+    Fork one worker process serving on the shared socket; returns its pid.
+    """
+    pid = os.fork()
+    if pid:
+        return pid
+
+    # child: uvicorn installs its own handlers for a graceful shutdown
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    from app.services.startup import startup
+
+    startup.reset()
+    code = 0
+    try:
+        import uvicorn
+
+        uvicorn.Server(uvicorn_config).run(sockets=[sock])
+    except BaseException:
+        logger.exception("Worker %d crashed", os.getpid())
+        code = 1
+    finally:
+        os._exit(code)
+
+
+def serve_workers(host: str, port: int, workers: int):
+    """
+    Pre-fork server: bind once, fork `workers` processes and supervise them.
+    """
+    import uvicorn
+
+    from app.services.startup import process_age, startup
+    from app.services.store import doc_store
+
+    import main
+
+    # jobs cut off by the last shutdown are failed once here, not per worker
+    with startup.phase("recover interrupted jobs"):
+        doc_store.fail_interrupted_jobs()
+    uvicorn_config = uvicorn.Config(main.create_app(recover_jobs=False), host=host, port=port,
+                                    log_level=LOG_LEVEL)
+    sock = uvicorn_config.bind_socket()
+    logger.info("Parent ready after %.3fs; starting %d workers on http://%s:%d",
+                process_age() or 0.0, workers, host, port)
+
+    children = {_spawn(uvicorn_config, sock): time.monotonic() for _ in range(workers)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        failed = doc_store.fail_interrupted_jobs(worker_pid=pid)
+        logger.warning("Worker %d exited with status %d (%d jobs failed); restarting",
+                       pid, os.waitstatus_to_exitcode(status), failed)
+        if time.monotonic() - started < RESPAWN_DELAY:
+            time.sleep(RESPAWN_DELAY)
+        if not stopping:
+            children[_spawn(uvicorn_config, sock)] = time.monotonic()
+    sock.close()
+    logger.info("All workers stopped")
+
+
+def cli(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=LOG_LEVEL.upper())
+    # read by app.services.llm to split the account's rate limits between workers
+    os.environ["WEB_WORKERS"] = str(args.workers)
+    config.WEB_WORKERS = args.workers
+
+    if args.startup_report:
+        report = startup_report()
+        print(json.dumps(report, indent=2))
+        sys.exit(0 if report["within_budget"] else 1)
+    if args.workers > 1:
+        serve_workers(args.host, args.port, args.workers)
+        return
+
+    import uvicorn
+
+    uvicorn.run("main:app", host=args.host, port=args.port, reload=args.reload, log_level=LOG_LEVEL)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,14 @@
+"""
+Shared test setup: import the app from this directory, keep the stores in a
+temporary directory and use the stub LLM backend.
+"""
+import os
+import sys
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix="legal_simplifier_tests_")
+os.environ.setdefault("DOC_STORE_PATH", os.path.join(_TMP, "documents.sqlite3"))
+os.environ.setdefault("LLM_CACHE_PATH", os.path.join(_TMP, "llm_cache.sqlite3"))
+os.environ.setdefault("LLM_BACKEND", "stub")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,85 @@
+"""
+Batched clause classification: packing, parsing and the retry of invalid
+entries (app/services/batching.py, app/api/v1/result.py).
+"""
+import asyncio
+import json
+import re
+import uuid
+
+from app.api.v1.result import classify_batch, parse_batch_response
+from app.services.batching import make_batches, parse_json_array
+
+ANALYSIS = {"rating": "yellow", "severity": 5, "detailed_rationale": "Needs review.",
+            "risky_phrases": [], "risk_types": ["Other"], "confidence": "medium"}
+
+
+class ScriptedLLM:
+    """
+    Answers batch prompts with `batch_answer(numbers, call)` and single-clause
+    prompts with a valid analysis; records every prompt.
+    """
+
+    def __init__(self, batch_answer):
+        self.batch_answer = batch_answer
+        self.prompts = []
+
+    async def complete(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        if "BATCH MODE" not in prompt:
+            return json.dumps(ANALYSIS)
+        numbers = [int(n) for n in re.findall(r"^\[(\d+)\]$", prompt, re.MULTILINE)]
+        return self.batch_answer(numbers, len(self.prompts))
+
+
+def _batch(size):
+    return [(uuid.uuid4().hex, f"Clause {n} {uuid.uuid4().hex}") for n in range(size)]
+
+
+def test_make_batches_respects_budget_and_item_limit():
+    batches = make_batches([3, 3, 3, 9, 1, 1, 1], cost=lambda n: n, token_budget=6, max_items=2)
+    assert batches == [[3, 3], [3], [9], [1, 1], [1]]
+
+
+def test_parse_json_array_tolerates_fences_and_prose():
+    assert parse_json_array('Here you go:\n```json\n[{"id": 1}]\n```') == [{"id": 1}]
+    assert parse_json_array('{"id": 1}') is None
+    assert parse_json_array("[not json]") is None
+
+
+def test_parse_batch_response_keeps_valid_entries_only():
+    answer = json.dumps([
+        dict(ANALYSIS, id=1),
+        dict(ANALYSIS, id=2, rating="purple"),
+        dict(ANALYSIS, id=1, rating="red"),   # duplicate id
+        dict(ANALYSIS, id=4),                 # out of range
+        dict(ANALYSIS, id=3, severity=11),
+    ])
+    assert parse_batch_response(answer, 3) == {1: ANALYSIS}
+
+
+def test_only_invalid_entries_are_retried():
+    batch = _batch(3)
+    llm = ScriptedLLM(lambda numbers, call: json.dumps(
+        [dict(ANALYSIS, id=1), dict(ANALYSIS, id=2, rating="purple"), dict(ANALYSIS, id=3)]
+    ))
+    results = asyncio.run(classify_batch(batch, llm))
+
+    assert set(results) == {key for key, _ in batch}
+    assert all(json.loads(value)["rating"] == "yellow" for value in results.values())
+    # one batch request, then clause 2 alone with the single-clause prompt
+    assert len(llm.prompts) == 2
+    assert "BATCH MODE" not in llm.prompts[1] and batch[1][1] in llm.prompts[1]
+
+
+def test_unparseable_batch_is_split_in_half():
+    batch = _batch(4)
+    llm = ScriptedLLM(lambda numbers, call: "Sorry, I cannot help." if call == 1 else json.dumps(
+        [dict(ANALYSIS, id=n) for n in numbers]
+    ))
+    results = asyncio.run(classify_batch(batch, llm))
+
+    assert set(results) == {key for key, _ in batch}
+    assert len(llm.prompts) == 3
+    assert all("BATCH MODE" in prompt for prompt in llm.prompts)
+    assert [len(re.findall(r"^\[\d+\]$", prompt, re.MULTILINE)) for prompt in llm.prompts] == [4, 2, 2]
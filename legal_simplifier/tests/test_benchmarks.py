@@ -0,0 +1,61 @@
+"""
+Helpers of the offline benchmark harness (benchmarks/).
+"""
+import asyncio
+import re
+
+import pytest
+
+from app.services.llm import LLMRateLimitError
+from benchmarks.run import make_fake_backend, percentile, summarize
+from benchmarks.synthetic import LINES_PER_PAGE, contract_lines, make_contract
+
+
+def test_percentile_nearest_rank():
+    values = [5, 1, 4, 2, 3]
+    assert [percentile(values, q) for q in (0, 50, 95, 100)] == [1, 3, 5, 5]
+    assert percentile([], 50) is None
+
+
+def test_summarize():
+    summary = summarize([0.1, 0.2, 0.3, 0.4])
+    assert summary["count"] == 4
+    assert summary["mean"] == pytest.approx(0.25)
+    assert (summary["p50"], summary["p99"], summary["max"]) == (0.2, 0.4, 0.4)
+    assert summarize([])["p95"] is None
+
+
+def test_synthetic_contracts_are_deterministic():
+    assert contract_lines(3, seed=4) == contract_lines(3, seed=4)
+    assert contract_lines(3, seed=4) != contract_lines(3, seed=5)
+    lines = contract_lines(3, seed=4)
+    assert len(lines) == 3 * LINES_PER_PAGE
+    assert "1. DEFINITIONS" in lines
+
+
+def test_synthetic_pdf_structure(tmp_path):
+    path = tmp_path / "contract.pdf"
+    make_contract(str(path), 2, seed=1)
+    data = path.read_bytes()
+    assert data.startswith(b"%PDF-1.4\n")
+    assert b"/Count 2" in data
+    # startxref points at the cross-reference table
+    offset = int(re.search(rb"startxref\n(\d+)\n", data).group(1))
+    assert data[offset:offset + 4] == b"xref"
+
+
+def test_fake_backend_enforces_requests_per_minute():
+    backend = make_fake_backend(latency=0, jitter=0, rpm=2, error_rate=0, seed=0)
+    messages = [{"role": "user", "content": "hello"}]
+
+    async def call():
+        return await backend.complete(messages, "model", 0.0, 10, 5)
+
+    async def run():
+        await call()
+        await call()
+        with pytest.raises(LLMRateLimitError):
+            await call()
+
+    asyncio.run(run())
+    assert backend.rejected == 1
@@ -0,0 +1,109 @@
+"""
+Retrieval-grounded chat: context selection and the streamed answer
+(app/api/v1/chat.py).
+"""
+import json
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.v1.chat import build_prompt, select_context
+from app.services.llm import estimate_tokens, get_llm
+from app.services.store import doc_store
+from main import app
+
+
+class FakeLLM:
+    def __init__(self, tokens, error=None):
+        self.tokens = tokens
+        self.error = error
+        self.prompts = []
+
+    async def stream(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        for token in self.tokens:
+            yield token
+        if self.error:
+            raise self.error
+
+
+@pytest.fixture
+def uid():
+    uid = str(uuid.uuid4())
+    doc_store.add_document(uid, f"{uid}.pdf", "nda")
+    texts = ["Rent of 1,000 EUR is payable on the first day of each month.",
+             "Either party may terminate this lease on three months' notice.",
+             "The Tenant shall keep the premises in good repair."]
+    doc_store.put_clauses(uid, [{"clause_id": f"{n}.txt", "text": text, "number": str(n)}
+                                for n, text in enumerate(texts, 1)])
+    doc_store.save_result({"uid": uid, "version": "v", "etag": '"e"', "created_at": 1.0, "clauses": [
+        {"id": f"{n}.txt", "rating": "green", "severity": n} for n in range(1, 4)
+    ]})
+    yield uid
+    doc_store.delete_document(uid)
+
+
+@pytest.fixture
+def llm():
+    fake = FakeLLM(["You may ", "terminate on ", "three months' notice [2.txt]."])
+    app.dependency_overrides[get_llm] = lambda: fake
+    yield fake
+    app.dependency_overrides.pop(get_llm, None)
+
+
+def _events(response):
+    events, name = [], None
+    for line in response.text.splitlines():
+        if line.startswith("event:"):
+            name = line.split(":", 1)[1].strip()
+        elif line.startswith("data:"):
+            events.append((name, json.loads(line.split(":", 1)[1])))
+    return events
+
+
+def test_select_context_stays_within_the_budget():
+    clauses = [{"clause_id": f"{n}.txt", "text": "word " * 200} for n in range(5)]
+    selected = select_context(clauses, budget=600)
+    assert sum(estimate_tokens(c["text"]) for c in selected) <= 600
+    # the clause that does not fit whole is cut at a word boundary
+    assert selected[-1]["text"].endswith("word …")
+    assert [c["clause_id"] for c in selected] == ["0.txt", "1.txt", "2.txt"]
+
+
+def test_select_context_skips_tiny_leftovers():
+    clauses = [{"clause_id": "1.txt", "text": "word " * 76}, {"clause_id": "2.txt", "text": "word " * 40}]
+    assert [c["clause_id"] for c in select_context(clauses, budget=130)] == ["1.txt"]
+
+
+def test_build_prompt_cites_clause_ids():
+    prompt = build_prompt("Can I terminate?", [{"clause_id": "2.txt", "heading": "TERMINATION", "rating": "red",
+                                                "text": "Either party may terminate."}])
+    assert "[2.txt] TERMINATION (risk: red)\nEither party may terminate." in prompt
+    assert prompt.endswith("Question: Can I terminate?")
+
+
+def test_answer_is_streamed_from_the_relevant_clauses(uid, llm):
+    response = TestClient(app).post("/api/v1/chat", json={"uid": uid, "question": "How can I terminate the lease?",
+                                                          "top_k": 1})
+    assert response.status_code == 200
+    events = _events(response)
+    assert [name for name, _ in events] == ["sources", "token", "token", "token", "done"]
+    assert [source["clause_id"] for source in events[0][1]] == ["2.txt"]
+    assert "".join(data["text"] for name, data in events if name == "token") == \
+        "You may terminate on three months' notice [2.txt]."
+    assert "terminate this lease" in llm.prompts[0] and "Rent" not in llm.prompts[0]
+
+
+def test_llm_failure_ends_the_stream_with_an_error(uid):
+    app.dependency_overrides[get_llm] = lambda: FakeLLM(["Partial"], error=RuntimeError("upstream closed"))
+    try:
+        events = _events(TestClient(app).post("/api/v1/chat", json={"uid": uid, "question": "Rent?"}))
+    finally:
+        app.dependency_overrides.pop(get_llm, None)
+    assert events[-1] == ("error", {"detail": "upstream closed"})
+
+
+def test_unknown_document(llm):
+    response = TestClient(app).post("/api/v1/chat", json={"uid": "missing", "question": "Rent?"})
+    assert response.status_code == 404
@@ -0,0 +1,106 @@
+"""
+Placeholder masking and verdict inheritance of near-duplicate clustering
+(app/services/clustering.py).
+"""
+import asyncio
+
+import pytest
+
+from app.api.v1.result import iter_classified
+from app.services.clustering import NearDuplicates, normalize
+from app.services.llm import LLMGateway, StubBackend
+from app.services.store import DocumentStore
+
+TEMPLATE = (
+    "{n} The Tenant shall pay to {landlord} a monthly rent of Rs. {amount} on or before the fifth day of each "
+    "month starting {start}, by bank transfer to the account notified in writing by the landlord."
+)
+
+
+def clause(n="4.1", landlord="Ravi Kumar", amount="25,000", start="1 March 2024"):
+    return TEMPLATE.format(n=n, landlord=landlord, amount=amount, start=start)
+
+
+@pytest.fixture
+def index(tmp_path):
+    return NearDuplicates(store=DocumentStore(str(tmp_path / "documents.sqlite3")))
+
+
+def test_normalize_masks_placeholders():
+    tokens = normalize("12.3 Payment of $1,200.50 to Acme Widgets Ltd on 03/04/2024 at 5% via [Bank Name] or a@b.com")
+    assert tokens == ["payment", "of", "<amount>", "to", "<name>", "on", "<date>", "at", "<num>",
+                      "via", "<blank>", "or", "<email>"]
+
+
+def test_normalize_ignores_numbering_and_party_details():
+    assert normalize(clause()) == normalize(clause(n="(b)", landlord="Priya Shah", amount="1,10,000", start="1st June 2025"))
+    assert normalize(clause()) != normalize(clause().replace("monthly", "quarterly"))
+
+
+def test_short_clauses_have_no_signature(index):
+    assert index.signature("The Tenant shall pay rent.") is None
+    assert index.signature(clause()) is not None
+
+
+def test_templated_clauses_inherit_from_the_first(index):
+    texts = [
+        clause(),
+        "Either party may terminate this agreement by giving thirty days written notice to the other party "
+        "at the address stated above, without liability for doing so.",
+        clause(n="9.2", landlord="Priya Shah", amount="40,000", start="1 June 2025"),
+        clause(n="(c)", landlord="Anil Mehta", amount="12,500", start="15 July 2024"),
+    ]
+    members = index.cluster([index.signature(text) for text in texts])
+    assert set(members) == {2, 3}
+    assert all(representative == 0 and score >= index.threshold for representative, score in members.values())
+
+
+def test_negation_never_shares_a_verdict(index):
+    negated = clause().replace("shall pay", "shall not pay")
+    members = index.cluster([index.signature(clause()), index.signature(negated)])
+    assert members == {}
+
+
+def test_corpus_match_from_an_earlier_document(index):
+    earlier = index.signature(clause())
+    index.remember([("cache-key-1", "doc-1", "4.1", earlier)], "v1")
+
+    later = {0: index.signature(clause(n="7", landlord="Priya Shah", amount="31,000", start="1 May 2025"))}
+    matches = index.corpus_matches(later, "v1")
+    assert matches[0]["cache_key"] == "cache-key-1"
+    assert (matches[0]["uid"], matches[0]["clause_id"]) == ("doc-1", "4.1")
+    assert matches[0]["similarity"] >= index.corpus_threshold
+    # verdicts of another result version are not reused
+    assert index.corpus_matches(later, "v2") == {}
+
+
+def test_corpus_ignores_different_clauses(index):
+    index.remember([("cache-key-1", "doc-1", "4.1", index.signature(clause()))], "v1")
+    other = index.signature(
+        "The Landlord shall carry out all structural repairs to the premises at its own cost within a "
+        "reasonable time of being notified of the defect by the Tenant in writing."
+    )
+    assert index.corpus_matches({0: other}, "v1") == {}
+
+
+def test_classification_inherits_within_a_document():
+    backend = StubBackend(latency=0)
+    llm = LLMGateway(backend, rpm=100000, tpm=10 ** 8)
+    clauses = [
+        ("1", clause(landlord="Meera Iyer", amount="18,000")),
+        ("2", clause(n="2", landlord="Kiran Rao", amount="19,500", start="1 April 2024")),
+        ("3", clause(n="3", landlord="Sunil Das", amount="21,000", start="1 May 2024")),
+    ]
+
+    async def run():
+        return [item async for item in iter_classified("doc-inherit", clauses, {}, llm)]
+
+    responses = dict(asyncio.run(run()))
+    assert backend.calls == 1
+    assert responses[0]["decided_by"] == "llm"
+    for n in (1, 2):
+        assert responses[n]["decided_by"] == "cluster"
+        assert responses[n]["inherited_from"]["clause_id"] == "1"
+        assert responses[n]["id"] == clauses[n][0]
+        assert responses[n]["original_clause"] == clauses[n][1]
+        assert responses[n]["rating"] == responses[0]["rating"]
@@ -0,0 +1,114 @@
+"""
+Background job queue (app/services/jobs.py).
+"""
+import asyncio
+import threading
+
+import pytest
+
+from app.services.jobs import JobQueue
+
+
+async def _drain(queue: JobQueue, jobs, timeout: float = 5.0):
+    async def finished():
+        while any(job.status in ("queued", "running") for job in jobs):
+            await asyncio.sleep(0.005)
+
+    try:
+        await asyncio.wait_for(finished(), timeout)
+    finally:
+        await queue.stop()
+
+
+def test_stages_run_in_order_and_sync_stages_run_in_a_thread():
+    seen = []
+
+    async def extract(job):
+        seen.append(("extract", job.context["path"]))
+        job.context["text"] = "hello"
+
+    def segment(job):
+        seen.append(("segment", threading.current_thread() is threading.main_thread()))
+        return job.context["text"].upper()
+
+    async def run():
+        queue = JobQueue(workers=1)
+        job = await queue.submit("doc", [("extract", extract), ("segment", segment)], path="a.pdf")
+        await _drain(queue, [job])
+        return job
+
+    job = asyncio.run(run())
+    assert seen == [("extract", "a.pdf"), ("segment", False)]
+    assert (job.status, job.stage, job.result, job.error) == ("completed", "segment", "HELLO", None)
+
+
+def test_failed_stage_stops_the_job_and_updates_are_recorded():
+    updates = []
+
+    def broken(job):
+        raise ValueError("no text")
+
+    def never(job):
+        raise AssertionError("must not run")
+
+    async def run():
+        queue = JobQueue(workers=1)
+        queue.on_update = updates.append
+        job = await queue.submit("doc", [("extract", broken), ("segment", never)])
+        await _drain(queue, [job])
+        return job
+
+    job = asyncio.run(run())
+    assert (job.status, job.stage, job.error) == ("failed", "extract", "no text")
+    assert [(u["status"], u["stage"]) for u in updates] == [("queued", None), ("running", "extract"), ("failed", "extract")]
+
+
+def test_failing_on_update_does_not_fail_the_job():
+    def on_update(state):
+        raise OSError("disk full")
+
+    async def run():
+        queue = JobQueue(workers=1)
+        queue.on_update = on_update
+        job = await queue.submit("doc", [("noop", lambda job: None)])
+        await _drain(queue, [job])
+        return job
+
+    assert asyncio.run(run()).status == "completed"
+
+
+def test_full_queue_rejects_submissions():
+    async def run():
+        queue = JobQueue(workers=0, maxsize=2)
+        for uid in ("a", "b"):
+            await queue.submit(uid, [])
+        try:
+            with pytest.raises(asyncio.QueueFull):
+                await queue.submit("c", [])
+            assert queue.depth() == 2
+        finally:
+            await queue.stop()
+
+    asyncio.run(run())
+
+
+def test_only_the_most_recent_finished_jobs_are_kept():
+    async def run():
+        queue = JobQueue(workers=1, history=3)
+        jobs = [await queue.submit(f"doc{n}", [("noop", lambda job: None)]) for n in range(6)]
+        await _drain(queue, jobs)
+        return queue
+
+    queue = asyncio.run(run())
+    assert [uid for uid in ("doc0", "doc1", "doc2", "doc3", "doc4", "doc5") if queue.get(uid)] == ["doc3", "doc4", "doc5"]
+    assert queue._jobs == {}
+
+
+def test_no_history_keeps_nothing():
+    async def run():
+        queue = JobQueue(workers=1, history=0)
+        job = await queue.submit("doc", [("noop", lambda job: None)])
+        await _drain(queue, [job])
+        return queue
+
+    assert asyncio.run(run()).get("doc") is None
@@ -0,0 +1,129 @@
+"""
+Content-addressed LLM response cache (app/services/llm_cache.py).
+"""
+import sqlite3
+
+import pytest
+
+from app.services import llm_cache as llm_cache_module
+from app.services.llm_cache import LLMCache, cache_key
+
+
+class Clock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache_module, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "llm_cache.sqlite3")
+
+
+def _accessed_at(path, key):
+    with sqlite3.connect(path) as db:
+        return db.execute("SELECT accessed_at FROM llm_cache WHERE key = ?", (key,)).fetchone()[0]
+
+
+def _count(path):
+    with sqlite3.connect(path) as db:
+        return db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+def test_cache_key_ignores_reflowed_whitespace():
+    assert cache_key("m", "v1", "The Supplier\n  shall pay.", 0.7) == cache_key("m", "v1", " The Supplier shall pay. ", 0.7)
+
+
+@pytest.mark.parametrize("other", [("m2", "v1", 0.7), ("m", "v2", 0.7), ("m", "v1", 0.2)])
+def test_cache_key_depends_on_model_prompt_and_temperature(other):
+    model, version, temperature = other
+    assert cache_key("m", "v1", "text", 0.7) != cache_key(model, version, "text", temperature)
+
+
+def test_memory_then_disk_hits(path):
+    cache = LLMCache(path, memory_items=2)
+    cache.set("a", "A")
+    assert cache.get("a") == "A"
+    assert cache.get("missing") is None
+    # a new process starts with an empty memory tier
+    assert LLMCache(path).get("a") == "A"
+    assert cache.stats["memory_hits"] == 1 and cache.stats["misses"] == 1
+
+
+def test_memory_tier_evicts_least_recently_used(path):
+    cache = LLMCache(path, memory_items=2)
+    cache.set_many({"a": "A", "b": "B"})
+    cache.get("a")
+    cache.set("c", "C")
+    assert list(cache._memory) == ["a", "c"]
+    # evicted from memory, still on disk
+    assert cache.get("b") == "B"
+    assert cache.stats["disk_hits"] == 1
+
+
+def test_lookahead_does_not_count(path):
+    cache = LLMCache(path)
+    cache.get("missing", record_stats=False)
+    assert cache.stats["misses"] == 0
+    assert cache.hit_rate() == 0.0
+
+
+def test_expired_entries_are_misses(path, clock):
+    cache = LLMCache(path, ttl=60)
+    cache.set("a", "A")
+    clock.now += 61
+    assert cache.get("a") is None
+    assert LLMCache(path, ttl=60).get("a") is None
+
+
+def test_disk_tier_evicts_by_ttl_and_size(path, clock):
+    cache = LLMCache(path, memory_items=10, disk_items=50, ttl=3600)
+    cache.set_many({f"old{n}": "x" for n in range(10)})
+    clock.now += 3601
+    # eviction runs every 100 writes
+    cache.set_many({f"new{n}": "x" for n in range(90)})
+    assert _count(path) == 50
+    with sqlite3.connect(path) as db:
+        assert db.execute("SELECT COUNT(*) FROM llm_cache WHERE key LIKE 'old%'").fetchone()[0] == 0
+
+
+def test_disk_size_eviction_keeps_recently_read_entries(path, clock, monkeypatch):
+    monkeypatch.setattr(llm_cache_module, "LLM_CACHE_TOUCH_BATCH", 1)
+    cache = LLMCache(path, memory_items=1, disk_items=99, ttl=0)
+    cache.set_many({f"k{n}": "x" for n in range(99)})
+    clock.now += 1
+    assert LLMCache(path).get("k0") == "x"
+    clock.now += 1
+    cache.set("k99", "x")
+    assert _count(path) == 99
+    assert LLMCache(path).get("k0") == "x"
+
+
+def test_disk_hits_touch_in_batches(path, clock, monkeypatch):
+    monkeypatch.setattr(llm_cache_module, "LLM_CACHE_TOUCH_BATCH", 3)
+    LLMCache(path).set_many({"a": "A", "b": "B", "c": "C"})
+    written = _accessed_at(path, "a")
+    clock.now += 10
+
+    reader = LLMCache(path)
+    reader.get("a")
+    reader.get("b")
+    # pending until the batch is full, set() runs or flush() is called
+    assert _accessed_at(path, "a") == written
+    reader.get("c")
+    assert _accessed_at(path, "a") == written + 10
+
+    clock.now += 10
+    other = LLMCache(path)
+    other.get("a")
+    other.flush()
+    assert _accessed_at(path, "a") == written + 20
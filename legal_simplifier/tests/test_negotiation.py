@@ -0,0 +1,121 @@
+"""
+Phrase lookup, substitution and library matching of negotiation suggestions
+(app/services/negotiation.py).
+"""
+import asyncio
+import json
+import re
+
+import pytest
+
+from app.services import negotiation
+from app.services.negotiation import RewriteLibrary, find_phrase, generate_rewrites, substitute
+from app.services.store import DocumentStore
+
+
+@pytest.fixture
+def library(tmp_path):
+    library = RewriteLibrary(store=DocumentStore(str(tmp_path / "documents.sqlite3")))
+    library.refresh()
+    return library
+
+
+def test_find_phrase_ignores_case_quotes_and_whitespace():
+    text = "The Supplier shall have Unlimited\n  Liability for all losses."
+    start, end = find_phrase(text, "'unlimited liability'")
+    assert text[start:end] == "Unlimited\n  Liability"
+
+
+def test_find_phrase_missing_or_empty():
+    assert find_phrase("The Supplier is liable.", "unlimited liability") is None
+    assert find_phrase("The Supplier is liable.", "  ''  ") is None
+
+
+def test_substitute_replaces_spans_in_order():
+    text = "Fees are due at any time. Liability is unlimited."
+    assert substitute(text, [((39, 48), "capped"), ((13, 24), "within 30 days")]) == \
+        "Fees are due within 30 days. Liability is capped."
+
+
+def test_substitute_capitalises_at_sentence_start_and_skips_overlaps():
+    text = "Sole discretion applies to the sole discretion clause."
+    result = substitute(text, [((0, 15), "reasonable discretion"), ((5, 20), "ignored")])
+    assert result == "Reasonable discretion applies to the sole discretion clause."
+
+
+def test_match_within_risk_type(library):
+    entry, score = library.match("Unlimited Liabilities", ["Liability"])
+    assert entry["phrase"] == "unlimited liability"
+    assert score == 1.0
+
+
+def test_match_other_entries_serve_every_risk_type(library):
+    entry, _ = library.match("without any liability", ["Regulatory"])
+    assert entry["risk_type"] == "Other"
+
+
+def test_match_respects_risk_types_and_threshold(library):
+    assert library.match("unlimited liability", ["IP"]) is None
+    assert library.match("liability", ["Liability"]) is None
+    # no known risk type: every entry is a candidate
+    entry, _ = library.match("sole discretion", [])
+    assert entry["risk_type"] == "Operational"
+
+
+def test_match_prefers_more_accepted_entries(library):
+    store = library.store
+    store.rewrites.add([("Other", "sole discretion", "discretion exercised reasonably", "accepted")])
+    with store.transaction() as conn:
+        conn.execute("UPDATE rewrites SET accepted = 3 WHERE replacement = ?", ("discretion exercised reasonably",))
+    # among equally similar entries the one accepted more often wins
+    fresh = RewriteLibrary(store=store)
+    fresh.refresh()
+    entry, _ = fresh.match("sole discretion", ["Operational"])
+    assert entry["replacement"] == "discretion exercised reasonably"
+
+
+def test_suggest_builds_text_from_the_library(library):
+    clause = {
+        "original_clause": "The Supplier shall have unlimited liability. It may act in its sole discretion.",
+        "risky_phrases": ["unlimited liability", "'sole discretion'"],
+        "risk_types": ["Liability", "Operational"],
+    }
+    suggestion = library.suggest(clause)
+    assert suggestion["source"] == "library"
+    assert "unlimited liability" not in suggestion["suggested_text"]
+    assert "reasonable discretion, exercised in good faith" in suggestion["suggested_text"]
+    assert [r["phrase"] for r in suggestion["rewrites"]] == ["unlimited liability", "sole discretion"]
+
+
+def test_suggest_needs_every_phrase(library):
+    clause = {
+        "original_clause": "The Supplier shall have unlimited liability and may sublicense the code.",
+        "risky_phrases": ["unlimited liability", "may sublicense the code"],
+        "risk_types": ["Liability"],
+    }
+    assert library.suggest(clause) is None
+
+
+class FlakyLLM:
+    """
+    Answers rewrite prompts, but fails every batch that contains "BROKEN".
+    """
+
+    async def complete(self, prompt, model=None, temperature=None, max_tokens=None):
+        if "BROKEN" in prompt:
+            raise RuntimeError("upstream error")
+        count = len(re.findall(r"^\[\d+\]$", prompt, re.MULTILINE))
+        return json.dumps([{"id": n, "suggested_text": f"fair clause {n}", "rewrites": []} for n in range(1, count + 1)])
+
+
+def test_failed_batch_only_loses_its_own_clauses(monkeypatch):
+    monkeypatch.setattr(negotiation, "NEGOTIATE_BATCH_SIZE", 2)
+    clauses = [
+        {"original_clause": f"The {word} party waives clause {n} of the master agreement.", "risky_phrases": [], "risk_types": []}
+        for n, word in enumerate(["first", "second", "BROKEN", "fourth"])
+    ]
+    results = asyncio.run(generate_rewrites(clauses, FlakyLLM()))
+    failed = [n for n, result in enumerate(results) if result is None]
+    # the batch holding the broken clause is lost, the other one is served
+    assert 2 in failed and len(failed) == 2
+    assert all(results[n]["source"] == "llm" for n in range(4) if n not in failed)
@@ -0,0 +1,93 @@
+"""
+Rules and the calibrated model tier of the local pre-classifier
+(app/services/preclassifier.py).
+"""
+import random
+
+import pytest
+
+from app.services.preclassifier import RATINGS, PreClassifier, calibrate, is_heading
+
+SENTENCES = {
+    "red": [
+        "The {party} accepts liability for every loss of the other party whatever its cause.",
+        "The {party} gives up every claim against the other party for any reason whatsoever.",
+        "The {party} hands over all work product to the other party for nothing in return.",
+    ],
+    "yellow": [
+        "The {party} may end this arrangement after {days} days written notice to the other party.",
+        "The {party} bears its own costs for the {days} day review of the deliverables.",
+        "The {party} keeps records of the services for {days} days after completion.",
+    ],
+    "green": [
+        "Notices go by registered post to the addresses stated above.",
+        "Headings in this document are for convenience only.",
+        "This document is signed in two counterparts, each an original.",
+    ],
+}
+PARTIES = ["Tenant", "Landlord", "Client", "Supplier", "Licensee", "Employee"]
+
+
+def make_clauses(count: int, seed: int):
+    rng = random.Random(seed)
+    clauses = []
+    for _ in range(count):
+        rating = rng.choice(RATINGS)
+        text = rng.choice(SENTENCES[rating]).format(party=rng.choice(PARTIES), days=rng.randint(5, 90))
+        clauses.append((text, rating))
+    return clauses
+
+
+@pytest.fixture
+def classifier():
+    return PreClassifier(store=None)
+
+
+def test_random_labels_keep_the_model_off(classifier):
+    rng = random.Random(7)
+    clauses = [(text, rng.choice(RATINGS)) for text, _ in make_clauses(3000, seed=1)]
+    classifier.train(clauses)
+    assert classifier.cutoff is None
+    assert all(classifier._predict(text) is None for text, _ in make_clauses(300, seed=2))
+
+
+def test_learnable_labels_are_decided_accurately(classifier):
+    classifier.train(make_clauses(3000, seed=1))
+    assert classifier.cutoff is not None
+    test = make_clauses(500, seed=2)
+    decided = [(classifier._predict(text), rating) for text, rating in test]
+    decided = [(analysis["rating"], rating) for analysis, rating in decided if analysis is not None]
+    assert len(decided) > len(test) // 2
+    assert sum(predicted == rating for predicted, rating in decided) / len(decided) >= classifier.target
+
+
+def test_calibrate_picks_the_lowest_accurate_cutoff():
+    scored = [(0.9, True)] * 100 + [(0.5, True)] * 100 + [(0.2, False)] * 100
+    assert calibrate(scored, target=0.95, min_count=50) == 0.5
+    # too few held-out predictions to trust any cut-off
+    assert calibrate(scored[:30], target=0.95, min_count=50) is None
+    # a coin flip never reaches the target
+    flips = [(n / 1000, n % 2 == 0) for n in range(1000)]
+    assert calibrate(flips, target=0.95, min_count=50) is None
+
+
+@pytest.mark.parametrize("text", ["12. GOVERNING LAW", "Schedule 2 – Premises", "1.1 Term of Agreement", "Definitions"])
+def test_headings_are_green(classifier, text):
+    assert classifier._rules(text)["rating"] == "green"
+
+
+@pytest.mark.parametrize("text", [
+    "The tenant gets the keys on request.",
+    "Rent is due on the fifth.",
+    "the landlord keeps the deposit",
+])
+def test_short_sentences_are_not_headings(classifier, text):
+    assert not is_heading(text)
+    assert classifier._rules(text) is None
+
+
+def test_red_cue_unless_negated(classifier):
+    analysis = classifier._rules("The Supplier accepts unlimited liability for all losses.")
+    assert analysis["rating"] == "red"
+    assert analysis["risk_types"] == ["Liability"]
+    assert classifier._rules("In no event shall the Supplier have unlimited liability for losses.") is None
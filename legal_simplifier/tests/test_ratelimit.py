@@ -0,0 +1,140 @@
+"""
+Rate-limit header parsing, the token bucket (app/services/ratelimit.py) and
+retries of the LLM gateway (app/services/llm.py).
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.services.llm import LLMBackend, LLMGateway, LLMRateLimitError, LLMResponse
+from app.services.ratelimit import TokenBucket, backoff_delay, parse_duration
+
+
+@pytest.mark.parametrize("value, seconds", [
+    ("12", 12.0),
+    ("7.66s", 7.66),
+    ("320ms", 0.32),
+    ("2m59.56s", 179.56),
+    ("1h2m3s", 3723.0),
+])
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == pytest.approx(seconds)
+
+
+@pytest.mark.parametrize("value", [None, "", "soon"])
+def test_parse_duration_unparseable(value):
+    assert parse_duration(value) is None
+
+
+def test_backoff_delay_is_capped():
+    assert all(0 <= backoff_delay(attempt, base=0.5, cap=2.0) <= 2.0 for attempt in range(20))
+
+
+def test_headers_tighten_the_bucket():
+    bucket = TokenBucket(6000)  # 6000 tokens per minute
+    bucket.update_from_headers({
+        "x-ratelimit-limit-tokens": "3000",
+        "x-ratelimit-remaining-tokens": "1000",
+        "x-ratelimit-reset-tokens": "20s",
+    })
+    assert bucket.capacity == 3000
+    assert bucket.tokens == pytest.approx(1000, abs=1)
+    # the missing 2000 tokens come back over the 20s window
+    assert bucket.rate == pytest.approx(100)
+
+
+def test_headers_never_raise_the_configured_limit():
+    # Groq reports requests per day; a 14400/day header must not lift 30/min
+    bucket = TokenBucket(30)
+    bucket.update_from_headers({
+        "x-ratelimit-limit-requests": "14400",
+        "x-ratelimit-remaining-requests": "14399",
+        "x-ratelimit-reset-requests": "6s",
+    }, kind="requests")
+    assert bucket.capacity == 30
+    assert bucket.rate == pytest.approx(0.5)
+    assert bucket.tokens <= 30
+
+
+def test_refill_rate_is_capped_and_restored():
+    bucket = TokenBucket(600)  # 10 tokens per second
+    bucket.update_from_headers({"x-ratelimit-remaining-tokens": "0", "x-ratelimit-reset-tokens": "1s"})
+    assert bucket.rate == pytest.approx(10)
+    bucket.update_from_headers({"x-ratelimit-remaining-tokens": "600"})
+    assert bucket.rate == pytest.approx(10)
+
+
+def test_share_scales_the_account_limits():
+    # one of four workers gets a quarter of the account
+    bucket = TokenBucket(1000, share=0.25)
+    bucket.update_from_headers({
+        "x-ratelimit-limit-tokens": "2000",
+        "x-ratelimit-remaining-tokens": "400",
+    })
+    assert bucket.capacity == 500
+    assert bucket.tokens == pytest.approx(100, abs=1)
+
+
+def test_malformed_headers_are_ignored():
+    bucket = TokenBucket(100)
+    bucket.update_from_headers({"x-ratelimit-limit-tokens": "lots", "x-ratelimit-remaining-tokens": "n/a"})
+    assert bucket.capacity == 100
+    assert bucket.rate == pytest.approx(100 / 60)
+
+
+def test_acquire_waits_for_refill():
+    bucket = TokenBucket(10, per_seconds=0.1)  # 100 tokens per second
+
+    async def take():
+        await bucket.acquire(10)
+        start = time.monotonic()
+        await bucket.acquire(5)
+        return time.monotonic() - start
+
+    assert asyncio.run(take()) >= 0.04
+
+
+def test_pause_drains_the_bucket():
+    bucket = TokenBucket(60)  # 1 token per second
+    bucket.pause(3)
+    assert bucket.tokens == pytest.approx(-3)
+
+
+class RateLimitedOnce(LLMBackend):
+    """Answers 429 with retry-after to the first call, then echoes the prompt."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def complete(self, messages, model, temperature, max_tokens, timeout):
+        self.calls.append(messages[0]["content"])
+        if len(self.calls) == 1:
+            raise LLMRateLimitError("rate limited", {"retry-after": "0.2", "x-ratelimit-limit-tokens": "5000"})
+        return LLMResponse(messages[0]["content"], {"x-ratelimit-remaining-requests": "29"})
+
+
+def test_gateway_retries_after_429_without_holding_its_slot():
+    backend = RateLimitedOnce()
+    gateway = LLMGateway(backend, concurrency=1, rpm=600, tpm=100000, max_retries=2, timeout=1)
+
+    async def run():
+        first = asyncio.ensure_future(gateway.complete("first", max_tokens=10))
+        await asyncio.sleep(0.05)
+        # the only concurrency slot is free while "first" waits for retry-after
+        second = await gateway.complete("second", max_tokens=10)
+        return await first, second
+
+    assert asyncio.run(run()) == ("first", "second")
+    assert backend.calls == ["first", "second", "first"]
+    assert gateway.tokens.capacity == 5000
+
+
+def test_gateway_gives_up_after_max_retries():
+    class AlwaysLimited(LLMBackend):
+        async def complete(self, messages, model, temperature, max_tokens, timeout):
+            raise LLMRateLimitError("rate limited", {"retry-after": "0.01"})
+
+    gateway = LLMGateway(AlwaysLimited(), concurrency=1, rpm=6000, tpm=100000, max_retries=1, timeout=1)
+    with pytest.raises(LLMRateLimitError):
+        asyncio.run(gateway.complete("hello", max_tokens=10))
@@ -0,0 +1,99 @@
+"""
+Risk report export: rendering, the on-disk cache and shared renders
+(app/services/report.py).
+"""
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from app.services import report
+from app.services.report import _split_phrases, get_or_render, iter_file, report_key
+
+DOCUMENT = {"uid": "doc", "doc_name": "lease.pdf", "doc_type": "nda", "version": 1}
+CLAUSES = [
+    {"id": "1.txt", "original_clause": "The Tenant shall indemnify the Landlord for all losses.", "rating": "red",
+     "severity": 8, "detailed_rationale": "Uncapped indemnity.", "risky_phrases": ["indemnify", "all losses"],
+     "risk_types": ["Liability"], "number": "1", "heading": "INDEMNITY"},
+    {"id": "2.txt", "original_clause": "Rent is due monthly.", "rating": "green", "severity": 1,
+     "detailed_rationale": "Standard.", "risky_phrases": [], "risk_types": []},
+]
+
+
+def _record(etag='"one"'):
+    return {"uid": "doc", "version": "v1", "etag": etag, "created_at": 1.0, "clauses": CLAUSES}
+
+
+@pytest.fixture
+def export_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(report, "EXPORT_DIR", str(tmp_path))
+    monkeypatch.setattr(report, "EXPORT_WORKERS", 0)
+    return tmp_path
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    calls = []
+
+    def fake_render(document, clauses, path):
+        calls.append(threading.get_ident())
+        time.sleep(0.05)
+        with open(path, "wb") as f:
+            f.write(b"report")
+
+    monkeypatch.setitem(report.RENDERERS, "pdf", fake_render)
+    return calls
+
+
+def test_split_phrases_marks_risky_runs():
+    runs = _split_phrases("Pay ALL losses and all losses.", ["all losses", "losses", " "])
+    assert runs == [("Pay ", False), ("ALL losses", True), (" and ", False), ("all losses", True), (".", False)]
+
+
+def test_report_key_follows_the_result():
+    assert report_key(_record(), "pdf") == report_key(_record(), "pdf")
+    assert report_key(_record(), "pdf") != report_key(_record('"two"'), "pdf")
+    assert report_key(_record(), "pdf") != report_key(_record(), "docx")
+
+
+def test_second_download_is_served_from_the_cache(export_dir, renders):
+    async def run():
+        first = await get_or_render("doc", DOCUMENT, _record(), "pdf")
+        second = await get_or_render("doc", DOCUMENT, _record(), "pdf")
+        return first, second
+
+    (path, cached), (again, cached_again) = asyncio.run(run())
+    assert (cached, cached_again) == (False, True)
+    assert path == again and b"".join(iter_file(path, chunk_size=2)) == b"report"
+    assert len(renders) == 1
+
+
+def test_concurrent_downloads_share_one_render(export_dir, renders):
+    async def run():
+        return await asyncio.gather(*(get_or_render("doc", DOCUMENT, _record(), "pdf") for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert len({path for path, _ in results}) == 1
+    assert len(renders) == 1
+
+
+def test_a_new_result_replaces_the_old_report(export_dir, renders):
+    async def run():
+        old, _ = await get_or_render("doc", DOCUMENT, _record('"one"'), "pdf")
+        new, _ = await get_or_render("doc", DOCUMENT, _record('"two"'), "pdf")
+        return old, new
+
+    old, new = asyncio.run(run())
+    assert old != new
+    assert os.listdir(export_dir / "doc") == [os.path.basename(new)]
+
+
+@pytest.mark.parametrize("fmt, magic", [("pdf", b"%PDF"), ("docx", b"PK")])
+def test_renderers_write_valid_files(export_dir, fmt, magic):
+    path, _ = asyncio.run(get_or_render("doc", DOCUMENT, _record(), fmt))
+    with open(path, "rb") as f:
+        assert f.read(len(magic)) == magic
+    # no temporary files are left behind
+    assert os.listdir(export_dir / "doc") == [os.path.basename(path)]
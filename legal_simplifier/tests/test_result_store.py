@@ -0,0 +1,72 @@
+"""
+Persisted results served by GET /result/{uid}: ETag matching, 304s and the
+public clause schema (app/services/result_store.py, app/api/v1/result.py).
+"""
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.v1.result import RESULT_VERSION
+from app.services.result_store import compute_etag, etag_matches, load_result, save_result
+from main import app
+
+CLAUSES = [
+    {"id": "1.txt", "original_clause": "1. The Supplier shall indemnify the Client.", "rating": "red",
+     "severity": 8, "detailed_rationale": "Uncapped indemnity.", "risky_phrases": ["indemnify"],
+     "risk_types": ["Liability"], "confidence": "high", "decided_by": "llm", "number": "1",
+     "start_idx": 0, "end_idx": 43},
+    {"id": "2.txt", "original_clause": "2. The Client may indemnify the Supplier.", "rating": "red",
+     "severity": 8, "detailed_rationale": "Uncapped indemnity.", "risky_phrases": ["indemnify"],
+     "risk_types": ["Liability"], "confidence": "high", "decided_by": "cluster", "number": "2",
+     "inherited_from": {"scope": "document", "uid": "u", "clause_id": "1.txt", "similarity": 0.9},
+     "start_idx": 44, "end_idx": 85},
+]
+
+
+@pytest.fixture
+def stored():
+    uid = str(uuid.uuid4())
+    return save_result(uid, CLAUSES, RESULT_VERSION)
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+def test_etag_matches_lists_weak_tags_and_wildcard():
+    etag = compute_etag(CLAUSES)
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", {etag}', etag)
+    assert etag_matches(f"W/{etag}", etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches("", etag)
+
+
+def test_load_result_checks_version(stored):
+    assert load_result(stored["uid"], RESULT_VERSION)["clauses"] == CLAUSES
+    assert load_result(stored["uid"], "clause-v0:other-model") is None
+
+
+def test_get_result_is_served_from_the_store(client, stored):
+    response = client.get(f"/api/v1/result/{stored['uid']}")
+    assert response.status_code == 200
+    assert response.headers["etag"] == stored["etag"]
+    # fields that were never set are left out, so the body hashes to the ETag
+    assert response.json() == CLAUSES
+
+
+@pytest.mark.parametrize("header", ["{etag}", 'W/{etag}', '"stale", {etag}', "*"])
+def test_get_result_not_modified(client, stored, header):
+    response = client.get(f"/api/v1/result/{stored['uid']}",
+                          headers={"If-None-Match": header.format(etag=stored["etag"])})
+    assert response.status_code == 304
+    assert response.headers["etag"] == stored["etag"]
+
+
+def test_result_schema_lists_the_clause_fields(client):
+    schema = client.get("/openapi.json").json()["components"]["schemas"]["ClauseResult"]["properties"]
+    for field in ("decided_by", "change", "inherited_from", "start_idx", "end_idx"):
+        assert field in schema
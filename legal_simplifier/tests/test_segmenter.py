@@ -0,0 +1,46 @@
+"""
+Rule-based clause segmentation (app/services/segmenter.py).
+"""
+from app.services.segmenter import PREAMBLE_HEADING, PREAMBLE_NUMBER, segment_clauses
+
+CONTRACT = """SERVICES AGREEMENT
+This Agreement is made between Acme Ltd ("Supplier")
+and Beta LLC ("Client").
+
+1. Services. The Supplier shall provide the services
+described in Schedule 1.
+(a) on time; and
+(b) with due care.
+TERMINATION
+2. Either party may terminate on 30 days' notice.
+"""
+
+
+def _texts(text):
+    return [(s["number"], s["heading"], text[s["start_idx"]:s["end_idx"]]) for s in segment_clauses(text)]
+
+
+def test_preamble_becomes_the_leading_clause():
+    segments = segment_clauses(CONTRACT)
+    preamble = segments[0]
+    assert (preamble["id"], preamble["number"], preamble["heading"]) == (1, PREAMBLE_NUMBER, PREAMBLE_HEADING)
+    assert preamble["start_idx"] == 0
+    assert preamble["text"] == 'SERVICES AGREEMENT This Agreement is made between Acme Ltd ("Supplier") and Beta LLC ("Client").'
+
+
+def test_numbered_clauses_keep_sub_clauses_and_headings():
+    _, (number, heading, first), (number2, heading2, second) = _texts(CONTRACT)
+    assert (number, heading) == ("1", None)
+    assert first.endswith("(b) with due care.")
+    assert (number2, heading2) == ("2", "TERMINATION")
+    assert second.startswith("TERMINATION\n2. Either party")
+
+
+def test_no_preamble_when_numbering_starts_the_text():
+    segments = segment_clauses("1. First clause.\n2. Second clause.\n")
+    assert [s["number"] for s in segments] == ["1", "2"]
+
+
+def test_whitespace_before_the_first_clause_is_not_a_preamble():
+    segments = segment_clauses("\n\n  \n1. First clause.\n2. Second clause.\n")
+    assert [s["number"] for s in segments] == ["1", "2"]
@@ -0,0 +1,89 @@
+"""
+Pre-fork production server: arguments, worker supervision and job recovery
+(server.py), and each worker's share of the LLM rate limits
+(app/services/llm.py).
+"""
+import pytest
+
+import server
+from app import config
+from app.services import llm
+from app.services.startup import StartupReport
+from app.services.store import doc_store
+
+
+@pytest.fixture
+def fresh_gateway():
+    llm.set_llm(None)
+    yield
+    llm.set_llm(None)
+
+
+def test_parse_args_rejects_invalid_worker_counts():
+    assert server.parse_args(["--workers", "4"]).workers == 4
+    with pytest.raises(SystemExit):
+        server.parse_args(["--workers", "0"])
+    with pytest.raises(SystemExit):
+        server.parse_args(["--workers", "2", "--reload"])
+
+
+def test_cli_hands_the_worker_count_to_the_app(monkeypatch):
+    served = []
+    monkeypatch.setattr(server, "serve_workers", lambda host, port, workers: served.append(workers))
+    monkeypatch.setattr(config, "WEB_WORKERS", 1)
+    monkeypatch.setenv("WEB_WORKERS", "1")
+    server.cli(["--workers", "3"])
+    assert served == [3]
+    assert config.WEB_WORKERS == 3
+
+
+def test_each_worker_gets_its_share_of_the_rate_limits(monkeypatch, fresh_gateway):
+    monkeypatch.setattr(config, "WEB_WORKERS", 4)
+    gateway = llm.get_llm()
+    assert gateway.requests.capacity == pytest.approx(config.LLM_RPM / 4)
+    assert gateway.tokens.capacity == pytest.approx(config.LLM_TPM / 4)
+    assert gateway.tokens.share == 0.25
+    assert llm.get_llm() is gateway
+
+
+def test_startup_report_of_a_forked_worker_counts_from_the_fork():
+    report = StartupReport(budget=10)
+    with report.phase("import app"):
+        pass
+    report.reset()
+    with report.phase("open stores"):
+        pass
+    assert list(report.ready()["phases"]) == ["open stores"]
+    assert report.ready_after < 1
+
+
+def test_a_dead_worker_is_restarted_and_only_its_jobs_fail(monkeypatch):
+    pids = iter([101, 102, 103])
+    spawned = []
+    waits = iter([101])
+
+    def spawn(uvicorn_config, sock):
+        spawned.append(next(pids))
+        return spawned[-1]
+
+    def wait():
+        pid = next(waits, None)
+        if pid is None:
+            raise ChildProcessError
+        # both workers were running a job when 101 died
+        for uid, owner in (("job-101", 101), ("job-102", 102)):
+            doc_store.save_job({"uid": uid, "status": "running", "stage": "classify", "error": None,
+                                "created_at": 1.0, "updated_at": 1.0})
+            with doc_store.transaction() as conn:
+                conn.execute("UPDATE jobs SET worker_pid = ? WHERE uid = ?", (owner, uid))
+        return pid, 1 << 8
+
+    monkeypatch.setattr(server, "_spawn", spawn)
+    monkeypatch.setattr(server, "RESPAWN_DELAY", 0)
+    monkeypatch.setattr(server.os, "wait", wait)
+    monkeypatch.setattr(server.signal, "signal", lambda signum, handler: None)
+    server.serve_workers("127.0.0.1", 0, workers=2)
+
+    assert spawned == [101, 102, 103]
+    assert doc_store.get_job("job-101")["status"] == "failed"
+    assert doc_store.get_job("job-102")["status"] == "running"
@@ -0,0 +1,116 @@
+"""
+SQLite document store and its full-text index (app/services/store.py,
+app/services/search_store.py).
+"""
+import os
+
+import pytest
+
+from app.services.store import DocumentStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DocumentStore(str(tmp_path / "documents.sqlite3"))
+
+
+def _record(uid, clauses):
+    return {"uid": uid, "version": "v1", "etag": '"e"', "created_at": 1.0, "clauses": clauses}
+
+
+def _add(store, uid, texts, doc_type="nda"):
+    store.add_document(uid, f"{uid}.pdf", doc_type)
+    store.put_clauses(uid, [{"clause_id": f"{n}.txt", "text": text, "number": str(n)} for n, text in enumerate(texts, 1)])
+
+
+def test_versions_follow_the_document_name(store):
+    assert store.add_document("a", "lease.pdf") == (1, None)
+    assert store.add_document("b", "lease.pdf") == (2, "a")
+    assert store.previous_version("b") == "a"
+    assert store.get_document("b")["version"] == 2
+
+
+def test_pdf_and_text_are_copied_in_chunks(store, tmp_path):
+    store.add_document("a", "lease.pdf")
+    pdf = tmp_path / "lease.pdf"
+    pdf.write_bytes(b"%PDF" + os.urandom(5000))
+    store.put_pdf("a", str(pdf), chunk_size=1024)
+    assert b"".join(store.iter_pdf("a", chunk_size=1000)) == pdf.read_bytes()
+
+    text = tmp_path / "lease.txt"
+    text.write_text("Clause one – payment.\n", encoding="utf-8")
+    store.put_text_file("a", str(text), chunk_size=4)
+    assert store.get_text("a") == "Clause one – payment.\n"
+    assert store.get_document("a")["has_pdf"] and store.get_document("a")["has_text"]
+
+
+def test_missing_pdf(store, tmp_path):
+    store.add_document("a", "lease.pdf")
+    with pytest.raises(FileNotFoundError):
+        list(store.iter_pdf("a"))
+    pdf = tmp_path / "other.pdf"
+    pdf.write_bytes(b"%PDF")
+    with pytest.raises(KeyError):
+        store.put_pdf("unknown", str(pdf))
+
+
+def test_save_result_copies_ratings_and_indexes_clauses(store):
+    _add(store, "a", ["The Supplier shall indemnify the Client.", "Payment is due in 30 days."])
+    store.save_result(_record("a", [
+        {"id": "1.txt", "rating": "red", "severity": 8, "risky_phrases": ["indemnify"], "risk_types": ["Liability"],
+         "decided_by": "llm"},
+        {"id": "2.txt", "rating": "green", "severity": 2, "risky_phrases": [], "risk_types": ["Financial"],
+         "decided_by": "rules"},
+    ]))
+    assert [(c["rating"], c["severity"]) for c in store.get_clauses("a")] == [("red", 8), ("green", 2)]
+    assert [c["clause_id"] for c in store.find_clauses(min_severity=5)] == ["1.txt"]
+    # only LLM-rated clauses train the local models
+    assert store.training_clauses(10) == [("The Supplier shall indemnify the Client.", "red")]
+
+    total, items = store.search.clauses(query="indemnified")
+    assert total == 1
+    assert (items[0]["clause_id"], items[0]["risk_types"]) == ("1.txt", ["Liability"])
+    assert "[indemnify]" in items[0]["snippet"]
+    assert store.search.clauses(risk_type="Financial")[1][0]["clause_id"] == "2.txt"
+    assert store.search.clauses(rating="green", doc_type="msa") == (0, [])
+
+
+def test_relevant_clauses_fall_back_to_the_most_severe(store):
+    _add(store, "a", ["Payment is due in 30 days.", "Either party may terminate on notice."])
+    store.save_result(_record("a", [{"id": "1.txt", "rating": "yellow", "severity": 4},
+                                    {"id": "2.txt", "rating": "red", "severity": 7}]))
+    assert [c["clause_id"] for c in store.search.relevant("a", "When can the contract be terminated?", 1)] == ["2.txt"]
+    assert [c["clause_id"] for c in store.search.relevant("a", "What about the payment?", 1)] == ["1.txt"]
+    assert [c["clause_id"] for c in store.search.relevant("a", "Who owns the IP?", 2)] == ["2.txt", "1.txt"]
+
+
+def test_reindex_rebuilds_the_search_index(store):
+    _add(store, "a", ["The Supplier shall indemnify the Client."])
+    store.save_result(_record("a", [{"id": "1.txt", "rating": "red", "severity": 8}]))
+    with store.transaction() as conn:
+        conn.execute("DELETE FROM clause_fts")
+    assert store.search.clauses(query="indemnify")[0] == 0
+    assert store.search.reindex() == 1
+    assert store.search.clauses(query="indemnify")[0] == 1
+
+
+def test_delete_document_removes_derived_rows(store):
+    _add(store, "a", ["The Supplier shall indemnify the Client."])
+    store.save_result(_record("a", [{"id": "1.txt", "rating": "red", "severity": 8}]))
+    store.save_job({"uid": "a", "status": "completed", "stage": None, "error": None, "created_at": 1.0, "updated_at": 1.0})
+    store.delete_document("a")
+    assert store.get_document("a") is None
+    assert store.get_clauses("a") == [] and store.load_result("a") is None and store.get_job("a") is None
+    assert store.search.clauses(query="indemnify")[0] == 0
+
+
+def test_interrupted_jobs_of_one_worker_are_failed(store):
+    job = {"uid": "a", "status": "running", "stage": "classify", "error": None, "created_at": 1.0, "updated_at": 1.0}
+    store.save_job(job)
+    store.save_job(dict(job, uid="b", status="completed"))
+    with store.transaction() as conn:
+        conn.execute("UPDATE jobs SET worker_pid = 1 WHERE uid = 'a'")
+    assert store.fail_interrupted_jobs(worker_pid=2) == 0
+    assert store.fail_interrupted_jobs(worker_pid=1) == 1
+    assert store.get_job("a")["status"] == "failed"
+    assert store.get_job("b")["status"] == "completed"
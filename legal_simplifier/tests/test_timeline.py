@@ -0,0 +1,142 @@
+"""
+Date parsing and resolution of the timeline extractor (app/services/timeline.py).
+"""
+import asyncio
+from datetime import date
+
+import pytest
+
+from app.api.v1 import upload
+from app.services.jobs import Job
+from app.services.timeline import extract_mentions, find_dates, parse_sentence, resolve, shift
+
+
+def _fields(mention: dict) -> dict:
+    return {k: v for k, v in mention.items() if k not in ("clause_id", "text", "source", "recurrence")}
+
+
+def test_find_dates_styles_in_text_order():
+    found = find_dates("Signed on 03/04/2024, effective 1 March 2024 and payable by 2024-12-31.")
+    assert [value for _, value, _ in found] == [date(2024, 4, 3), date(2024, 3, 1), date(2024, 12, 31)]
+    # only the numeric date can be read both ways
+    assert [ambiguous for _, _, ambiguous in found] == [True, False, False]
+
+
+def test_find_dates_numeric_order():
+    assert find_dates("on 03/04/2024", "MDY")[0][1] == date(2024, 3, 4)
+    # 25 cannot be a month, so either order gives the same date
+    assert find_dates("on 25/04/2024", "MDY") == [(3, date(2024, 4, 25), False)]
+
+
+def test_find_dates_skips_invalid_dates():
+    assert find_dates("on 31/02/2024") == []
+
+
+def test_parse_sentence_explicit_date():
+    mentions, ambiguous = parse_sentence("This Agreement is effective as of 1 March 2024.", "1")
+    assert [_fields(m) for m in mentions] == [{"kind": "effective", "date": date(2024, 3, 1)}]
+    assert not ambiguous
+
+
+def test_parse_sentence_term_from_effective_date():
+    mentions, _ = parse_sentence("The term of this Agreement is two (2) years from the Effective Date.", "1")
+    assert [_fields(m) for m in mentions] == [
+        {"kind": "expiry", "n": 2, "unit": "year", "anchor": "effective", "sign": 1, "window": False}
+    ]
+
+
+def test_parse_sentence_notice_before_expiry():
+    mentions, _ = parse_sentence(
+        "Either party may terminate by giving thirty (30) days notice before the expiry of the Term.", "1"
+    )
+    assert [_fields(m) for m in mentions] == [
+        {"kind": "notice", "n": 30, "unit": "day", "anchor": "expiry", "sign": -1, "window": False}
+    ]
+
+
+def test_parse_sentence_recurring_payment():
+    mentions, _ = parse_sentence("Rent is payable on the 5th day of every month.", "1")
+    assert [(m["kind"], m["recurrence"]) for m in mentions] == [("payment", "monthly")]
+
+
+def test_parse_sentence_vague_timing_is_ambiguous():
+    mentions, ambiguous = parse_sentence(
+        "The Supplier shall deliver the goods within a reasonable time after the order.", "1"
+    )
+    assert mentions == []
+    assert ambiguous
+
+
+def test_resolve_anchors_and_events():
+    mentions, unclear = extract_mentions([{
+        "clause_id": "1",
+        "text": "This Agreement is effective as of 1 March 2024. "
+                "The term of this Agreement is two (2) years from the Effective Date. "
+                "Either party may terminate by giving thirty (30) days notice before the expiry of the Term. "
+                "Rent is payable on the 5th day of every month.",
+    }])
+    assert unclear == []
+    anchors, events = resolve(mentions)
+    assert anchors == {"effective": date(2024, 3, 1), "expiry": date(2026, 3, 1)}
+
+    by_kind = {event["kind"]: event for event in events}
+    assert by_kind["expiry"]["start_date"] == "2026-03-01"
+    assert by_kind["expiry"]["duration_days"] == 730
+    assert by_kind["notice"]["start_date"] == "2026-01-30"
+    payment = by_kind["payment"]
+    assert (payment["start_date"], payment["end_date"]) == ("2024-03-05", "2026-02-05")
+    assert len(payment["occurrences"]) == 24
+
+
+def test_resolve_without_dates_leaves_events_undated():
+    mentions, _ = parse_sentence("The term of this Agreement is two (2) years from the Effective Date.", "1")
+    anchors, events = resolve(mentions)
+    assert anchors == {"effective": None, "expiry": None}
+    assert events[0]["start_date"] is None
+
+
+def test_shift_clamps_month_end_and_skips_weekends():
+    assert shift(date(2024, 1, 31), 1, "month") == date(2024, 2, 29)
+    # Friday 1 March 2024 minus one business day is Thursday
+    assert shift(date(2024, 3, 1), 1, "business day", -1) == date(2024, 2, 29)
+    # Monday 4 March 2024 minus one business day skips the weekend
+    assert shift(date(2024, 3, 4), 1, "business day", -1) == date(2024, 3, 1)
+
+
+def test_resolve_skips_overlong_terms():
+    mentions, _ = extract_mentions([{
+        "clause_id": "1",
+        "text": "The Effective Date is 1 January 2025. "
+                "This Agreement continues for a term of 9999 years from the Effective Date.",
+    }])
+    anchors, events = resolve(mentions)
+    assert anchors == {"effective": date(2025, 1, 1), "expiry": None}
+    assert [event["kind"] for event in events] == ["effective"]
+
+
+def test_resolve_skips_dates_past_date_max():
+    mentions, _ = extract_mentions([{
+        "clause_id": "1",
+        "text": "The Effective Date is 1 December 9999. The term is 50 years from the Effective Date.",
+    }])
+    anchors, events = resolve(mentions)
+    assert anchors["expiry"] is None
+    assert [event["kind"] for event in events] == ["effective"]
+
+
+def test_shift_out_of_range_raises_value_error():
+    with pytest.raises(ValueError):
+        shift(date(9999, 12, 1), 2, "month")
+    with pytest.raises(ValueError):
+        shift(date(9999, 12, 31), 1, "day")
+
+
+def test_timeline_stage_failure_does_not_fail_the_job(monkeypatch):
+    async def broken(uid, llm):
+        raise ValueError("year 12024 is out of range")
+
+    monkeypatch.setattr(upload, "build_timeline", broken)
+    job = Job("doc-1", [], {})
+    asyncio.run(upload.timeline_stage(job))
+    assert job.status == "queued"
+    assert job.error == "timeline: year 12024 is out of range"
@@ -0,0 +1,97 @@
+"""
+Bulk upload: zip unpacking and its limits (app/api/v1/upload.py), and fair
+scheduling of batch jobs (app/services/jobs.py).
+"""
+import asyncio
+import io
+import os
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.v1 import upload
+from app.services.jobs import JobQueue
+from main import app
+
+
+@pytest.fixture
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload, "STORE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _zip(path, members):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return str(path)
+
+
+def test_unpack_zip_extracts_pdfs_only(store_dir):
+    path = _zip(store_dir / "upload_docs.zip", {
+        "contracts/nda.pdf": b"%PDF-1.4 nda",
+        "contracts/notes.txt": b"notes",
+        "__MACOSX/._nda.pdf": b"resource fork",
+        ".hidden.pdf": b"%PDF-1.4",
+    })
+    pdfs, rejected = upload._unpack_zip(path)
+
+    assert [name for _, _, name in pdfs] == ["nda.pdf"]
+    with open(pdfs[0][1], "rb") as f:
+        assert f.read() == b"%PDF-1.4 nda"
+    assert sorted(r.filename for r in rejected) == [".hidden.pdf", "__MACOSX/._nda.pdf", "contracts/notes.txt"]
+
+
+def test_unpack_zip_checks_declared_size_before_extracting(store_dir, monkeypatch):
+    monkeypatch.setattr(upload, "BATCH_MAX_ZIP_BYTES", 1000)
+    # compresses to a few bytes but declares 2000
+    path = _zip(store_dir / "upload_bomb.zip", {"a.pdf": b"0" * 1000, "b.pdf": b"0" * 1000})
+    pdfs, rejected = upload._unpack_zip(path)
+
+    assert pdfs == []
+    assert [(r.filename, r.reason) for r in rejected] == [("bomb.zip", "Zip is too large")]
+    assert os.listdir(store_dir) == ["upload_bomb.zip"]
+
+
+def test_unpack_zip_rejects_invalid_archives(store_dir):
+    path = store_dir / "upload_broken.zip"
+    path.write_bytes(b"not a zip")
+    assert upload._unpack_zip(str(path))[1][0].reason == "Not a valid zip file"
+
+
+def test_batch_upload_reports_rejected_files(store_dir, monkeypatch):
+    monkeypatch.setattr(upload, "BATCH_MAX_ZIP_BYTES", 10)
+    archive = io.BytesIO()
+    _zip(archive, {"a.pdf": b"%PDF-1.4 " + b"0" * 100})
+    response = TestClient(app).post("/api/v1/upload/batch", files=[
+        ("files", ("docs.zip", archive.getvalue(), "application/zip")),
+        ("files", ("notes.docx", b"docx", "application/octet-stream")),
+    ])
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total"] == 0
+    assert {(r["filename"], r["reason"]) for r in body["rejected"]} == {
+        ("docs.zip", "Zip is too large"), ("notes.docx", "Unsupported file type"),
+    }
+    # the uploaded zip is removed once unpacked
+    assert os.listdir(store_dir) == []
+
+
+def test_batch_jobs_take_turns_with_other_uploads():
+    order = []
+
+    def stage(job):
+        order.append(job.uid)
+
+    async def run():
+        queue = JobQueue(workers=1)
+        jobs = [await queue.submit(f"batch{n}", [("run", stage)], group="batch") for n in range(3)]
+        jobs += [await queue.submit(uid, [("run", stage)]) for uid in ("single1", "single2")]
+        while any(job.status in ("queued", "running") for job in jobs):
+            await asyncio.sleep(0.005)
+        await queue.stop()
+
+    asyncio.run(run())
+    assert order == ["batch0", "single1", "single2", "batch1", "batch2"]